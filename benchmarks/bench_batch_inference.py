@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Batch Inference Benchmark
+Compare rows/sec of the per-row predictor API against the batch API
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from predict_water_quality import WaterQualityPredictor
+
+
+def make_samples(predictor, n_rows, seed=42):
+    """Synthetic samples scattered around the training medians"""
+    rng = np.random.default_rng(seed)
+    medians = np.asarray(predictor.imputer.statistics_, dtype=float)
+    noise = rng.lognormal(mean=0.0, sigma=0.4, size=(n_rows, len(medians)))
+    return pd.DataFrame(medians * noise, columns=predictor.feature_names)
+
+
+def time_call(fn, repeat=3):
+    """Best-of-N wall time in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--model', default='rf', choices=['rf', 'xgb', 'nn'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 1_000, 100_000])
+    parser.add_argument('--max-loop-rows', type=int, default=1_000,
+                        help='Largest size also timed through the per-row API')
+    args = parser.parse_args()
+    
+    predictor = WaterQualityPredictor(args.models_dir)
+    
+    print("=" * 80)
+    print(f"BATCH INFERENCE BENCHMARK (model={args.model})")
+    print("=" * 80)
+    print(f"{'rows':>10s} {'api':>8s} {'class rows/s':>14s} {'wqi rows/s':>14s}")
+    
+    for n_rows in args.sizes:
+        df = make_samples(predictor, n_rows)
+        
+        t_class = time_call(lambda: predictor.predict_class_batch(df, args.model))
+        t_wqi = time_call(lambda: predictor.predict_wqi_batch(df, args.model))
+        print(f"{n_rows:>10d} {'batch':>8s} {n_rows / t_class:>14,.0f} {n_rows / t_wqi:>14,.0f}")
+        
+        if n_rows <= args.max_loop_rows:
+            rows = df.to_dict('records')
+            t_class = time_call(lambda: [predictor.predict_class(r, args.model) for r in rows], repeat=1)
+            t_wqi = time_call(lambda: [predictor.predict_wqi(r, args.model) for r in rows], repeat=1)
+            print(f"{n_rows:>10d} {'per-row':>8s} {n_rows / t_class:>14,.0f} {n_rows / t_wqi:>14,.0f}")
+    
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
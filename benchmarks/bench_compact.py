@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Compact Model Benchmark
+Latency and agreement of predict_compact per latency budget against the full ensemble
+
+For each budget the predictor picks a compact variant (see compression.py).
+The variant's model-only latency and its expected latency with fallbacks come
+from the manifest; for the ensemble, the manifest latency is per sample of a
+batched call, as the fallback runs it. 'µs/call' is a whole single-sample
+call. Agreement and fallback rate are measured on a batch of samples
+scattered around the training medians.
+    
+    python benchmarks/bench_compact.py --models-dir models --budgets 40 60 150
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bench_batch_inference import make_samples
+from predict_water_quality import WaterQualityPredictor
+
+
+def per_call_us(fn, number):
+    fn()
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--budgets', type=float, nargs='+', default=[40, 60, 100, 150, 250])
+    parser.add_argument('--rows', type=int, default=2_000, help='Samples compared with the ensemble')
+    parser.add_argument('--calls', type=int, default=200, help='Single-sample calls timed')
+    args = parser.parse_args()
+    
+    predictor = WaterQualityPredictor(args.models_dir, lazy=False)
+    variants = predictor.compact_variants()
+    if variants.empty:
+        sys.exit(f"No compact variants in {args.models_dir}; run scripts/run_analysis.py first")
+    
+    batch = make_samples(predictor, args.rows)
+    sample = batch.iloc[0].to_dict()
+    full = predictor.predict_ensemble(batch)
+    
+    print("=" * 80)
+    print(f"COMPACT MODEL BENCHMARK ({args.rows:,} samples)")
+    print("=" * 80)
+    print(f"{'budget µs':>10s} {'variant':>16s} {'model µs':>9s} {'w/ fallb.':>9s} {'µs/call':>9s} "
+          f"{'fallback':>9s} {'agreement':>10s}")
+    
+    reports = variants.set_index('name')
+    ensemble_us = per_call_us(lambda: predictor.predict_all(sample), max(1, args.calls // 20))
+    print(f"{'-':>10s} {'ensemble':>16s} {reports.loc['ensemble', 'latency_us']:>9.1f} {'-':>9s} "
+          f"{ensemble_us:>9.1f} {'-':>9s} {1:>10.1%}")
+    
+    for budget in args.budgets:
+        try:
+            result = predictor.predict_compact(batch, budget_us=budget)
+        except ValueError as e:
+            print(f"{budget:>10.0f} {e}")
+            continue
+        
+        name = result['model'][result['model'] != 'ensemble'].iloc[0] \
+            if (result['model'] != 'ensemble').any() else '(all fallback)'
+        model_us, expected_us = (reports.loc[name, ['latency_us', 'latency_with_fallback_us']]
+                                 if name in reports.index else (np.nan, np.nan))
+        # Confident samples only, so the call never includes a fallback
+        call_us = per_call_us(lambda: predictor.predict_compact(sample, budget_us=budget,
+                                                                min_confidence=0.0), args.calls)
+        fallback = (result['model'] == 'ensemble').mean()
+        agreement = (result['class'].to_numpy() == full['class_vote'].to_numpy()).mean()
+        print(f"{budget:>10.0f} {name:>16s} {model_us:>9.1f} {expected_us:>9.1f} {call_us:>9.1f} "
+              f"{fallback:>9.1%} {agreement:>10.1%}")
+    
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Explanation Benchmark
+Batched, cached TreeSHAP through WaterQualityPredictor.explain versus one SHAP call per row
+(tests/test_explanations.py checks that the attributions add up to the predictions)
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from ingest import load_clean_data
+from predict_water_quality import WaterQualityPredictor
+from synthetic_data import generate_csv
+
+
+def naive_seconds_per_row(predictor, X, model, task, n_rows):
+    """A new explainer and one shap_values call per sample, as a per-row report loop would do"""
+    import shap
+    estimator = predictor._get_model(model, task)
+    start = time.perf_counter()
+    for i in range(n_rows):
+        shap.TreeExplainer(estimator).shap_values(X[i:i + 1], check_additivity=False)
+    return (time.perf_counter() - start) / n_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--rows', type=int, default=5_000, help='Size of the synthetic monthly batch')
+    parser.add_argument('--naive-rows', type=int, default=50,
+                        help='Rows timed with per-row SHAP calls (extrapolated to --rows)')
+    parser.add_argument('--jobs', type=int, help='Cores for explain() (default: all)')
+    parser.add_argument('--csv', help='Batch to explain instead of synthetic data')
+    args = parser.parse_args()
+    
+    predictor = WaterQualityPredictor(args.models_dir, models=('rf', 'xgb'), explain_jobs=args.jobs)
+    if args.csv:
+        batch = load_clean_data(args.csv)
+    else:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data',
+                            f'synthetic_{args.rows}_seed42.csv')
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            generate_csv(path, args.rows)
+        batch = load_clean_data(path)
+    X = predictor.preprocess_data(batch)
+    
+    print("=" * 80)
+    print(f"EXPLANATION BENCHMARK ({len(batch):,} rows, {predictor.explain_jobs or os.cpu_count()} cores)")
+    print("=" * 80)
+    print(f"{'model':16s} {'batched s':>10s} {'cached s':>10s} {'per-row s (est.)':>17s} {'speed-up':>9s}")
+    
+    for model in ('rf', 'xgb'):
+        for task in ('classifier', 'regressor'):
+            predictor.explain_cache.clear()
+            start = time.perf_counter()
+            predictor.explain(batch, model, task)
+            batched_s = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            predictor.explain(batch, model, task)
+            cached_s = time.perf_counter() - start
+            
+            naive_s = naive_seconds_per_row(predictor, X, model, task, args.naive_rows) * len(batch)
+            print(f"{model + '_' + task:16s} {batched_s:10.2f} {cached_s:10.3f} {naive_s:17.1f} "
+                  f"{naive_s / batched_s:8.1f}x")
+    
+    print("=" * 80)
+    print(f"Explanation cache: {predictor.explain_cache.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Model Loading Benchmark
+Measure predictor start-up time and peak memory for each model subset
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Runs in a fresh interpreter so imports and RSS are not shared between subsets
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+from predict_water_quality import WaterQualityPredictor
+imported = time.perf_counter()
+WaterQualityPredictor({models_dir!r}, models={models!r}, lazy=False, use_bundle={use_bundle!r})
+loaded = time.perf_counter()
+print(json.dumps({{
+    'import_s': imported - start,
+    'load_s': loaded - imported,
+    'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'tensorflow_imported': 'tensorflow' in sys.modules
+}}))
+"""
+
+DEFAULT_SUBSETS = ['rf', 'xgb', 'nn', 'rf,xgb', 'rf,xgb,nn']
+
+
+def measure(models_dir, models, use_bundle):
+    """Start one predictor in a subprocess and return its timings"""
+    code = CHILD.format(src=SRC_DIR, models_dir=models_dir, models=tuple(models),
+                        use_bundle=use_bundle)
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--subsets', nargs='+', default=DEFAULT_SUBSETS,
+                        help="Comma-separated model subsets, e.g. 'rf,xgb'")
+    args = parser.parse_args()
+    
+    sources = [('files', False)]
+    if os.path.exists(os.path.join(args.models_dir, 'model_bundle.wqb')):
+        sources.append(('bundle', True))
+    
+    print("=" * 80)
+    print("MODEL LOADING BENCHMARK")
+    print("=" * 80)
+    print(f"{'models':>12s} {'source':>8s} {'import s':>10s} {'load s':>10s} "
+          f"{'peak RSS MB':>12s} {'TF':>4s}")
+    
+    for subset in args.subsets:
+        for source, use_bundle in sources:
+            stats = measure(args.models_dir, subset.split(','), use_bundle)
+            print(f"{subset:>12s} {source:>8s} {stats['import_s']:>10.3f} {stats['load_s']:>10.3f} "
+                  f"{stats['peak_rss_mb']:>12.1f} {'yes' if stats['tensorflow_imported'] else 'no':>4s}")
+    
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
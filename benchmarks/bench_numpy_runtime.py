@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+NumPy Runtime Benchmark
+Compare the NumPy-only models with the originals on a saved model directory
+(tests/test_numpy_runtime.py checks the export on small freshly fitted models)
+
+Tolerances (max absolute difference on the same preprocessed input):
+  Random Forest   1e-9   (identical float32 comparisons, float64 averaging)
+  XGBoost         1e-3   (XGBoost accumulates leaf values in float32)
+  Neural Network  1e-4   (float32 matmuls with BatchNorm folded in)
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from predict_water_quality import WaterQualityPredictor
+
+TOLERANCE = {'rf': 1e-9, 'xgb': 1e-3, 'nn': 1e-4}
+
+
+def best_time(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def outputs(predictor, model, task, X):
+    """Raw model output: class probabilities or WQI values"""
+    m = predictor._get_model(model, task)
+    if model == 'nn':
+        return m.predict(X, verbose=0)
+    return m.predict_proba(X) if task == 'classifier' else m.predict(X)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--models', default='rf,xgb,nn')
+    parser.add_argument('--rows', type=int, default=10_000)
+    args = parser.parse_args()
+    
+    families = tuple(args.models.split(','))
+    native = WaterQualityPredictor(args.models_dir, models=families, use_bundle=False)
+    exported = WaterQualityPredictor(args.models_dir, models=families, use_bundle=False,
+                                     runtime='numpy')
+    
+    rng = np.random.default_rng(42)
+    medians = np.asarray(native.imputer.statistics_, dtype=float)
+    X = native.preprocess_data(medians * rng.lognormal(0, 0.5, (args.rows, len(medians))))
+    
+    print("=" * 80)
+    print(f"NUMPY RUNTIME BENCHMARK ({args.rows} rows)")
+    print("=" * 80)
+    print(f"{'':>16s} {'':>12s} {'':>10s} {'batch':>21s} {'single row':>21s}")
+    print(f"{'model':>16s} {'max |diff|':>12s} {'tolerance':>10s} {'native ms':>10s} {'numpy ms':>10s} "
+          f"{'native ms':>10s} {'numpy ms':>10s}")
+    
+    failed = False
+    for model in families:
+        for task in ('classifier', 'regressor'):
+            diff = np.abs(outputs(native, model, task, X) - outputs(exported, model, task, X)).max()
+            t_native = best_time(lambda: outputs(native, model, task, X)) * 1000
+            t_numpy = best_time(lambda: outputs(exported, model, task, X)) * 1000
+            t_native_1 = best_time(lambda: outputs(native, model, task, X[:1]), repeat=20) * 1000
+            t_numpy_1 = best_time(lambda: outputs(exported, model, task, X[:1]), repeat=20) * 1000
+            ok = diff <= TOLERANCE[model]
+            failed |= not ok
+            print(f"{model + '_' + task:>16s} {diff:>12.2e} {TOLERANCE[model]:>10.0e} "
+                  f"{t_native:>10.1f} {t_numpy:>10.1f} {t_native_1:>10.2f} {t_numpy_1:>10.2f} "
+                  f"{'✅' if ok else '❌'}")
+    
+    print("=" * 80)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Prediction Cache Benchmark
+Replay a telemetry-like stream with repeated readings with and without the LRU cache
+(tests/test_prediction_cache.py checks that cached results equal uncached ones)
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from predict_water_quality import WaterQualityPredictor
+from prediction_cache import DEFAULT_DECIMALS, INSTRUMENT_DECIMALS
+
+
+def make_stream(predictor, n_rows, repeat_rate, seed=42):
+    """
+    Samples at instrument precision where repeat_rate of the rows re-submit
+    an earlier reading, as unchanged sensors and polling dashboards do
+    """
+    rng = np.random.default_rng(seed)
+    medians = np.asarray(predictor.imputer.statistics_, dtype=float)
+    n_unique = max(1, int(n_rows * (1 - repeat_rate)))
+    
+    unique = medians * rng.lognormal(mean=0.0, sigma=0.4, size=(n_unique, len(medians)))
+    for j, name in enumerate(predictor.feature_names):
+        unique[:, j] = np.round(unique[:, j], INSTRUMENT_DECIMALS.get(name, DEFAULT_DECIMALS))
+    
+    order = np.concatenate([np.arange(n_unique), rng.integers(0, n_unique, n_rows - n_unique)])
+    rng.shuffle(order)
+    return pd.DataFrame(unique[order], columns=predictor.feature_names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--models', default='rf,xgb,nn', help="Comma-separated model families")
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--repeat-rate', type=float, default=0.9)
+    parser.add_argument('--batch-size', type=int, default=64,
+                        help='Rows per predict_ensemble call, like a serving micro-batch')
+    parser.add_argument('--cache-size', type=int, default=100_000)
+    args = parser.parse_args()
+    
+    models = tuple(args.models.split(','))
+    plain = WaterQualityPredictor(args.models_dir, models=models, lazy=False)
+    cached = WaterQualityPredictor(args.models_dir, models=models, lazy=False,
+                                   cache_size=args.cache_size)
+    stream = make_stream(plain, args.rows, args.repeat_rate)
+    batches = [stream.iloc[i:i + args.batch_size] for i in range(0, len(stream), args.batch_size)]
+    
+    print("=" * 80)
+    print(f"PREDICTION CACHE BENCHMARK ({args.rows:,} rows, {args.repeat_rate:.0%} repeats, "
+          f"batches of {args.batch_size})")
+    print("=" * 80)
+    
+    timings = {}
+    for label, predictor in (('no cache', plain), ('cache', cached)):
+        start = time.perf_counter()
+        for b in batches:
+            predictor.predict_ensemble(b)
+        timings[label] = time.perf_counter() - start
+        print(f"{label:>10s}: {timings[label]:8.2f} s  {args.rows / timings[label]:>10,.0f} rows/s")
+    
+    print(f"\n   Speed-up:           {timings['no cache'] / timings['cache']:.1f}x")
+    print(f"   Cache stats:        {cached.cache_stats()}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Preprocessing Benchmark
+Single-sample and batch latency of the fused NumPy kernel vs the pandas path
+(tests/test_preprocess.py checks that both give the same numbers)
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from predict_water_quality import WaterQualityPredictor
+
+
+def pandas_preprocess(predictor, data):
+    """The original DataFrame-based preprocessing"""
+    df = pd.DataFrame([data]) if isinstance(data, dict) else data
+    df = df[predictor.feature_names]
+    df_imputed = pd.DataFrame(predictor.imputer.transform(df), columns=predictor.feature_names)
+    return predictor.scaler.transform(df_imputed)
+
+
+def per_call_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--batch-rows', type=int, default=10_000)
+    args = parser.parse_args()
+    
+    predictor = WaterQualityPredictor(args.models_dir)
+    rng = np.random.default_rng(42)
+    medians = np.asarray(predictor.imputer.statistics_, dtype=float)
+    
+    batch = pd.DataFrame(medians * rng.lognormal(0, 0.4, (args.batch_rows, len(medians))),
+                         columns=predictor.feature_names)
+    batch = batch.mask(rng.random(batch.shape) < 0.1)
+    sample = {k: (None if pd.isna(v) else v) for k, v in batch.iloc[0].items()}
+    
+    print("=" * 80)
+    print("PREPROCESSING BENCHMARK")
+    print("=" * 80)
+    print(f"{'input':>16s} {'pandas µs':>12s} {'numpy µs':>12s} {'speed-up':>10s}")
+    
+    old = per_call_us(lambda: pandas_preprocess(predictor, sample), 200)
+    new = per_call_us(lambda: predictor.preprocess_data(sample), 2000)
+    print(f"{'1 sample (dict)':>16s} {old:>12.1f} {new:>12.1f} {old / new:>9.1f}x")
+    
+    old = per_call_us(lambda: pandas_preprocess(predictor, batch), 5)
+    new = per_call_us(lambda: predictor.preprocess_data(batch), 5)
+    print(f"{f'{args.batch_rows} rows':>16s} {old:>12.1f} {new:>12.1f} {old / new:>9.1f}x")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
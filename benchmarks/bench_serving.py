@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Serving Benchmark
+Local load generator: micro-batched serving vs one predict_all call per request
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from predict_water_quality import WaterQualityPredictor
+from serving import MicroBatcher
+
+
+def make_requests(predictor, n_requests, seed=42):
+    rng = np.random.default_rng(seed)
+    medians = np.asarray(predictor.imputer.statistics_, dtype=float)
+    values = medians * rng.lognormal(0, 0.4, (n_requests, len(medians)))
+    return [dict(zip(predictor.feature_names, row)) for row in values.tolist()]
+
+
+async def run_load(call, samples, concurrency):
+    """Closed-loop load: `concurrency` clients each send requests back to back"""
+    latencies = []
+    pending = iter(samples)
+    
+    async def client():
+        for sample in pending:
+            start = time.perf_counter()
+            await call(sample)
+            latencies.append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return np.array(latencies) * 1000, len(samples) / elapsed
+
+
+async def bench_direct(predictor, samples, concurrency):
+    """Current path: every request is its own predict_all call on one worker thread"""
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        return await run_load(
+            lambda s: loop.run_in_executor(executor, predictor.predict_all, s),
+            samples, concurrency)
+    finally:
+        executor.shutdown()
+
+
+async def bench_batched(predictor, samples, concurrency, max_batch_size, max_delay_ms):
+    batcher = MicroBatcher(predictor, max_batch_size=max_batch_size, max_delay_ms=max_delay_ms)
+    await batcher.start()
+    try:
+        latencies, throughput = await run_load(batcher.predict, samples, concurrency)
+    finally:
+        await batcher.stop()
+    return latencies, throughput, batcher.stats['requests'] / max(batcher.stats['batches'], 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--models', default='rf,xgb,nn')
+    parser.add_argument('--requests', type=int, default=2_000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-delay-ms', type=float, default=2.0)
+    args = parser.parse_args()
+    
+    predictor = WaterQualityPredictor(args.models_dir, models=tuple(args.models.split(',')),
+                                      lazy=False)
+    samples = make_requests(predictor, args.requests)
+    
+    print("=" * 80)
+    print(f"SERVING BENCHMARK ({args.requests} requests, {args.concurrency} concurrent clients)")
+    print("=" * 80)
+    print(f"{'path':>10s} {'p50 ms':>10s} {'p99 ms':>10s} {'req/s':>10s} {'avg batch':>10s}")
+    
+    latencies, throughput = asyncio.run(bench_direct(predictor, samples, args.concurrency))
+    print(f"{'direct':>10s} {np.percentile(latencies, 50):>10.2f} "
+          f"{np.percentile(latencies, 99):>10.2f} {throughput:>10,.0f} {1:>10.1f}")
+    
+    latencies, throughput, avg_batch = asyncio.run(bench_batched(
+        predictor, samples, args.concurrency, args.max_batch_size, args.max_delay_ms))
+    print(f"{'batched':>10s} {np.percentile(latencies, 50):>10.2f} "
+          f"{np.percentile(latencies, 99):>10.2f} {throughput:>10,.0f} {avg_batch:>10.1f}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
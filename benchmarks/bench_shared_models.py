@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Shared Model Memory Benchmark
+Per-worker memory of N predictor processes with private versus memory-mapped models
+
+Every worker loads the selected models, scores the same batch and then holds
+still until all of them are done, so the proportional set size (PSS: shared
+pages divided between the processes that map them) reflects N live workers.
+'model MB' is the private memory a worker gained by loading the models.
+    
+    python benchmarks/bench_shared_models.py --models-dir models --workers 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+CHILD = """
+import json, sys
+sys.path.insert(0, {src!r})
+import numpy as np
+from predict_water_quality import WaterQualityPredictor
+
+def memory():
+    fields = {{}}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {{'rss': fields['Rss'], 'pss': fields['Pss'],
+             'uss': fields['Private_Clean'] + fields['Private_Dirty']}}
+
+before = memory()
+predictor = WaterQualityPredictor({models_dir!r}, models={models!r}, lazy=False,
+                                  use_bundle={use_bundle!r}, runtime={runtime!r})
+rng = np.random.default_rng(0)
+X = rng.normal(size=({rows}, len(predictor.feature_names)))
+predictor.predict_ensemble(X)
+print('ready', flush=True)
+sys.stdin.readline()
+after = memory()
+print(json.dumps({{'before': before, 'after': after}}), flush=True)
+"""
+
+MODES = {
+    # name: (runtime, use_bundle)
+    'native': ('native', True),
+    'numpy-private': ('numpy', False),
+    'numpy-shared': ('numpy', True),
+}
+
+
+def run_workers(n_workers, models_dir, models, mode, rows):
+    """Start n_workers predictors side by side and return each one's memory in MB"""
+    runtime, use_bundle = MODES[mode]
+    code = CHILD.format(src=SRC_DIR, models_dir=models_dir, models=tuple(models),
+                        use_bundle=use_bundle, runtime=runtime, rows=rows)
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3', OMP_NUM_THREADS='1')
+    procs = [subprocess.Popen([sys.executable, '-c', code], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=env)
+             for _ in range(n_workers)]
+    try:
+        for proc in procs:
+            # Skip the predictor's own log lines
+            for line in proc.stdout:
+                if line.strip() == 'ready':
+                    break
+            else:
+                raise RuntimeError(f"A {mode} worker failed to start")
+        for proc in procs:
+            proc.stdin.write('\n')
+            proc.stdin.flush()
+        return [json.loads(proc.stdout.readline()) for proc in procs]
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--models', default='rf,xgb', help="Comma-separated model families")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--rows', type=int, default=1_000, help='Rows scored by each worker')
+    args = parser.parse_args()
+    
+    models = args.models.split(',')
+    print("=" * 80)
+    print(f"SHARED MODEL MEMORY BENCHMARK (models: {args.models})")
+    print("=" * 80)
+    print(f"{'mode':>14s} {'workers':>8s} {'RSS MB':>9s} {'PSS MB':>9s} {'USS MB':>9s} "
+          f"{'model MB':>9s} {'total PSS MB':>13s}")
+    
+    for mode in args.modes:
+        for n_workers in args.workers:
+            stats = run_workers(n_workers, args.models_dir, models, mode, args.rows)
+            mean = lambda key, field: sum(s[key][field] for s in stats) / len(stats)
+            model_mb = mean('after', 'uss') - mean('before', 'uss')
+            total_pss = sum(s['after']['pss'] for s in stats)
+            print(f"{mode:>14s} {n_workers:>8d} {mean('after', 'rss'):>9.1f} "
+                  f"{mean('after', 'pss'):>9.1f} {mean('after', 'uss'):>9.1f} "
+                  f"{model_mb:>9.1f} {total_pss:>13.1f}")
+    
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Station Store Benchmark
+Build a multi-year store from synthetic readings and time station lookups
+
+A cleaned, labelled synthetic sample is resampled into --periods monthly
+periods of --rows total readings. Station codes are spread over --stations
+stations (each keeps its real water body), so the store has the shape of a
+long-running network rather than 200 stations sampled thousands of times.
+tests/test_station_store.py checks the aggregates against the readings.
+    
+    python benchmarks/bench_station_store.py --rows 20000000 --periods 60
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from ingest import load_clean_data
+from station_store import StationStore
+from synthetic_data import generate_csv
+from wqi import STANDARDS, calculate_wqi_frame, classify_wqi_array
+
+
+def labelled_sample(n_rows, seed):
+    with tempfile.TemporaryDirectory() as tmp:
+        df = load_clean_data(generate_csv(os.path.join(tmp, 'sample.csv'), n_rows, seed=seed))
+    df['WQI'] = calculate_wqi_frame(df, STANDARDS)
+    df['Water_Quality_Class'] = classify_wqi_array(df['WQI'])
+    return df.dropna(subset=['Station code', 'WQI']).reset_index(drop=True)
+
+
+def period_names(n_periods, first_year=2020):
+    return [f'{first_year + m // 12}-{m % 12 + 1:02d}' for m in range(n_periods)]
+
+
+def timings(fn, args):
+    seconds = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        seconds.append(time.perf_counter() - start)
+    return np.median(seconds), np.max(seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the station history store")
+    parser.add_argument('--rows', type=int, default=2_000_000, help='Readings over all periods')
+    parser.add_argument('--periods', type=int, default=24)
+    parser.add_argument('--stations', type=int, default=5_000)
+    parser.add_argument('--sample-rows', type=int, default=50_000)
+    parser.add_argument('--lookups', type=int, default=50)
+    parser.add_argument('--root', help='Store directory (default: a temporary one)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(args.seed)
+    base = labelled_sample(args.sample_rows, args.seed)
+    n_base = base['Station code'].nunique()
+    replicas = max(1, args.stations // n_base)
+    
+    root = args.root or tempfile.mkdtemp(prefix='station_store_')
+    store = StationStore(root)
+    per_period = args.rows // args.periods
+    
+    print("=" * 80)
+    print(f"STATION STORE: {per_period * args.periods:,} readings, {args.periods} periods, "
+          f"~{replicas * n_base:,} stations")
+    print("=" * 80)
+    
+    append_s = []
+    for period in period_names(args.periods):
+        rows = base.iloc[rng.integers(0, len(base), per_period)].reset_index(drop=True)
+        # Station k of replica r becomes code k * replicas + r on the same water body
+        codes = rows['Station code'].to_numpy(dtype=np.int64)
+        rows['Station code'] = codes * replicas + rng.integers(0, replicas, per_period)
+        start = time.perf_counter()
+        store.append(rows, period)
+        append_s.append(time.perf_counter() - start)
+    
+    size_mb = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files) / 2**20
+    print(f"append per period   median {np.median(append_s):8.3f}s   max {np.max(append_s):8.3f}s"
+          f"   ({per_period / np.median(append_s):,.0f} rows/s, store {size_mb:,.0f} MB)")
+    
+    # Fresh instance, so the first lookup also pays for loading the aggregates
+    store = StationStore(root)
+    start = time.perf_counter()
+    stations = store.stations()
+    print(f"station index       {time.perf_counter() - start:8.3f}s   ({len(stations):,} stations)")
+    
+    codes = rng.choice(stations.index.to_numpy(), args.lookups, replace=False)
+    bodies = stations['water_body'].unique()
+    first, last = store.periods()[0], store.periods()[-1]
+    mid = store.periods()[len(store.periods()) // 2]
+    
+    checks = [
+        ('station_history', lambda code: store.station_history(code), codes),
+        ('station_history 1y', lambda code: store.station_history(code, start=mid), codes),
+        ('station_trend', lambda code: store.station_trend(code), codes),
+        ('water_body_trend', lambda body: store.water_body_trend(body, start=mid), bodies),
+        ('water_body_history', lambda body: store.water_body_history(
+            body, start=last, columns=['Station code', 'period', 'WQI']), bodies)
+    ]
+    for name, fn, targets in checks:
+        median_s, max_s = timings(fn, targets)
+        print(f"{name:19s} median {median_s:8.4f}s   max {max_s:8.4f}s   ({len(targets)} lookups)")
+    
+    print(f"Station {codes[0]}: {len(store.station_history(codes[0]))} readings over "
+          f"{len(store.station_trend(codes[0]))} periods ({first} to {last})")
+    
+    if not args.root:
+        shutil.rmtree(root)
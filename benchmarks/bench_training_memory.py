@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Training Data Memory Benchmark
+Peak memory of preparing and staging the training matrices, old copy chain vs training_data.py
+
+Each path runs in a fresh interpreter on the same synthetic dataset (see
+synthetic_data.py). Only the memory it adds on top of the loaded, labelled
+DataFrame is counted: the peak RSS above the RSS before it started, shown
+also as a multiple of the float64 feature columns of the dataset.
+tests/test_training_data.py checks that the lean matrix matches the old one.
+    
+    python benchmarks/bench_training_memory.py --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+from ingest import KEY_PARAMETERS, load_clean_data
+from instrumentation import peak_rss_mb, reset_peak_rss, rss_mb
+from synthetic_data import generate_csv, profile_csv
+from training import stage_data
+from training_data import prepare_training_data
+from wqi import STANDARDS, calculate_wqi_frame, classify_wqi_array
+
+
+def load_labelled(path):
+    df = load_clean_data(path)
+    df['WQI'] = calculate_wqi_frame(df, STANDARDS)
+    df['Water_Quality_Class'] = classify_wqi_array(df['WQI'])
+    return df.dropna(subset=['WQI', 'Water_Quality_Class'])
+
+
+def legacy_path(df, features, work_dir):
+    """Feature preparation of run_analysis.py and train_parallel's staging before training_data.py"""
+    from sklearn.impute import SimpleImputer
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    
+    X = df[features].copy()
+    y_class = df['Water_Quality_Class'].copy()
+    y_wqi = df['WQI'].copy()
+    imputer = SimpleImputer(strategy='median')
+    X_imputed = pd.DataFrame(imputer.fit_transform(X), columns=X.columns, index=X.index)
+    y_class_encoded = LabelEncoder().fit_transform(y_class)
+    
+    X_train_class, X_test_class, y_train_class, y_test_class = train_test_split(
+        X_imputed, y_class_encoded, test_size=0.2, random_state=42, stratify=y_class_encoded)
+    X_train_reg, X_test_reg, y_train_reg, y_test_reg = train_test_split(
+        X_imputed, y_wqi, test_size=0.2, random_state=42)
+    scaler = StandardScaler()
+    X_train_class_scaled = scaler.fit_transform(X_train_class)
+    X_test_class_scaled = scaler.transform(X_test_class)
+    X_train_reg_scaled = scaler.fit_transform(X_train_reg)
+    X_test_reg_scaled = scaler.transform(X_test_reg)
+    
+    np.savez(os.path.join(work_dir, 'train_data.npz'),
+             X_train_class=X_train_class_scaled, y_train_class=y_train_class,
+             X_test_class=X_test_class_scaled, y_test_class=y_test_class,
+             X_train_reg=X_train_reg_scaled, y_train_reg=y_train_reg.to_numpy(),
+             X_test_reg=X_test_reg_scaled, y_test_reg=y_test_reg.to_numpy(),
+             n_classes=len(np.unique(y_class_encoded)))
+
+
+def lean_path(df, features, work_dir):
+    data = prepare_training_data(df, features)
+    stage_data(work_dir, data.X, data.y_class, data.y_wqi, data.n_train,
+               len(data.label_encoder.classes_))
+
+
+PATHS = {'legacy': legacy_path, 'lean': lean_path}
+
+
+def run_child(path, csv_path):
+    df = load_labelled(csv_path)
+    features = [col for col in KEY_PARAMETERS if col in df.columns]
+    dataset_mb = len(df) * len(features) * 8 / 2**20
+    
+    # Imported up front so module memory is not counted against either path
+    import sklearn.impute, sklearn.model_selection, sklearn.preprocessing
+    
+    with tempfile.TemporaryDirectory(prefix='wq_bench_') as work_dir:
+        reset_peak_rss()
+        before = rss_mb()
+        PATHS[path](df, features, work_dir)
+        peak = peak_rss_mb()
+    print(json.dumps({'rows': len(df), 'dataset_mb': dataset_mb, 'before_mb': before,
+                      'peak_mb': peak, 'growth_mb': peak - before}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Synthetic CSV rows')
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--child', choices=list(PATHS), help=argparse.SUPPRESS)
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        run_child(args.child, args.csv)
+        return
+    
+    os.makedirs(args.data_dir, exist_ok=True)
+    csv_path = os.path.join(args.data_dir, f'synthetic_{args.rows}_seed{args.seed}.csv')
+    if not os.path.exists(csv_path):
+        generate_csv(csv_path, args.rows, profile_csv(), seed=args.seed)
+    
+    print("=" * 80)
+    print(f"TRAINING DATA MEMORY BENCHMARK ({args.rows:,} synthetic rows)")
+    print("=" * 80)
+    print(f"{'path':>8s} {'rows':>10s} {'dataset MB':>11s} {'peak MB':>9s} {'growth MB':>10s} "
+          f"{'x dataset':>10s}")
+    
+    for path in PATHS:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', path,
+                               '--csv', csv_path], capture_output=True, text=True, check=True)
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{path:>8s} {r['rows']:>10,d} {r['dataset_mb']:>11.1f} {r['peak_mb']:>9.1f} "
+              f"{r['growth_mb']:>10.1f} {r['growth_mb'] / r['dataset_mb']:>10.2f}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
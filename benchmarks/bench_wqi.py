@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+WQI Engine Benchmark
+Time the vectorized WQI engine against the scalar reference
+(tests/test_wqi.py checks that the two agree)
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from wqi import STANDARDS, calculate_wqi, calculate_wqi_frame
+
+
+def make_readings(n_rows, missing_rate=0.15, seed=42):
+    """Synthetic readings spanning in-range, boundary and out-of-range values"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for param, std in STANDARDS.items():
+        values = rng.uniform(0, std['max'] * 2.5, n_rows)
+        # Exact boundaries exercise the <= / >= branches
+        values[rng.random(n_rows) < 0.02] = std['max']
+        values[rng.random(n_rows) < 0.02] = std['min']
+        values[rng.random(n_rows) < missing_rate] = np.nan
+        data[param] = values
+    df = pd.DataFrame(data)
+    # A few rows with nothing usable must come back as NaN
+    df.iloc[:min(3, n_rows)] = np.nan
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000])
+    parser.add_argument('--max-scalar-rows', type=int, default=50_000,
+                        help='Largest size also timed through the scalar row-wise apply')
+    args = parser.parse_args()
+    
+    print("=" * 80)
+    print("WQI ENGINE BENCHMARK")
+    print("=" * 80)
+    
+    print(f"{'rows':>10s} {'engine':>10s} {'seconds':>10s} {'rows/s':>14s}")
+    for n_rows in args.sizes:
+        df = make_readings(n_rows)
+        
+        start = time.perf_counter()
+        calculate_wqi_frame(df, STANDARDS)
+        elapsed = time.perf_counter() - start
+        print(f"{n_rows:>10d} {'vector':>10s} {elapsed:>10.3f} {n_rows / elapsed:>14,.0f}")
+        
+        if n_rows <= args.max_scalar_rows:
+            start = time.perf_counter()
+            df.apply(lambda row: calculate_wqi(row, STANDARDS), axis=1)
+            elapsed = time.perf_counter() - start
+            print(f"{n_rows:>10d} {'scalar':>10s} {elapsed:>10.3f} {n_rows / elapsed:>14,.0f}")
+    
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
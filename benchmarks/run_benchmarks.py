@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Time ingestion, WQI, model fits and inference on synthetic data and write a JSON report
+
+Each size gets its own synthetic CSV (see synthetic_data.py), generated once
+per seed and reused from --data-dir. Reports from two commits can be compared
+with --compare; any timing that got slower by more than --threshold is listed
+and makes the script exit with status 1.
+    
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 1000000
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<old>.json
+"""
+
+import argparse
+import importlib.metadata
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+from ingest import KEY_PARAMETERS, load_clean_data
+from synthetic_data import generate_csv, profile_csv
+from wqi import STANDARDS, calculate_wqi_frame, classify_wqi_array
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+def time_call(fn, repeat=3):
+    """Best-of-N wall time in seconds and the last return value"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def environment():
+    """Versions and hardware the numbers were measured on"""
+    versions = {'python': platform.python_version(), 'numpy': np.__version__,
+                'pandas': pd.__version__}
+    # Read from package metadata so TensorFlow isn't imported just for its version
+    for dist in ('scikit-learn', 'xgboost', 'tensorflow', 'tensorflow-cpu', 'pyarrow'):
+        try:
+            versions[dist] = importlib.metadata.version(dist)
+        except importlib.metadata.PackageNotFoundError:
+            pass
+    return {'platform': platform.platform(), 'cpu_count': os.cpu_count(), **versions}
+
+
+# ============================================================================
+# Stages
+# ============================================================================
+
+def bench_ingest(path, n_rows, repeat):
+    seconds, df = time_call(lambda: load_clean_data(path), repeat)
+    return [{'stage': 'ingest', 'rows': n_rows, 'seconds': seconds,
+             'rows_per_s': n_rows / seconds, 'rows_kept': len(df)}], df
+
+
+def bench_wqi(df, repeat):
+    n_rows = len(df)
+    wqi_s, wqi = time_call(lambda: calculate_wqi_frame(df, STANDARDS), repeat)
+    class_s, labels = time_call(lambda: classify_wqi_array(wqi), repeat)
+    df = df.assign(WQI=wqi, Water_Quality_Class=labels).dropna(subset=['WQI'])
+    return [
+        {'stage': 'wqi', 'rows': n_rows, 'seconds': wqi_s, 'rows_per_s': n_rows / wqi_s},
+        {'stage': 'classify', 'rows': n_rows, 'seconds': class_s, 'rows_per_s': n_rows / class_s}
+    ], df
+
+
+def bench_fits(df, names, n_threads, seed):
+    """
+    Fit each model on its own, with the training settings of run_analysis.py
+    
+    Fits go through train_parallel one model at a time, so every model runs in
+    a fresh interpreter with the whole thread budget and nothing competing.
+    """
+    from training import train_parallel
+    from training_data import prepare_training_data
+    
+    features = [col for col in KEY_PARAMETERS if col in df.columns]
+    data = prepare_training_data(df, features, random_state=seed)
+    
+    results = []
+    for name in names:
+        _, reports = train_parallel(data.X, data.y_class, data.y_wqi, data.n_train,
+                                    n_classes=len(data.label_encoder.classes_),
+                                    names=(name,), total_cores=n_threads)
+        report = reports[name]
+        results.append({'stage': 'fit', 'model': name, 'rows': data.n_train,
+                        'seconds': report['fit_s'], 'rows_per_s': data.n_train / report['fit_s'],
+                        **{k: v for k, v in report.items() if k != 'fit_s'}})
+    return results
+
+
+def bench_inference(predictor, df, max_rows, single_calls, repeat):
+    """Single-sample latency of predict_all and batch throughput of predict_ensemble"""
+    results = []
+    batch = df[predictor.feature_names].iloc[:max_rows]
+    
+    samples = batch.iloc[:single_calls].to_dict('records')
+    predictor.predict_all(samples[0])  # warm-up
+    latencies = []
+    for sample in samples:
+        start = time.perf_counter()
+        predictor.predict_all(sample)
+        latencies.append(time.perf_counter() - start)
+    results.append({'stage': 'predict_single', 'rows': len(samples),
+                    'seconds': float(np.median(latencies)),
+                    'p99_s': float(np.percentile(latencies, 99)),
+                    'rows_per_s': 1 / float(np.median(latencies))})
+    
+    seconds, _ = time_call(lambda: predictor.predict_ensemble(batch), repeat)
+    results.append({'stage': 'predict_batch', 'rows': len(batch), 'seconds': seconds,
+                    'rows_per_s': len(batch) / seconds})
+    return results
+
+
+# ============================================================================
+# Comparison
+# ============================================================================
+
+def result_key(result):
+    return result['stage'], result.get('model', ''), result['dataset_rows']
+
+
+def compare_reports(old, new, threshold):
+    """
+    Match results by (stage, model, synthetic dataset size)
+    
+    Returns:
+    --------
+    list of dict : every matched timing with its old/new seconds and ratio
+    """
+    old_results = {result_key(r): r for r in old['results']}
+    rows = []
+    for r in new['results']:
+        before = old_results.get(result_key(r))
+        if before is None:
+            continue
+        ratio = r['seconds'] / before['seconds']
+        rows.append({'stage': r['stage'], 'model': r.get('model', ''), 'rows': r['dataset_rows'],
+                     'old_s': before['seconds'], 'new_s': r['seconds'], 'ratio': ratio,
+                     'regression': ratio > 1 + threshold})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help='Synthetic CSV sizes in rows (up to 10**7)')
+    parser.add_argument('--stages', nargs='+', default=['ingest', 'wqi', 'fit', 'inference'],
+                        choices=['ingest', 'wqi', 'fit', 'inference'])
+    parser.add_argument('--fit-models', default='rf_classifier,xgb_classifier,nn_classifier,'
+                        'rf_regressor,xgb_regressor,nn_regressor')
+    parser.add_argument('--max-fit-rows', type=int, default=10_000,
+                        help='Larger cleaned datasets are subsampled before fitting')
+    parser.add_argument('--threads', type=int, default=os.cpu_count())
+    parser.add_argument('--models-dir', default='models',
+                        help='Trained artifacts used for the inference stage')
+    parser.add_argument('--max-batch-rows', type=int, default=100_000)
+    parser.add_argument('--single-calls', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'))
+    parser.add_argument('--output', help='Report path (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='Earlier report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Relative slow-down reported as a regression')
+    args = parser.parse_args()
+    
+    os.makedirs(args.data_dir, exist_ok=True)
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'environment': environment(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'results': []
+    }
+    
+    predictor = None
+    if 'inference' in args.stages:
+        from predict_water_quality import WaterQualityPredictor
+        predictor = WaterQualityPredictor(args.models_dir, lazy=False)
+    
+    profile = profile_csv()
+    report['data_profile'] = profile['rates']
+    
+    print("=" * 80)
+    print(f"BENCHMARK SUITE (commit {commit})")
+    print("=" * 80)
+    print(f"{'stage':16s} {'model':16s} {'rows':>10s} {'seconds':>10s} {'rows/s':>14s}")
+    
+    for n_rows in args.sizes:
+        path = os.path.join(args.data_dir, f'synthetic_{n_rows}_seed{args.seed}.csv')
+        if not os.path.exists(path):
+            generate_csv(path, n_rows, profile, seed=args.seed)
+        
+        # Later stages need the cleaned frame even when ingestion isn't reported
+        ingest_results, df = bench_ingest(path, n_rows,
+                                          args.repeat if 'ingest' in args.stages else 1)
+        results = ingest_results if 'ingest' in args.stages else []
+        wqi_results, df = bench_wqi(df, args.repeat)
+        if 'wqi' in args.stages:
+            results += wqi_results
+        
+        if 'fit' in args.stages:
+            fit_df = df
+            if len(df) > args.max_fit_rows:
+                fit_df = df.sample(args.max_fit_rows, random_state=args.seed)
+            results += bench_fits(fit_df, args.fit_models.split(','), args.threads, args.seed)
+        if predictor is not None:
+            results += bench_inference(predictor, df, args.max_batch_rows,
+                                       args.single_calls, args.repeat)
+        
+        for r in results:
+            r['dataset_rows'] = n_rows
+            print(f"{r['stage']:16s} {r.get('model', ''):16s} {r['rows']:>10,d} "
+                  f"{r['seconds']:>10.4f} {r['rows_per_s']:>14,.0f}")
+        report['results'] += results
+    
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("=" * 80)
+    print(f"✅ Report written to {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare_reports(baseline, report, args.threshold)
+        
+        print()
+        print(f"Comparison with {baseline['commit']} (regression > {args.threshold:.0%} slower):")
+        for row in rows:
+            flag = '❌' if row['regression'] else '  '
+            print(f" {flag} {row['stage']:16s} {row['model']:16s} {row['rows']:>10,d} "
+                  f"{row['old_s']:>10.4f} → {row['new_s']:>10.4f}  ({row['ratio']:.2f}x)")
+        
+        regressions = [row for row in rows if row['regression']]
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s)")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Synthetic Monitoring Data
+Generate station data at any scale with the noise profile of the real CSV
+
+Rows are bootstrapped from Water_Quality_Data_06_2025.csv, so blank cells,
+'BDL'/'NIL'/'Less than 1.8' markers, invalid-sample remarks and station
+metadata keep their real frequencies and co-occurrence. Every numeric key
+parameter reading is then jittered multiplicatively and re-rounded to the
+column's reporting precision, so no two generated rows are copies.
+"""
+
+import argparse
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from ingest import KEY_PARAMETERS
+
+REFERENCE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', 'docs', 'data', 'Water_Quality_Data_06_2025.csv')
+
+NUMBER = re.compile(r'^-?\d+(\.\d+)?$')
+
+
+def profile_csv(path=REFERENCE_CSV):
+    """
+    Summarize the reference CSV for generation
+    
+    Returns:
+    --------
+    dict : 'columns' (header order), 'rows' (object array of the raw cells),
+        'numeric' (key parameter -> mask of cells holding plain numbers),
+        'decimals' (key parameter -> reporting precision) and 'rates'
+        (key parameter -> {'missing': ..., '<marker>': ...} cell fractions)
+    """
+    raw = pd.read_csv(path, dtype=str, keep_default_na=False)
+    profile = {'columns': list(raw.columns), 'rows': raw.to_numpy(dtype=object),
+               'numeric': {}, 'decimals': {}, 'rates': {}}
+    
+    for col in KEY_PARAMETERS:
+        if col not in raw:
+            continue
+        cells = raw[col].str.strip()
+        numeric = cells.str.match(NUMBER).to_numpy()
+        decimals = cells[numeric].str.partition('.')[2].str.len()
+        
+        profile['numeric'][col] = numeric
+        profile['decimals'][col] = int(decimals.max()) if len(decimals) else 0
+        rates = {'missing': float((cells == '').mean())}
+        for marker, count in cells[~numeric & (cells != '')].value_counts().items():
+            rates[marker] = count / len(cells)
+        profile['rates'][col] = rates
+    return profile
+
+
+def generate_frame(profile, n_rows, rng, jitter=0.15):
+    """One DataFrame of n_rows raw (string/float) cells in the reference layout"""
+    idx = rng.integers(0, len(profile['rows']), n_rows)
+    cells = profile['rows'][idx]
+    
+    for col, numeric in profile['numeric'].items():
+        j = profile['columns'].index(col)
+        picked = numeric[idx]
+        values = cells[picked, j].astype(np.float64)
+        values *= rng.lognormal(0.0, jitter, len(values))
+        column = cells[:, j].copy()
+        column[picked] = np.round(values, profile['decimals'][col])
+        cells[:, j] = column
+    
+    return pd.DataFrame(cells, columns=profile['columns'])
+
+
+def generate_csv(path, n_rows, profile=None, seed=42, chunk_rows=200_000, jitter=0.15):
+    """
+    Write n_rows synthetic samples to path, chunk by chunk
+    
+    Parameters:
+    -----------
+    path : str
+        Output CSV
+    n_rows : int
+        Rows to generate (10**7 and beyond stream in bounded memory)
+    profile : dict, optional
+        Result of profile_csv(); the bundled reference CSV by default
+    seed : int
+        Random seed; the same seed and size always give the same file
+    chunk_rows : int
+        Rows generated and written per chunk
+    jitter : float
+        Sigma of the lognormal noise applied to numeric readings
+    """
+    profile = profile or profile_csv()
+    rng = np.random.default_rng(seed)
+    
+    with open(path, 'w', newline='') as f:
+        written = 0
+        while written < n_rows:
+            n = min(chunk_rows, n_rows - written)
+            generate_frame(profile, n, rng, jitter).to_csv(f, index=False, header=written == 0)
+            written += n
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic monitoring CSV")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reference', default=REFERENCE_CSV)
+    args = parser.parse_args()
+    
+    generate_csv(args.output, args.rows, profile_csv(args.reference), seed=args.seed)
+    print(f"✅ Wrote {args.rows:,} rows to {args.output} "
+          f"({os.path.getsize(args.output) / 2**20:.1f} MB)")
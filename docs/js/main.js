@@ -1,36 +1,103 @@
 // Water Quality Dashboard - Main JavaScript
 
+// Pre-aggregated artifacts written by scripts/run_analysis.py (src/dashboard_data.py)
+const DATA_DIR = 'data/dashboard';
+
 // Initialize when DOM is loaded
 document.addEventListener('DOMContentLoaded', function() {
     initializeCharts();
+    setupStationLookup();
     setupPredictionForm();
     setupSmoothScroll();
 });
 
+// Fetch a dashboard artifact once; later calls share the same promise
+const artifactCache = {};
+function loadArtifact(name) {
+    if (!artifactCache[name]) {
+        artifactCache[name] = fetch(`${DATA_DIR}/${name}`).then(response => {
+            if (!response.ok) throw new Error(`${name}: HTTP ${response.status}`);
+            return response.json();
+        });
+    }
+    return artifactCache[name];
+}
+
+const CLASS_COLORS = {
+    'Safe/Potable': 'rgba(16, 185, 129, 0.8)',
+    'Polluted': 'rgba(245, 158, 11, 0.8)',
+    'Highly Polluted': 'rgba(239, 68, 68, 0.8)'
+};
+
+function classifyWQI(wqi) {
+    if (wqi >= 70) return 'Safe/Potable';
+    if (wqi >= 40) return 'Polluted';
+    return 'Highly Polluted';
+}
+
 // Initialize all charts
-function initializeCharts() {
-    createQualityPieChart();
-    createWaterBodyBarChart();
-    createFeatureImportanceChart();
-    createWQIHistogramChart();
+async function initializeCharts() {
+    try {
+        const [summary, waterBodies, importances] = await Promise.all([
+            loadArtifact('summary.json'),
+            loadArtifact('water_bodies.json'),
+            loadArtifact('feature_importance.json')
+        ]);
+        updateStatistics(summary);
+        createQualityPieChart(summary);
+        createWaterBodyBarChart(waterBodies);
+        createFeatureImportanceChart(importances);
+        createWQIHistogramChart(summary);
+    } catch (error) {
+        console.error('Could not load dashboard data:', error);
+    }
+}
+
+// Headline numbers and metric cards
+function updateStatistics(summary) {
+    const setText = (id, text) => {
+        const element = document.getElementById(id);
+        if (element) element.textContent = text;
+    };
+    const counts = summary.class_counts;
+    const total = Object.values(counts).reduce((a, b) => a + b, 0);
+    const percent = count => `${((count / total) * 100).toFixed(1)}%`;
+
+    setText('totalSamples', summary.samples);
+    setText('totalStations', summary.stations);
+    setText('safePercent', percent(counts['Safe/Potable']));
+    setText('safeCount', `${counts['Safe/Potable']} samples`);
+    setText('pollutedPercent', percent(counts['Polluted']));
+    setText('pollutedCount', `${counts['Polluted']} samples`);
+    setText('highlyPollutedPercent', percent(counts['Highly Polluted']));
+    setText('highlyPollutedCount', `${counts['Highly Polluted']} samples`);
+    setText('avgWQI', summary.wqi_mean.toFixed(2));
+    setText('avgWQILabel', {
+        'Safe/Potable': 'Good Quality',
+        'Polluted': 'Moderate Pollution',
+        'Highly Polluted': 'Severe Pollution'
+    }[classifyWQI(summary.wqi_mean)]);
+
+    const models = Object.values(summary.models);
+    const accuracies = models.filter(m => m.accuracy !== undefined).map(m => m.accuracy);
+    if (models.length) setText('modelCount', models.length);
+    if (accuracies.length) setText('bestAccuracy', `${(Math.max(...accuracies) * 100).toFixed(2)}%`);
 }
 
 // Water Quality Distribution Pie Chart
-function createQualityPieChart() {
+function createQualityPieChart(summary) {
     const ctx = document.getElementById('qualityPieChart');
     if (!ctx) return;
 
+    const labels = Object.keys(summary.class_counts);
+
     new Chart(ctx, {
         type: 'doughnut',
         data: {
-            labels: ['Safe/Potable', 'Polluted', 'Highly Polluted'],
+            labels: labels,
             datasets: [{
-                data: [3, 118, 44],
-                backgroundColor: [
-                    'rgba(16, 185, 129, 0.8)',
-                    'rgba(245, 158, 11, 0.8)',
-                    'rgba(239, 68, 68, 0.8)'
-                ],
+                data: labels.map(label => summary.class_counts[label]),
+                backgroundColor: labels.map(label => CLASS_COLORS[label]),
                 borderWidth: 2,
                 borderColor: '#fff'
             }]
@@ -65,17 +132,17 @@ function createQualityPieChart() {
 }
 
 // Water Body Comparison Bar Chart
-function createWaterBodyBarChart() {
+function createWaterBodyBarChart(waterBodies) {
     const ctx = document.getElementById('waterBodyBarChart');
     if (!ctx) return;
 
     new Chart(ctx, {
         type: 'bar',
         data: {
-            labels: ['River Godavari', 'River Krishna', 'River Musi', 'River Manjeera', 'Lakes & Tanks', 'Other Rivers'],
+            labels: waterBodies.map(body => body.name),
             datasets: [{
                 label: 'Average WQI',
-                data: [52, 51, 28, 48, 44, 50],
+                data: waterBodies.map(body => body.wqi_mean),
                 backgroundColor: 'rgba(37, 99, 235, 0.7)',
                 borderColor: 'rgba(37, 99, 235, 1)',
                 borderWidth: 2
@@ -117,6 +184,9 @@ function createWaterBodyBarChart() {
                             if (value < 40) quality = 'Highly Polluted';
                             else if (value < 70) quality = 'Polluted';
                             return `WQI: ${value} (${quality})`;
+                        },
+                        afterLabel: function(context) {
+                            return `Samples: ${waterBodies[context.dataIndex].samples}`;
                         }
                     }
                 },
@@ -156,40 +226,23 @@ function createWaterBodyBarChart() {
 }
 
 // Feature Importance Chart
-function createFeatureImportanceChart() {
+function createFeatureImportanceChart(importances) {
     const ctx = document.getElementById('featureImportanceChart');
     if (!ctx) return;
 
+    // Already sorted, highest first; drop the units from the labels
+    const top = importances.slice(0, 10);
+    const palette = ['239, 68, 68', '245, 158, 11', '14, 165, 233', '16, 185, 129', '139, 92, 246'];
+
     new Chart(ctx, {
         type: 'bar',
         data: {
-            labels: [
-                'Total Coliform',
-                'Fecal Coliform',
-                'BOD',
-                'COD',
-                'DO',
-                'TDS',
-                'pH',
-                'Turbidity',
-                'Nitrate',
-                'Chloride'
-            ],
+            labels: top.map(item => item.feature.replace(/\s*\(.*\)$/, '')),
             datasets: [{
                 label: 'Importance Score',
-                data: [0.18, 0.16, 0.14, 0.12, 0.11, 0.09, 0.07, 0.05, 0.04, 0.04],
-                backgroundColor: [
-                    'rgba(239, 68, 68, 0.7)',
-                    'rgba(239, 68, 68, 0.6)',
-                    'rgba(245, 158, 11, 0.7)',
-                    'rgba(245, 158, 11, 0.6)',
-                    'rgba(14, 165, 233, 0.7)',
-                    'rgba(14, 165, 233, 0.6)',
-                    'rgba(16, 185, 129, 0.7)',
-                    'rgba(16, 185, 129, 0.6)',
-                    'rgba(139, 92, 246, 0.7)',
-                    'rgba(139, 92, 246, 0.6)'
-                ],
+                data: top.map(item => item.importance),
+                backgroundColor: top.map((_, i) =>
+                    `rgba(${palette[Math.floor(i / 2) % palette.length]}, ${i % 2 ? 0.6 : 0.7})`),
                 borderWidth: 2,
                 borderColor: '#fff'
             }]
@@ -201,7 +254,6 @@ function createFeatureImportanceChart() {
             scales: {
                 x: {
                     beginAtZero: true,
-                    max: 0.2,
                     title: {
                         display: true,
                         text: 'Feature Importance'
@@ -226,23 +278,16 @@ function createFeatureImportanceChart() {
 }
 
 // WQI Distribution Histogram
-function createWQIHistogramChart() {
+function createWQIHistogramChart(summary) {
     const ctx = document.getElementById('wqiHistogramChart');
     if (!ctx) return;
 
-    // Real data from analysis: WQI distribution across 165 samples
-    const wqiDistribution = {
-        '0-10': 2,
-        '10-20': 8,
-        '20-30': 15,
-        '30-40': 19,
-        '40-50': 45,
-        '50-60': 38,
-        '60-70': 28,
-        '70-80': 8,
-        '80-90': 2,
-        '90-100': 0
-    };
+    // Bin counts computed by the pipeline over all samples of the period
+    const edges = summary.wqi_histogram.edges;
+    const wqiDistribution = {};
+    summary.wqi_histogram.counts.forEach((count, i) => {
+        wqiDistribution[`${edges[i]}-${edges[i + 1]}`] = count;
+    });
 
     new Chart(ctx, {
         type: 'bar',
@@ -275,7 +320,7 @@ function createWQIHistogramChart() {
                 y: {
                     beginAtZero: true,
                     ticks: {
-                        stepSize: 5
+                        precision: 0
                     },
                     title: {
                         display: true,
@@ -303,7 +348,7 @@ function createWQIHistogramChart() {
                 },
                 title: {
                     display: true,
-                    text: 'Distribution of 165 Water Samples',
+                    text: `Distribution of ${summary.samples} Water Samples (${summary.period})`,
                     font: {
                         size: 14
                     },
@@ -332,6 +377,82 @@ function createWQIHistogramChart() {
     });
 }
 
+// Station series live in shards (station code % shard count); only the
+// shard of the requested station is downloaded, once
+async function loadStationSeries(stationCode) {
+    const index = await loadArtifact('stations/index.json');
+    const shard = String(stationCode % index.shards).padStart(2, '0');
+    const series = await loadArtifact(`stations/shard-${shard}.json`);
+    return series[String(stationCode)] || null;
+}
+
+// Station WQI Trend Line Chart
+let stationTrendChart = null;
+function setupStationLookup() {
+    const form = document.getElementById('stationForm');
+    if (!form) return;
+
+    form.addEventListener('submit', async function(e) {
+        e.preventDefault();
+        const code = parseInt(document.getElementById('stationCode').value);
+        const info = document.getElementById('stationInfo');
+        if (isNaN(code)) return;
+
+        let station = null;
+        try {
+            station = await loadStationSeries(code);
+        } catch (error) {
+            console.error('Could not load station series:', error);
+        }
+        if (!station) {
+            info.textContent = `No data for station ${code}`;
+            return;
+        }
+
+        const last = station.wqi_mean.length - 1;
+        info.textContent = `${station.name} (${station.water_body}): ` +
+            `WQI ${station.wqi_mean[last]} in ${station.periods[last]}, ${station.class[last]}`;
+
+        if (stationTrendChart) stationTrendChart.destroy();
+        stationTrendChart = new Chart(document.getElementById('stationTrendChart'), {
+            type: 'line',
+            data: {
+                labels: station.periods,
+                datasets: [
+                    {
+                        label: 'Monthly WQI',
+                        data: station.wqi_mean,
+                        borderColor: 'rgba(37, 99, 235, 1)',
+                        pointBackgroundColor: station.class.map(label => CLASS_COLORS[label]),
+                        pointRadius: 5
+                    },
+                    {
+                        label: '12-month mean',
+                        data: station.wqi_mean_12m,
+                        borderColor: 'rgba(100, 116, 139, 0.8)',
+                        borderDash: [5, 5],
+                        pointRadius: 0
+                    }
+                ]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: true,
+                scales: {
+                    y: {
+                        beginAtZero: true,
+                        max: 100,
+                        title: {
+                            display: true,
+                            text: 'Water Quality Index (WQI)'
+                        }
+                    }
+                }
+            }
+        });
+    });
+}
+
 // Setup Prediction Form
 function setupPredictionForm() {
     const form = document.getElementById('predictionForm');
@@ -343,7 +464,7 @@ function setupPredictionForm() {
     });
 }
 
-// WHO/BIS Water Quality Standards
+// WHO/BIS Water Quality Standards (mirrors STANDARDS in src/wqi.py)
 const standards = {
     'pH': {'ideal': 7.0, 'min': 6.5, 'max': 8.5, 'weight': 4},
     'DO': {'ideal': 6.0, 'min': 5.0, 'max': 14.0, 'weight': 5},
@@ -2,37 +2,60 @@
 """
 Water Quality Analysis - Complete Execution Script
 Run all analysis steps from the notebook in a single script
+
+Progress is written through the 'water_quality' logger: WQ_LOG_FORMAT=json
+gives one JSON record per line, and WQ_METRICS_FILE=<path> also dumps the step
+and fit timings in Prometheus text format at the end. WQ_DASHBOARD_DIR=<dir>
+redirects the dashboard data (default: docs/data/dashboard).
 """
 
-print("=" * 80)
-print("WATER QUALITY CLASSIFICATION & PREDICTION SYSTEM")
-print("=" * 80)
-print()
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from instrumentation import REGISTRY, PipelineSteps, get_logger, log_event
+
+log = get_logger('pipeline')
+steps = PipelineSteps(REGISTRY, log)
+
+log.info("=" * 80)
+log.info("WATER QUALITY CLASSIFICATION & PREDICTION SYSTEM")
+log.info("=" * 80)
+log.info("")
 
 # ============================================================================
 # STEP 1: Import Libraries
 # ============================================================================
-print("📦 Step 1/11: Importing libraries...")
+steps.start('import', "📦 Step 1/11: Importing libraries...")
 
 import pandas as pd
 import numpy as np
 import warnings
 warnings.filterwarnings('ignore')
 
+from compression import compress_models
+from dashboard_data import feature_importance, write_dashboard_data
+from explain import load_global_importances
+from feature_cache import cache_key, load_cached, save_cache
+from ingest import KEY_PARAMETERS, METADATA_COLS, load_clean_data
+from incremental import STATE_FILENAME, TrainingState
+from station_store import StationStore, period_from_filename
+from training import save_artifacts, train_parallel
+from training_data import prepare_training_data
+from tuning import BEST_PARAMS_FILENAME, load_best_params
+from wqi import STANDARDS, calculate_wqi_frame, classify_wqi_array
+
 import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.metrics import (
     classification_report, confusion_matrix, accuracy_score, 
     mean_squared_error, r2_score, mean_absolute_error
 )
-from sklearn.impute import SimpleImputer
 import xgboost as xgb
 
 import tensorflow as tf
@@ -45,347 +68,286 @@ plt.style.use('seaborn-v0_8-darkgrid')
 sns.set_palette('husl')
 pd.set_option('display.max_columns', None)
 
-print(f"✅ Libraries imported! TensorFlow: {tf.__version__}, Pandas: {pd.__version__}")
-print()
-
-# ============================================================================
-# STEP 2: Load Data
-# ============================================================================
-print("📊 Step 2/11: Loading data...")
-
-df = pd.read_csv('Water_Quality_Data_06_2025.csv')
-print(f"✅ Loaded {df.shape[0]} rows × {df.shape[1]} columns")
-print(f"   Monitoring Stations: {df['Station code'].nunique()}")
-print(f"   Water Bodies: {df['water_bodies'].nunique()}")
-print()
-
-# ============================================================================
-# STEP 3: Data Cleaning
-# ============================================================================
-print("🧹 Step 3/11: Cleaning data...")
-
-df_clean = df.copy()
-
-# Remove invalid samples
-remarks_to_remove = ['dried up', 'lake emptied', 'under renovation', 'not collected', 
-                     'No Access', 'lake covered', 'Lake covered']
-initial_count = len(df_clean)
-for remark in remarks_to_remove:
-    df_clean = df_clean[~df_clean['Remarks'].astype(str).str.contains(remark, case=False, na=False)]
-
-print(f"✅ Removed {initial_count - len(df_clean)} invalid samples")
-
-# Select key parameters
-key_parameters = [
-    'DO (mg/L)', 'pH', 'Conductivity (mS/cm)', 'BOD (mg/L)', 'COD (mg/L)',
-    'Nitrate', 'Nitrite-N (mg/L)', 'Fecal Coliform (MPN/100ml)', 
-    'Total Coliform (MPN/100ml)', 'Turbidity (NTU)', 'Total Alk. (mg/L)',
-    'Chloride (mg/L)', 'TDS (mg/L)', 'TSS (mg/L)', 'Total Phosphate (mg/L)',
-    'Ammonia', 'Hardness (mg/L)', 'Fluoride (mg/L)'
-]
-
-metadata_cols = ['Station code', 'water_bodies', 'Station name']
-cols_to_keep = metadata_cols + [col for col in key_parameters if col in df_clean.columns]
-df_clean = df_clean[cols_to_keep]
-
-# Convert to numeric
-def clean_numeric_column(series):
-    series = series.replace(['BDL', 'Less than 1.8', 'NIL', ''], np.nan)
-    return pd.to_numeric(series, errors='coerce')
-
-for col in key_parameters:
-    if col in df_clean.columns:
-        df_clean[col] = clean_numeric_column(df_clean[col])
-
-# Remove rows with too many missing values
-threshold = len(key_parameters) * 0.5
-df_clean = df_clean.dropna(thresh=len(metadata_cols) + threshold)
-
-print(f"✅ Cleaned data: {df_clean.shape[0]} samples × {df_clean.shape[1]} columns")
-print()
-
-# ============================================================================
-# STEP 4: Calculate WQI
-# ============================================================================
-print("🔬 Step 4/11: Calculating Water Quality Index...")
-
-# WHO/BIS Standards
-standards = {
-    'pH': {'ideal': 7.0, 'min': 6.5, 'max': 8.5, 'weight': 4},
-    'DO (mg/L)': {'ideal': 6.0, 'min': 5.0, 'max': 14.0, 'weight': 5},
-    'BOD (mg/L)': {'ideal': 0, 'min': 0, 'max': 3.0, 'weight': 5},
-    'COD (mg/L)': {'ideal': 0, 'min': 0, 'max': 10.0, 'weight': 4},
-    'Nitrate': {'ideal': 0, 'min': 0, 'max': 45.0, 'weight': 5},
-    'Total Coliform (MPN/100ml)': {'ideal': 0, 'min': 0, 'max': 50, 'weight': 5},
-    'Fecal Coliform (MPN/100ml)': {'ideal': 0, 'min': 0, 'max': 10, 'weight': 5},
-    'TDS (mg/L)': {'ideal': 300, 'min': 0, 'max': 500, 'weight': 4},
-    'Turbidity (NTU)': {'ideal': 1, 'min': 0, 'max': 5, 'weight': 3},
-    'Chloride (mg/L)': {'ideal': 200, 'min': 0, 'max': 250, 'weight': 3},
-    'Hardness (mg/L)': {'ideal': 100, 'min': 0, 'max': 300, 'weight': 2},
-    'Fluoride (mg/L)': {'ideal': 1.0, 'min': 0.5, 'max': 1.5, 'weight': 4}
-}
-
-def calculate_qi(value, param_name, standards):
-    if pd.isna(value) or param_name not in standards:
-        return np.nan
-    std = standards[param_name]
+log_event(log, 'libraries_imported',
+          f"✅ Libraries imported! TensorFlow: {tf.__version__}, Pandas: {pd.__version__}",
+          tensorflow=tf.__version__, pandas=pd.__version__)
+log.info("")
+
+DATA_FILE = 'Water_Quality_Data_06_2025.csv'
+CACHE_DIR = 'cache'
+STORE_DIR = 'store'
+# Pre-aggregated files for the GitHub Pages dashboard (see src/dashboard_data.py)
+DASHBOARD_DIR = os.environ.get('WQ_DASHBOARD_DIR', os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'docs', 'data', 'dashboard')))
+DATA_PERIOD = period_from_filename(DATA_FILE)
+
+key_parameters = KEY_PARAMETERS
+metadata_cols = METADATA_COLS
+
+# WHO/BIS Standards (see src/wqi.py)
+standards = STANDARDS
+
+# Cleaned data is cached per (CSV contents, standards); an unchanged dataset
+# skips STEPs 2-5 entirely and reads the cached columns instead
+data_key = cache_key(DATA_FILE, standards, key_parameters)
+steps.start('load_cache')
+df_clean = load_cached(CACHE_DIR, data_key)
+cache_hit = df_clean is not None
+
+if cache_hit:
+    log_event(log, 'cache_hit',
+              f"⚡ Steps 2-5/11: Using cached cleaned data ({CACHE_DIR}/, key {data_key})",
+              cache_dir=CACHE_DIR, key=data_key)
+    log_event(log, 'data_loaded',
+              f"✅ Loaded {df_clean.shape[0]} samples × {df_clean.shape[1]} columns",
+              rows=df_clean.shape[0], columns=df_clean.shape[1])
+    log.info("")
+else:
+    # ========================================================================
+    # STEP 2: Load Data
+    # ========================================================================
+    steps.start('load', "📊 Step 2/11: Loading data...")
     
-    if param_name == 'pH':
-        if std['min'] <= value <= std['max']:
-            qi = 100 - abs(value - std['ideal']) * 10
-        else:
-            qi = max(0, 100 - abs(value - std['ideal']) * 20)
-    elif std['ideal'] == 0:
-        if value <= std['max']:
-            qi = 100 - (value / std['max']) * 100
-        else:
-            qi = max(0, 100 - (value / std['max']) * 150)
-    else:
-        if value <= std['max']:
-            qi = 100 - abs(value - std['ideal']) / std['max'] * 100
-        else:
-            qi = max(0, 100 - (value - std['max']) / std['max'] * 100)
-    return max(0, min(100, qi))
-
-def calculate_wqi(row, standards):
-    qi_values, weights = [], []
-    for param, std_values in standards.items():
-        if param in row.index:
-            qi = calculate_qi(row[param], param, standards)
-            if not pd.isna(qi):
-                qi_values.append(qi)
-                weights.append(std_values['weight'])
-    if len(qi_values) == 0:
-        return np.nan
-    return sum(q * w for q, w in zip(qi_values, weights)) / sum(weights)
-
-df_clean['WQI'] = df_clean.apply(lambda row: calculate_wqi(row, standards), axis=1)
-print(f"✅ WQI calculated! Mean: {df_clean['WQI'].mean():.2f}, Median: {df_clean['WQI'].median():.2f}")
-print()
-
-# ============================================================================
-# STEP 5: Create Classification Labels
-# ============================================================================
-print("🏷️  Step 5/11: Creating classification labels...")
-
-def classify_water_quality(wqi):
-    if pd.isna(wqi):
-        return np.nan
-    elif wqi >= 70:
-        return 'Safe/Potable'
-    elif wqi >= 40:
-        return 'Polluted'
-    else:
-        return 'Highly Polluted'
-
-df_clean['Water_Quality_Class'] = df_clean['WQI'].apply(classify_water_quality)
-df_clean = df_clean.dropna(subset=['WQI', 'Water_Quality_Class'])
-
-print("Distribution:")
-for category, count in df_clean['Water_Quality_Class'].value_counts().items():
+    # Streamed in chunks; remark filtering, numeric conversion and the
+    # missing-value threshold are applied per chunk (see src/ingest.py)
+    ingest_stats = {}
+    df_clean = load_clean_data(DATA_FILE, stats=ingest_stats)
+    log_event(log, 'data_loaded',
+              f"✅ Loaded {ingest_stats['rows_read']} rows × {ingest_stats['columns']} columns",
+              rows=ingest_stats['rows_read'], columns=ingest_stats['columns'],
+              stations=len(ingest_stats['stations']),
+              water_bodies=len(ingest_stats['water_bodies']))
+    log.info(f"   Monitoring Stations: {len(ingest_stats['stations'])}")
+    log.info(f"   Water Bodies: {len(ingest_stats['water_bodies'])}")
+    log.info("")
+    
+    # ========================================================================
+    # STEP 3: Data Cleaning
+    # ========================================================================
+    # Cleaning is fused into the chunked reader above; this step only reports it
+    steps.start('clean', "🧹 Step 3/11: Cleaning data...")
+    
+    log.info(f"✅ Removed {ingest_stats['rows_invalid']} invalid samples")
+    log.info(f"✅ Dropped {ingest_stats['rows_incomplete']} samples with too many missing values")
+    log_event(log, 'data_cleaned',
+              f"✅ Cleaned data: {df_clean.shape[0]} samples × {df_clean.shape[1]} columns",
+              rows_invalid=ingest_stats['rows_invalid'],
+              rows_incomplete=ingest_stats['rows_incomplete'],
+              rows=df_clean.shape[0], columns=df_clean.shape[1])
+    log.info("")
+    
+    # ========================================================================
+    # STEP 4: Calculate WQI
+    # ========================================================================
+    steps.start('wqi', "🔬 Step 4/11: Calculating Water Quality Index...")
+    
+    df_clean['WQI'] = calculate_wqi_frame(df_clean, standards)
+    log_event(log, 'wqi_calculated',
+              f"✅ WQI calculated! Mean: {df_clean['WQI'].mean():.2f}, Median: {df_clean['WQI'].median():.2f}",
+              mean=float(df_clean['WQI'].mean()), median=float(df_clean['WQI'].median()))
+    log.info("")
+    
+    # ========================================================================
+    # STEP 5: Create Classification Labels
+    # ========================================================================
+    steps.start('classify', "🏷️  Step 5/11: Creating classification labels...")
+    
+    df_clean['Water_Quality_Class'] = classify_wqi_array(df_clean['WQI'])
+    df_clean = df_clean.dropna(subset=['WQI', 'Water_Quality_Class'])
+    
+    steps.start('save_cache')
+    if save_cache(df_clean, CACHE_DIR, data_key):
+        log_event(log, 'cache_saved', f"💾 Cached cleaned data in {CACHE_DIR}/ (key {data_key})",
+                  cache_dir=CACHE_DIR, key=data_key)
+
+# Labelled readings are archived per sampling period for station trend
+# queries (see src/station_store.py); a cache miss means the month changed
+steps.start('store')
+station_store = StationStore(STORE_DIR)
+if not cache_hit or not station_store.has_period(DATA_PERIOD):
+    store_stats = station_store.append(df_clean, DATA_PERIOD)
+    log_event(log, 'store_updated',
+              f"🗄️  Stored {store_stats['rows']} readings from {store_stats['stations']} stations "
+              f"as period {DATA_PERIOD} in {STORE_DIR}/",
+              period=DATA_PERIOD, store_dir=STORE_DIR, **store_stats)
+
+class_counts = df_clean['Water_Quality_Class'].value_counts()
+log_event(log, 'class_distribution', "Distribution:",
+          counts={str(k): int(v) for k, v in class_counts.items()})
+for category, count in class_counts.items():
     pct = (count / len(df_clean)) * 100
-    print(f"   {category:20s}: {count:3d} ({pct:5.1f}%)")
-print()
+    log.info(f"   {category:20s}: {count:3d} ({pct:5.1f}%)")
+log.info("")
 
 # ============================================================================
 # STEP 6: Feature Preparation
 # ============================================================================
-print("🔧 Step 6/11: Preparing features for ML...")
+steps.start('prepare', "🔧 Step 6/11: Preparing features for ML...")
 
 feature_columns = [col for col in key_parameters if col in df_clean.columns]
-X = df_clean[feature_columns].copy()
-y_class = df_clean['Water_Quality_Class'].copy()
-y_wqi = df_clean['WQI'].copy()
-
-# Impute missing values
-imputer = SimpleImputer(strategy='median')
-X_imputed = pd.DataFrame(imputer.fit_transform(X), columns=X.columns, index=X.index)
 
-# Encode labels
-label_encoder = LabelEncoder()
-y_class_encoded = label_encoder.fit_transform(y_class)
+# One float32 matrix in split order (training rows first) serves both tasks:
+# their train and test sets are views of it, and the imputer and scaler are
+# fitted on the training rows and applied in place (see src/training_data.py)
+data = prepare_training_data(df_clean, feature_columns, test_size=0.2, random_state=42)
+imputer, scaler, label_encoder = data.imputer, data.scaler, data.label_encoder
 
-print(f"✅ Features: {len(feature_columns)}, Samples: {len(X_imputed)}")
-print()
+log_event(log, 'features_prepared',
+          f"✅ Features: {len(feature_columns)}, Samples: {len(data.X)} "
+          f"({data.nbytes / 2**20:.1f} MB as float32)",
+          features=len(feature_columns), samples=len(data.X), matrix_bytes=data.nbytes)
+log.info("")
 
 # ============================================================================
 # STEP 7: Train-Test Split
 # ============================================================================
-print("✂️  Step 7/11: Splitting data...")
-
-X_train_class, X_test_class, y_train_class, y_test_class = train_test_split(
-    X_imputed, y_class_encoded, test_size=0.2, random_state=42, stratify=y_class_encoded)
-
-X_train_reg, X_test_reg, y_train_reg, y_test_reg = train_test_split(
-    X_imputed, y_wqi, test_size=0.2, random_state=42)
-
-# Scale features
-scaler = StandardScaler()
-X_train_class_scaled = scaler.fit_transform(X_train_class)
-X_test_class_scaled = scaler.transform(X_test_class)
-X_train_reg_scaled = scaler.fit_transform(X_train_reg)
-X_test_reg_scaled = scaler.transform(X_test_reg)
-
-print(f"✅ Training: {len(X_train_class)}, Testing: {len(X_test_class)}")
-print()
-
-# ============================================================================
-# STEP 8: Train Random Forest Models
-# ============================================================================
-print("🌲 Step 8/11: Training Random Forest models...")
-
-# Classifier
-rf_classifier = RandomForestClassifier(
-    n_estimators=200, max_depth=15, min_samples_split=5,
-    min_samples_leaf=2, random_state=42, n_jobs=-1)
-rf_classifier.fit(X_train_class_scaled, y_train_class)
-y_pred_rf = rf_classifier.predict(X_test_class_scaled)
-test_acc_rf = accuracy_score(y_test_class, y_pred_rf)
-
-# Regressor
-rf_regressor = RandomForestRegressor(
-    n_estimators=200, max_depth=15, min_samples_split=5,
-    min_samples_leaf=2, random_state=42, n_jobs=-1)
-rf_regressor.fit(X_train_reg_scaled, y_train_reg)
-y_pred_rf_reg = rf_regressor.predict(X_test_reg_scaled)
-test_r2_rf = r2_score(y_test_reg, y_pred_rf_reg)
-test_rmse_rf = np.sqrt(mean_squared_error(y_test_reg, y_pred_rf_reg))
-
-print(f"✅ RF Classifier - Accuracy: {test_acc_rf:.4f}")
-print(f"✅ RF Regressor  - R²: {test_r2_rf:.4f}, RMSE: {test_rmse_rf:.4f}")
-print()
+# The stratified split is part of the matrix layout above; this step only reports it
+steps.start('split', "✂️  Step 7/11: Splitting data...")
 
-# ============================================================================
-# STEP 9: Train XGBoost Models
-# ============================================================================
-print("🚀 Step 9/11: Training XGBoost models...")
-
-# Classifier
-xgb_classifier = xgb.XGBClassifier(
-    n_estimators=200, max_depth=8, learning_rate=0.1,
-    subsample=0.8, colsample_bytree=0.8, random_state=42)
-xgb_classifier.fit(X_train_class_scaled, y_train_class)
-y_pred_xgb = xgb_classifier.predict(X_test_class_scaled)
-test_acc_xgb = accuracy_score(y_test_class, y_pred_xgb)
-
-# Regressor
-xgb_regressor = xgb.XGBRegressor(
-    n_estimators=200, max_depth=8, learning_rate=0.1,
-    subsample=0.8, colsample_bytree=0.8, random_state=42)
-xgb_regressor.fit(X_train_reg_scaled, y_train_reg)
-y_pred_xgb_reg = xgb_regressor.predict(X_test_reg_scaled)
-test_r2_xgb = r2_score(y_test_reg, y_pred_xgb_reg)
-test_rmse_xgb = np.sqrt(mean_squared_error(y_test_reg, y_pred_xgb_reg))
-
-print(f"✅ XGB Classifier - Accuracy: {test_acc_xgb:.4f}")
-print(f"✅ XGB Regressor  - R²: {test_r2_xgb:.4f}, RMSE: {test_rmse_xgb:.4f}")
-print()
+log_event(log, 'data_split', f"✅ Training: {data.n_train}, Testing: {data.n_test}",
+          train=data.n_train, test=data.n_test)
+log.info("")
 
 # ============================================================================
-# STEP 10: Train Neural Network Models
+# STEPS 8-10: Train Random Forest, XGBoost and Neural Network Models
 # ============================================================================
-print("🧠 Step 10/11: Training Neural Network models...")
-
-# Classifier
-nn_classifier = Sequential([
-    Dense(128, activation='relu', input_shape=(X_train_class_scaled.shape[1],)),
-    BatchNormalization(), Dropout(0.3),
-    Dense(64, activation='relu'),
-    BatchNormalization(), Dropout(0.3),
-    Dense(32, activation='relu'),
-    BatchNormalization(), Dropout(0.2),
-    Dense(len(label_encoder.classes_), activation='softmax')
-])
-nn_classifier.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
-nn_classifier.fit(X_train_class_scaled, y_train_class, validation_split=0.2,
-                  epochs=100, batch_size=32,
-                  callbacks=[EarlyStopping(patience=15, restore_best_weights=True)],
-                  verbose=0)
-_, test_acc_nn = nn_classifier.evaluate(X_test_class_scaled, y_test_class, verbose=0)
-
-# Regressor
-nn_regressor = Sequential([
-    Dense(128, activation='relu', input_shape=(X_train_reg_scaled.shape[1],)),
-    BatchNormalization(), Dropout(0.3),
-    Dense(64, activation='relu'),
-    BatchNormalization(), Dropout(0.3),
-    Dense(32, activation='relu'),
-    BatchNormalization(), Dropout(0.2),
-    Dense(1)
-])
-nn_regressor.compile(optimizer='adam', loss='mse', metrics=['mae'])
-nn_regressor.fit(X_train_reg_scaled, y_train_reg, validation_split=0.2,
-                 epochs=100, batch_size=32,
-                 callbacks=[EarlyStopping(patience=15, restore_best_weights=True)],
-                 verbose=0)
-y_pred_nn_reg = nn_regressor.predict(X_test_reg_scaled, verbose=0).flatten()
-test_r2_nn = r2_score(y_test_reg, y_pred_nn_reg)
-test_rmse_nn = np.sqrt(mean_squared_error(y_test_reg, y_pred_nn_reg))
-
-print(f"✅ NN Classifier - Accuracy: {test_acc_nn:.4f}")
-print(f"✅ NN Regressor  - R²: {test_r2_nn:.4f}, RMSE: {test_rmse_nn:.4f}")
-print()
+steps.start('train', "🏋️  Steps 8-10/11: Training RF, XGBoost and Neural Network models in parallel...")
+
+# Parameters found by src/tuning.py replace the defaults of the models it tuned
+tuned_params = load_best_params(os.path.join('models', BEST_PARAMS_FILENAME))
+if tuned_params:
+    log_event(log, 'tuned_params', f"🎛️  Using tuned hyperparameters for: {', '.join(tuned_params)}",
+              models=list(tuned_params))
+
+# The six fits are independent; each runs in its own process with a share of
+# the CPU cores so RF, XGBoost and TensorFlow thread pools don't oversubscribe
+models, train_reports = train_parallel(
+    data.X, data.y_class, data.y_wqi, data.n_train,
+    n_classes=len(label_encoder.classes_), params=tuned_params)
+
+rf_classifier, rf_regressor = models['rf_classifier'], models['rf_regressor']
+xgb_classifier, xgb_regressor = models['xgb_classifier'], models['xgb_regressor']
+nn_classifier, nn_regressor = models['nn_classifier'], models['nn_regressor']
+
+test_acc_rf = train_reports['rf_classifier']['accuracy']
+test_acc_xgb = train_reports['xgb_classifier']['accuracy']
+test_acc_nn = train_reports['nn_classifier']['accuracy']
+test_r2_rf, test_rmse_rf = train_reports['rf_regressor']['r2'], train_reports['rf_regressor']['rmse']
+test_r2_xgb, test_rmse_xgb = train_reports['xgb_regressor']['r2'], train_reports['xgb_regressor']['rmse']
+test_r2_nn, test_rmse_nn = train_reports['nn_regressor']['r2'], train_reports['nn_regressor']['rmse']
+
+log.info(f"{'Model':16s} {'Cores':>5s} {'Wall s':>8s} {'Fit s':>8s} {'Peak MB':>8s}  Score")
+for name, report in train_reports.items():
+    REGISTRY.observe('model_fit_seconds', report['fit_s'], model=name)
+    REGISTRY.observe('model_job_seconds', report['wall_s'], model=name)
+    REGISTRY.set('model_peak_rss_megabytes', report['peak_rss_mb'], model=name)
+    for metric in ('accuracy', 'r2', 'rmse'):
+        if metric in report:
+            REGISTRY.set(f'model_test_{metric}', report[metric], model=name)
+    
+    score = (f"Accuracy: {report['accuracy']:.4f}" if 'accuracy' in report
+             else f"R²: {report['r2']:.4f}, RMSE: {report['rmse']:.4f}")
+    log_event(log, 'model_trained',
+              f"{name:16s} {report['threads']:5d} {report['wall_s']:8.2f} {report['fit_s']:8.2f} "
+              f"{report['peak_rss_mb']:8.1f}  {score}",
+              model=name, **report)
+log.info("")
 
 # ============================================================================
 # STEP 11: Save Models
 # ============================================================================
-print("💾 Step 11/11: Saving models...")
-
-import pickle
-import os
-
-os.makedirs('models', exist_ok=True)
-
-# Save classifiers
-with open('models/rf_classifier.pkl', 'wb') as f:
-    pickle.dump(rf_classifier, f)
-with open('models/xgb_classifier.pkl', 'wb') as f:
-    pickle.dump(xgb_classifier, f)
-nn_classifier.save('models/nn_classifier.keras')
-
-# Save regressors
-with open('models/rf_regressor.pkl', 'wb') as f:
-    pickle.dump(rf_regressor, f)
-with open('models/xgb_regressor.pkl', 'wb') as f:
-    pickle.dump(xgb_regressor, f)
-nn_regressor.save('models/nn_regressor.keras')
-
-# Save preprocessors
-with open('models/scaler.pkl', 'wb') as f:
-    pickle.dump(scaler, f)
-with open('models/label_encoder.pkl', 'wb') as f:
-    pickle.dump(label_encoder, f)
-with open('models/imputer.pkl', 'wb') as f:
-    pickle.dump(imputer, f)
-with open('models/feature_names.pkl', 'wb') as f:
-    pickle.dump(feature_columns, f)
-
-print("✅ All models saved in 'models/' directory")
-print()
+steps.start('save', "💾 Step 11/11: Saving models...")
+
+# Per-model files, pickled preprocessors, the single-file bundle read by
+# WaterQualityPredictor (src/model_bundle.py), TensorFlow-free copies for
+# edge devices (src/numpy_runtime.py) and global SHAP importances (src/explain.py)
+save_artifacts('models', models, imputer, scaler, label_encoder, feature_columns,
+               X_reference=data.X_train)
+
+# Value counts and a replay sample for incremental retraining (src/incremental.py),
+# from the training rows only: the ones the imputer and scaler were fitted on
+train_rows = df_clean.iloc[data.order[:data.n_train]]
+TrainingState.from_data(train_rows[feature_columns], train_rows['Water_Quality_Class'],
+                        train_rows['WQI']).save(os.path.join('models', STATE_FILENAME))
+
+log_event(log, 'models_saved', "✅ All models saved in 'models/' directory", models_dir='models')
+log.info("")
+
+# Pruned and distilled variants that WaterQualityPredictor.predict_compact picks
+# by latency budget, falling back to the full ensemble (src/compression.py)
+steps.start('compress', "🗜️  Compressing models...")
+compact_variants = compress_models(models, label_encoder, data.X_train, data.X_test,
+                                   data.y_class[data.n_train:], data.y_wqi[data.n_train:], 'models',
+                                   data.scaler)
+
+log.info(f"{'Variant':16s} {'Trees':>5s} {'µs/sample':>10s} {'w/ fallback':>11s} {'Accuracy':>8s} "
+         f"{'Δ':>7s} {'R²':>7s} {'Δ':>7s} {'Coverage':>8s}")
+for report in compact_variants:
+    name = report['name']
+    REGISTRY.set('compact_latency_microseconds', report['latency_us'], variant=name)
+    for metric in ('accuracy', 'r2', 'coverage'):
+        REGISTRY.set(f'compact_{metric}', report[metric], variant=name)
+    with_fallback = report.get('latency_with_fallback_us', report['latency_us'])
+    log_event(log, 'model_compressed',
+              f"{name:16s} {report.get('trees', '-'):>5} {report['latency_us']:10.1f} "
+              f"{with_fallback:11.1f} {report['accuracy']:8.4f} {report.get('accuracy_delta', 0.0):+7.4f} "
+              f"{report['r2']:7.4f} {report.get('r2_delta', 0.0):+7.4f} {report['coverage']:8.1%}",
+              **report)
+log.info("")
+
+steps.start('dashboard', "🌐 Writing dashboard data...")
+importances = feature_importance(rf_classifier, feature_columns,
+                                 load_global_importances('models').get('rf_classifier'))
+dashboard_files = write_dashboard_data(DASHBOARD_DIR, df_clean, DATA_PERIOD, train_reports,
+                                       importances, station_store.aggregates())
+log_event(log, 'dashboard_written',
+          f"✅ {len(dashboard_files)} files ({sum(dashboard_files.values()) / 1024:.1f} KB) "
+          f"in {DASHBOARD_DIR}",
+          dashboard_dir=DASHBOARD_DIR, files=len(dashboard_files),
+          bytes=sum(dashboard_files.values()))
+log.info("")
+steps.finish()
 
 # ============================================================================
 # SUMMARY
 # ============================================================================
-print("=" * 80)
-print("ANALYSIS COMPLETE! 🎉")
-print("=" * 80)
-print()
-print("📊 MODEL PERFORMANCE SUMMARY:")
-print()
-print("Classification Models (Accuracy):")
-print(f"   Random Forest:    {test_acc_rf:.4f}")
-print(f"   XGBoost:          {test_acc_xgb:.4f}")
-print(f"   Neural Network:   {test_acc_nn:.4f}")
-print()
-print("Regression Models (R² Score):")
-print(f"   Random Forest:    {test_r2_rf:.4f} (RMSE: {test_rmse_rf:.2f})")
-print(f"   XGBoost:          {test_r2_xgb:.4f} (RMSE: {test_rmse_xgb:.2f})")
-print(f"   Neural Network:   {test_r2_nn:.4f} (RMSE: {test_rmse_nn:.2f})")
-print()
-print("🎯 Next Steps:")
-print("   1. Run predictions: python3 predict_water_quality.py")
-print("   2. Check saved models in 'models/' directory")
-print("   3. Review visualizations in the notebook for detailed insights")
-print()
-print("=" * 80)
+log.info("=" * 80)
+log_event(log, 'pipeline_complete', "ANALYSIS COMPLETE! 🎉",
+          step_seconds={step: round(sec, 3) for step, sec in steps.durations.items()},
+          step_peak_growth_mb={step: round(m['peak_growth_mb'], 1)
+                               for step, m in steps.memory.items()},
+          accuracy={'rf': test_acc_rf, 'xgb': test_acc_xgb, 'nn': test_acc_nn},
+          r2={'rf': test_r2_rf, 'xgb': test_r2_xgb, 'nn': test_r2_nn})
+log.info("=" * 80)
+log.info("")
+log.info("⏱️  STEP TIMINGS AND MEMORY:")
+log.info(f"   {'Step':12s} {'Seconds':>8s} {'Peak MB':>8s} {'Growth MB':>10s}")
+for step, seconds in steps.durations.items():
+    memory = steps.memory[step]
+    log.info(f"   {step:12s} {seconds:8.2f} {memory['peak_rss_mb']:8.1f} "
+             f"{memory['peak_growth_mb']:10.1f}")
+log.info("")
+log.info("📊 MODEL PERFORMANCE SUMMARY:")
+log.info("")
+log.info("Classification Models (Accuracy):")
+log.info(f"   Random Forest:    {test_acc_rf:.4f}")
+log.info(f"   XGBoost:          {test_acc_xgb:.4f}")
+log.info(f"   Neural Network:   {test_acc_nn:.4f}")
+log.info("")
+log.info("Regression Models (R² Score):")
+log.info(f"   Random Forest:    {test_r2_rf:.4f} (RMSE: {test_rmse_rf:.2f})")
+log.info(f"   XGBoost:          {test_r2_xgb:.4f} (RMSE: {test_rmse_xgb:.2f})")
+log.info(f"   Neural Network:   {test_r2_nn:.4f} (RMSE: {test_rmse_nn:.2f})")
+log.info("")
+log.info("🎯 Next Steps:")
+log.info("   1. Run predictions: python3 predict_water_quality.py")
+log.info("   2. Check saved models in 'models/' directory")
+log.info("   3. Review visualizations in the notebook for detailed insights")
+log.info("")
+log.info("=" * 80)
+
+metrics_file = os.environ.get('WQ_METRICS_FILE')
+if metrics_file:
+    REGISTRY.write_prometheus(metrics_file)
+    log_event(log, 'metrics_written', f"📈 Metrics written to {metrics_file}", path=metrics_file)
 
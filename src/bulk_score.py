@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Bulk Scoring
+Score a whole CSV or Parquet file with WaterQualityPredictor across worker processes
+
+The input is cut into shards up front: newline-aligned byte ranges of a CSV,
+or groups of Parquet row groups. Every worker loads the models once and reads,
+scores and writes its own shards, so the parent never parses the input.
+Each finished shard is an atomically renamed part file in <output>.parts/,
+next to a manifest of the shard plan. Re-running the same command after an
+interruption therefore skips straight to the unfinished shards. When every
+shard is done the parts are concatenated in input order into the output file.
+    
+    python src/bulk_score.py readings.csv scores.csv --models rf,xgb --workers 8
+
+CSV shards are split at newlines, so quoted fields must not contain line
+breaks (the monitoring exports never do).
+"""
+
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from ingest import KEY_PARAMETERS, METADATA_COLS, clean_numeric_column
+from instrumentation import REGISTRY, get_logger, log_event
+from training import thread_limits
+
+DEFAULT_CHUNK_MB = 64
+DEFAULT_CHUNK_ROWS = 500_000
+PROGRESS_SECONDS = 10
+MANIFEST_FILENAME = 'manifest.json'
+
+
+def _format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    if ext in ('.csv', '.txt'):
+        return 'csv'
+    raise ValueError(f"Cannot tell the format of {path!r}; use a .csv or .parquet extension")
+
+
+# ============================================================================
+# Shard planning
+# ============================================================================
+
+def plan_shards(path, chunk_mb=DEFAULT_CHUNK_MB, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Cut the input into independently readable shards
+    
+    Returns:
+    --------
+    dict : 'format', 'columns' and 'shards' (CSV: [start, end) byte ranges,
+        Parquet: lists of row group indices)
+    """
+    fmt = _format(path)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        shards, current, rows = [], [], 0
+        for i in range(parquet.num_row_groups):
+            current.append(i)
+            rows += parquet.metadata.row_group(i).num_rows
+            if rows >= chunk_rows:
+                shards.append(current)
+                current, rows = [], 0
+        if current:
+            shards.append(current)
+        return {'format': fmt, 'columns': parquet.schema_arrow.names, 'shards': shards}
+    
+    columns = list(pd.read_csv(path, nrows=0).columns)
+    size = os.path.getsize(path)
+    chunk_bytes = int(chunk_mb * 2**20)
+    shards = []
+    with open(path, 'rb') as f:
+        f.readline()
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = f.tell()
+            shards.append([start, end])
+            start = end
+    return {'format': fmt, 'columns': columns, 'shards': shards}
+
+
+def read_shard(path, plan, shard, usecols):
+    """One shard as a DataFrame (id columns as read, parameters as text or numbers)"""
+    if plan['format'] == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).read_row_groups(shard, columns=usecols).to_pandas()
+    
+    start, end = shard
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # Everything as text: ids pass through untouched, parameters go through
+    # the same marker handling as ingest.py
+    return pd.read_csv(io.BytesIO(data), header=None, names=plan['columns'], usecols=usecols,
+                       dtype=str, keep_default_na=False)
+
+
+# ============================================================================
+# Workers
+# ============================================================================
+
+_predictor = None
+
+
+def _open_predictor(models_dir, models, runtime, lazy=True):
+    from predict_water_quality import WaterQualityPredictor
+    return WaterQualityPredictor(models_dir, models=models, runtime=runtime, lazy=lazy,
+                                 explain_cache_size=0)
+
+
+def _init_worker(models_dir, models, runtime):
+    """Load the models once per worker process (threads are capped by thread_limits)"""
+    global _predictor
+    _predictor = _open_predictor(models_dir, models, runtime, lazy=False)
+
+
+def score_frame(predictor, df, id_columns):
+    """Id columns followed by predict_ensemble's per-model classes/WQIs, avg_wqi and class_vote"""
+    features = pd.DataFrame({f: clean_numeric_column(df[f]) if f in df else np.nan
+                             for f in predictor.feature_names}, index=df.index)
+    scores = predictor.predict_ensemble(features)
+    return pd.concat([df[id_columns], scores], axis=1).reset_index(drop=True)
+
+
+def _score_shard(path, plan, index, usecols, id_columns, parts_dir, out_format):
+    df = read_shard(path, plan, plan['shards'][index], usecols)
+    result = score_frame(_predictor, df, id_columns)
+    
+    part_path = os.path.join(parts_dir, f'part-{index:06d}.{out_format}')
+    tmp_path = f'{part_path}.tmp'
+    if out_format == 'parquet':
+        result.to_parquet(tmp_path, index=False)
+    else:
+        result.to_csv(tmp_path, index=False, header=False)
+    os.replace(tmp_path, part_path)
+    return index, len(result)
+
+
+# ============================================================================
+# Driver
+# ============================================================================
+
+def _merge_parts(parts_dir, n_shards, output, out_format, header):
+    tmp_path = f'{output}.tmp'
+    parts = [os.path.join(parts_dir, f'part-{i:06d}.{out_format}') for i in range(n_shards)]
+    if out_format == 'parquet':
+        import pyarrow.parquet as pq
+        writer = None
+        for part in parts:
+            table = pq.read_table(part)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+        if writer is not None:
+            writer.close()
+    else:
+        with open(tmp_path, 'w', newline='') as out:
+            csv.writer(out).writerow(header)
+            for part in parts:
+                with open(part) as f:
+                    shutil.copyfileobj(f, out, 2**22)
+    os.replace(tmp_path, output)
+
+
+def bulk_score(input_path, output, models_dir='models', models=('rf', 'xgb', 'nn'),
+               runtime='native', workers=None, chunk_mb=DEFAULT_CHUNK_MB,
+               chunk_rows=DEFAULT_CHUNK_ROWS, id_columns=None, restart=False, keep_parts=False):
+    """
+    Score every row of input_path into output
+    
+    Parameters:
+    -----------
+    input_path, output : str
+        .csv or .parquet files; the formats may differ
+    models : tuple of str
+        Model families to run ('rf', 'xgb', 'nn')
+    runtime : str
+        Predictor runtime, 'native' or 'numpy'
+    workers : int, optional
+        Worker processes, each with its own models; defaults to the core count
+    chunk_mb, chunk_rows : float, int
+        Shard size for CSV (bytes) and Parquet (rows) input
+    id_columns : list of str, optional
+        Input columns copied to the output; defaults to the metadata
+        columns present (Station code, water_bodies, Station name)
+    restart : bool
+        Discard finished shards of an earlier run instead of resuming
+    
+    Returns:
+    --------
+    dict : rows scored in this run, shards done/skipped, seconds and rows/s
+    """
+    log = get_logger('bulk_score')
+    workers = workers or os.cpu_count() or 1
+    out_format = _format(output)
+    parts_dir = f'{output}.parts'
+    manifest_path = os.path.join(parts_dir, MANIFEST_FILENAME)
+    
+    # The models' fingerprint keeps a resume from mixing parts of two model versions
+    predictor = _open_predictor(models_dir, tuple(models), runtime)
+    stat = os.stat(input_path)
+    signature = {'input': os.path.abspath(input_path), 'size': stat.st_size,
+                 'mtime_ns': stat.st_mtime_ns, 'models_dir': os.path.abspath(models_dir),
+                 'models': list(models), 'runtime': runtime, 'output_format': out_format,
+                 'chunk_mb': chunk_mb, 'chunk_rows': chunk_rows, 'id_columns': id_columns,
+                 'models_fingerprint': predictor._fingerprint()}
+    
+    if restart and os.path.exists(parts_dir):
+        shutil.rmtree(parts_dir)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest['signature'] != signature:
+            raise ValueError(f"{parts_dir} belongs to a different input, settings or model "
+                             "version; rerun with --restart to discard it")
+        plan = manifest['plan']
+    else:
+        plan = plan_shards(input_path, chunk_mb, chunk_rows)
+        os.makedirs(parts_dir, exist_ok=True)
+        with open(manifest_path, 'w') as f:
+            json.dump({'signature': signature, 'plan': plan}, f)
+    
+    columns = plan['columns']
+    if not any(f in columns for f in KEY_PARAMETERS):
+        raise ValueError(f"{input_path} has none of the water quality parameter columns")
+    if id_columns is None:
+        id_columns = [col for col in METADATA_COLS if col in columns]
+    usecols = [col for col in columns if col in set(id_columns) | set(KEY_PARAMETERS)]
+    
+    n_shards = len(plan['shards'])
+    todo = [i for i in range(n_shards)
+            if not os.path.exists(os.path.join(parts_dir, f'part-{i:06d}.{out_format}'))]
+    log_event(log, 'bulk_start',
+              f"🚚 Scoring {input_path}: {len(todo)} of {n_shards} shards left, "
+              f"{min(workers, max(len(todo), 1))} workers",
+              shards=n_shards, todo=len(todo), workers=workers)
+    
+    start = time.perf_counter()
+    rows, last_report = 0, start
+    n_threads = max(1, (os.cpu_count() or 1) // workers)
+    
+    def done(n_rows):
+        nonlocal rows, last_report
+        rows += n_rows
+        REGISTRY.inc('bulk_rows_scored_total', n_rows)
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_SECONDS:
+            last_report = now
+            log_event(log, 'bulk_progress', f"   {rows:,} rows, {rows / (now - start):,.0f} rows/s",
+                      rows=rows, rows_per_s=rows / (now - start))
+    
+    if workers == 1 or len(todo) <= 1:
+        global _predictor
+        _predictor = predictor
+        for i in todo:
+            done(_score_shard(input_path, plan, i, usecols, id_columns, parts_dir, out_format)[1])
+    elif todo:
+        # spawn: each worker imports its own TensorFlow/XGBoost runtimes
+        with thread_limits(n_threads), \
+                ProcessPoolExecutor(max_workers=min(workers, len(todo)),
+                                    mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=_init_worker,
+                                    initargs=(models_dir, tuple(models), runtime)) as pool:
+            futures = [pool.submit(_score_shard, input_path, plan, i, usecols, id_columns,
+                                   parts_dir, out_format) for i in todo]
+            for future in as_completed(futures):
+                done(future.result()[1])
+    
+    header = id_columns + [f'{m}_{kind}' for m in models for kind in ('class', 'wqi')]
+    header += ['avg_wqi', 'class_vote']
+    _merge_parts(parts_dir, n_shards, output, out_format, header)
+    if not keep_parts:
+        shutil.rmtree(parts_dir)
+    
+    seconds = time.perf_counter() - start
+    summary = {'rows': rows, 'shards': n_shards, 'shards_skipped': n_shards - len(todo),
+               'seconds': seconds, 'rows_per_s': rows / seconds if seconds else 0.0}
+    log_event(log, 'bulk_done',
+              f"✅ Scored {rows:,} rows in {seconds:.1f}s ({summary['rows_per_s']:,.0f} rows/s, "
+              f"{summary['shards_skipped']} shards resumed) → {output}",
+              output=output, **summary)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of water samples")
+    parser.add_argument('input', help=".csv or .parquet file of readings")
+    parser.add_argument('output', help=".csv or .parquet file for the scores")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--models', default='rf,xgb,nn', help="Comma-separated model families")
+    parser.add_argument('--runtime', default='native', choices=['native', 'numpy'])
+    parser.add_argument('--workers', type=int, help="Worker processes (default: cores)")
+    parser.add_argument('--chunk-mb', type=float, default=DEFAULT_CHUNK_MB,
+                        help="CSV shard size")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Parquet shard size")
+    parser.add_argument('--id-columns', help="Comma-separated input columns copied to the output")
+    parser.add_argument('--restart', action='store_true', help="Ignore an interrupted earlier run")
+    parser.add_argument('--keep-parts', action='store_true')
+    args = parser.parse_args(argv)
+    
+    bulk_score(args.input, args.output, args.models_dir, tuple(args.models.split(',')),
+               args.runtime, args.workers, args.chunk_mb, args.chunk_rows,
+               args.id_columns.split(',') if args.id_columns else None,
+               args.restart, args.keep_parts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Model Compression
+Pruned and distilled stand-ins for the full ensemble, chosen by latency budget
+
+The full ensemble (the majority vote of every classifier and the average of
+every regressor, as in WaterQualityPredictor.predict_ensemble) is the teacher.
+Three kinds of compact variants approximate it, each a classifier and a
+regressor:
+
+- rf_pruned_<k>: k trees of each Random Forest, picked greedily so that
+  their average agrees best with the teacher
+- xgb_rounds_<k>: the first k boosting rounds of each XGBoost model
+- distilled_d<depth>: one decision tree per task, fitted to the teacher's
+  outputs on a transfer set of jittered training rows
+
+Variants are written in the NumPy runtime format to models/compact/, next to
+a manifest of their test scores, the deltas to the full ensemble, per-sample
+latency and a confidence threshold. Rows the classifier is at least that
+confident about agree with the teacher at least TARGET_AGREEMENT of the time
+on held-out transfer rows; WaterQualityPredictor.predict_compact sends the
+rest to the same ensemble (the manifest names its model families), so each
+variant's expected latency includes that fallback at its measured rate.
+
+The variants take scaled inputs, so the manifest records a fingerprint of the
+scaler they were built for and load_manifest refuses a manifest built for a
+different one (incremental.py rebuilds them after updating the scaler).
+"""
+
+import hashlib
+import json
+import os
+import timeit
+
+import numpy as np
+
+from numpy_runtime import FlatForest, export_sklearn_forest, export_xgboost
+from wqi import classify_wqi_array
+
+COMPACT_DIRNAME = 'compact'
+MANIFEST_FILENAME = 'variants.json'
+
+PRUNE_SIZES = (10, 25, 50)
+XGB_ROUNDS = (25, 50)
+DISTILL_DEPTHS = (4, 6, 8)
+
+# Agreement with the full ensemble required of the rows a variant answers
+TARGET_AGREEMENT = 0.99
+
+TRANSFER_ROWS = 20_000
+CALIBRATION_ROWS = 5_000
+# The fallback runs the full ensemble once over all unconfident rows of a
+# call, so its per-sample cost is timed on a batch (MicroBatcher's default size)
+ENSEMBLE_TIMING_ROWS = 256
+# Standard deviation of the jitter added to scaled training rows
+TRANSFER_NOISE = 0.1
+
+
+# ============================================================================
+# Teacher
+# ============================================================================
+
+def _predict(name, model, X):
+    """Encoded classes or WQI of one full model, as the predictor computes them"""
+    family, task = name.split('_')
+    if task == 'classifier':
+        pred = np.argmax(model.predict(X, verbose=0), axis=1) if family == 'nn' else model.predict(X)
+        return np.asarray(pred, dtype=int)
+    pred = model.predict(X, verbose=0).reshape(-1) if family == 'nn' else model.predict(X)
+    return np.asarray(pred, dtype=float)
+
+
+def ensemble_outputs(models, X, label_encoder):
+    """
+    Class vote and averaged WQI of the full ensemble for a preprocessed matrix
+    
+    A three-way split vote takes the class of the averaged WQI, as in
+    WaterQualityPredictor.predict_ensemble.
+    
+    Returns:
+    --------
+    tuple : (encoded classes, WQI)
+    """
+    families = sorted({name.split('_')[0] for name in models})
+    encoded = np.vstack([_predict(f'{f}_classifier', models[f'{f}_classifier'], X) for f in families])
+    wqi = np.mean([_predict(f'{f}_regressor', models[f'{f}_regressor'], X) for f in families], axis=0)
+    
+    n_classes = len(label_encoder.classes_)
+    votes = (encoded[None, :, :] == np.arange(n_classes)[:, None, None]).sum(axis=1)
+    vote = np.argmax(votes, axis=0)
+    split = votes.max(axis=0) == 1
+    if len(families) > 1 and split.any():
+        vote[split] = label_encoder.transform(classify_wqi_array(wqi[split]))
+    return vote, wqi
+
+
+def transfer_set(X_train, n_rows, noise=TRANSFER_NOISE, rng=None):
+    """Training rows drawn with replacement plus Gaussian jitter (scaled units)"""
+    rng = rng or np.random.default_rng(42)
+    rows = rng.integers(0, len(X_train), n_rows)
+    jitter = rng.normal(0.0, noise, (n_rows, X_train.shape[1])).astype(np.float32)
+    return np.asarray(X_train, dtype=np.float32)[rows] + jitter
+
+
+# ============================================================================
+# Variants
+# ============================================================================
+
+def greedy_tree_order(tree_outputs, target, task, n_select):
+    """
+    Forward selection of trees whose average best matches the teacher
+    
+    Parameters:
+    -----------
+    tree_outputs : np.ndarray
+        Per-tree class probabilities (n_trees, n, n_classes) or predictions
+        (n_trees, n)
+    target : np.ndarray
+        Teacher classes (encoded) or WQI of the same rows
+    task : str
+        'classifier' maximizes agreement, with the mean probability of the
+        teacher's class breaking ties; 'regressor' minimizes squared error
+    n_select : int
+    
+    Returns:
+    --------
+    list of int : Tree indices in selection order; every prefix is a pruned forest
+    """
+    n_trees = len(tree_outputs)
+    total = np.zeros(tree_outputs.shape[1:])
+    chosen, remaining = [], list(range(n_trees))
+    rows = np.arange(tree_outputs.shape[1])
+    
+    for size in range(1, min(n_select, n_trees) + 1):
+        candidates = total[None] + tree_outputs[remaining]
+        if task == 'classifier':
+            agree = (np.argmax(candidates, axis=2) == target).mean(axis=1)
+            score = agree + 0.01 * candidates[:, rows, target].mean(axis=1) / size
+        else:
+            score = -((candidates / size - target) ** 2).mean(axis=1)
+        best = remaining[int(np.argmax(score))]
+        chosen.append(best)
+        remaining.remove(best)
+        total += tree_outputs[best]
+    return chosen
+
+
+def _tree_outputs(model, X, task):
+    if task == 'classifier':
+        return np.stack([est.predict_proba(X) for est in model.estimators_]).astype(np.float32)
+    return np.stack([est.predict(X) for est in model.estimators_]).astype(np.float32)
+
+
+def pruned_forests(models, X, vote, wqi, sizes=PRUNE_SIZES):
+    """name -> (classifier arrays, regressor arrays) of the Random Forests cut to each size"""
+    rf_classifier, rf_regressor = models['rf_classifier'], models['rf_regressor']
+    n_trees = min(len(rf_classifier.estimators_), len(rf_regressor.estimators_))
+    sizes = [k for k in sizes if k < n_trees]
+    if not sizes:
+        return {}
+    
+    class_order = greedy_tree_order(_tree_outputs(rf_classifier, X, 'classifier'), vote,
+                                    'classifier', max(sizes))
+    reg_order = greedy_tree_order(_tree_outputs(rf_regressor, X, 'regressor'), wqi,
+                                  'regressor', max(sizes))
+    return {f'rf_pruned_{k}': (
+        export_sklearn_forest(rf_classifier, [rf_classifier.estimators_[i] for i in class_order[:k]]),
+        export_sklearn_forest(rf_regressor, [rf_regressor.estimators_[i] for i in reg_order[:k]]))
+        for k in sizes}
+
+
+def truncated_boosters(models, rounds=XGB_ROUNDS):
+    """name -> (classifier arrays, regressor arrays) of the first k XGBoost rounds"""
+    classifier = models['xgb_classifier'].get_booster()
+    regressor = models['xgb_regressor'].get_booster()
+    n_rounds = min(classifier.num_boosted_rounds(), regressor.num_boosted_rounds())
+    return {f'xgb_rounds_{k}': (export_xgboost(classifier[:k]), export_xgboost(regressor[:k]))
+            for k in rounds if k < n_rounds}
+
+
+def distilled_trees(X, vote, wqi, depths=DISTILL_DEPTHS, seed=42):
+    """name -> (classifier arrays, regressor arrays) of single trees fitted to the teacher"""
+    from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+    
+    variants = {}
+    for depth in depths:
+        classifier = DecisionTreeClassifier(max_depth=depth, min_samples_leaf=5,
+                                            random_state=seed).fit(X, vote)
+        regressor = DecisionTreeRegressor(max_depth=depth, min_samples_leaf=5,
+                                          random_state=seed).fit(X, wqi)
+        variants[f'distilled_d{depth}'] = (export_sklearn_forest(classifier),
+                                           export_sklearn_forest(regressor))
+    return variants
+
+
+# ============================================================================
+# Evaluation
+# ============================================================================
+
+def calibrate_threshold(confidence, agree, target=TARGET_AGREEMENT):
+    """
+    Lowest confidence above which the variant agrees with the teacher at
+    least target of the time
+    
+    Returns:
+    --------
+    tuple : (threshold, coverage); threshold is None when no confidence
+        level is good enough, so every row goes to the full ensemble
+    """
+    order = np.argsort(-confidence, kind='stable')
+    rate = np.cumsum(agree[order]) / np.arange(1, len(order) + 1)
+    conf_sorted = confidence[order]
+    # A threshold accepts every row at or above it, so only the last row of
+    # each run of equal confidences is a valid cut
+    last_of_level = np.append(conf_sorted[1:] != conf_sorted[:-1], True)
+    valid = np.flatnonzero(last_of_level & (rate >= target))
+    if not len(valid):
+        return None, 0.0
+    cut = valid[-1]
+    return float(conf_sorted[cut]), float((cut + 1) / len(order))
+
+
+def per_sample_latency_us(classifier, regressor, X, number=200):
+    """Best-of-5 time of one single-row class and WQI prediction in µs"""
+    row = np.ascontiguousarray(X[:1], dtype=np.float32)
+    call = lambda: (classifier.predict_proba(row), regressor.raw_predict(row))
+    call()
+    return min(timeit.repeat(call, number=number, repeat=5)) / number * 1e6
+
+
+def ensemble_latency_us(models, X, label_encoder, n_rows=ENSEMBLE_TIMING_ROWS, number=3):
+    """
+    Best-of-3 per-sample time of the teacher ensemble in µs, as the fallback
+    of predict_compact runs it: one call over a batch of n_rows
+    """
+    rows = np.resize(np.arange(len(X)), n_rows)
+    batch = np.ascontiguousarray(X[rows], dtype=np.float32)
+    call = lambda: ensemble_outputs(models, batch, label_encoder)
+    call()
+    return min(timeit.repeat(call, number=number, repeat=3)) / number / n_rows * 1e6
+
+
+def _scores(y_class, y_wqi, pred_class, pred_wqi):
+    from sklearn.metrics import accuracy_score, mean_squared_error, r2_score
+    return {'accuracy': float(accuracy_score(y_class, pred_class)),
+            'r2': float(r2_score(y_wqi, pred_wqi)),
+            'rmse': float(np.sqrt(mean_squared_error(y_wqi, pred_wqi)))}
+
+
+def evaluate_variant(name, arrays, teacher_test, y_test, X_test, X_calib, calib_vote):
+    """
+    Test scores, agreement with the teacher, confidence threshold and latency
+    
+    Parameters:
+    -----------
+    teacher_test : tuple
+        (encoded classes, WQI) of the full ensemble on X_test
+    y_test : tuple
+        True (encoded classes, WQI) of X_test
+    X_calib, calib_vote : np.ndarray
+        Held-out transfer rows and the teacher's classes for them
+    """
+    classifier, regressor = (FlatForest(a) for a in arrays)
+    proba = classifier.predict_proba(X_calib)
+    agree = classifier.classes_[np.argmax(proba, axis=1)] == calib_vote
+    threshold, coverage = calibrate_threshold(proba.max(axis=1), agree)
+    
+    proba = classifier.predict_proba(X_test)
+    pred_class = classifier.classes_[np.argmax(proba, axis=1)]
+    pred_wqi = regressor.predict(X_test)
+    report = {'name': name, **_scores(*y_test, pred_class, pred_wqi)}
+    
+    # What predict_compact returns: the teacher's answer below the threshold
+    low = proba.max(axis=1) < (np.inf if threshold is None else threshold)
+    fallback = _scores(*y_test, np.where(low, teacher_test[0], pred_class),
+                       np.where(low, teacher_test[1], pred_wqi))
+    report.update(
+        accuracy_with_fallback=fallback['accuracy'],
+        r2_with_fallback=fallback['r2'],
+        agreement=float(agree.mean()),
+        min_confidence=threshold,
+        coverage=coverage,
+        trees=len(classifier.roots) + len(regressor.roots),
+        nbytes=int(sum(a.nbytes for part in arrays for a in part.values())),
+        latency_us=per_sample_latency_us(classifier, regressor, X_test)
+    )
+    return report
+
+
+# ============================================================================
+# Entry points
+# ============================================================================
+
+def scaler_fingerprint(scaler):
+    """Short hash of a fitted StandardScaler's mean and scale"""
+    digest = hashlib.sha256()
+    for arr in (scaler.mean_, scaler.scale_):
+        digest.update(np.asarray(arr, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def compress_models(models, label_encoder, X_train, X_test, y_class_test, y_wqi_test, models_dir,
+                    scaler, teacher=None, prune_sizes=PRUNE_SIZES, xgb_rounds=XGB_ROUNDS,
+                    distill_depths=DISTILL_DEPTHS, transfer_rows=TRANSFER_ROWS,
+                    calibration_rows=CALIBRATION_ROWS, seed=42):
+    """
+    Build, evaluate and save every compact variant
+    
+    Parameters:
+    -----------
+    models : dict
+        name -> fitted full model (training.JOBS names); the variants of a
+        family are skipped when its models are missing
+    label_encoder : LabelEncoder
+    X_train, X_test : np.ndarray
+        Preprocessed training and test rows
+    y_class_test, y_wqi_test : np.ndarray
+        Encoded classes and WQI of the test rows
+    models_dir : str
+        Variants go to models_dir/compact/
+    scaler : StandardScaler
+        The scaler X_train and X_test were scaled with
+    teacher : tuple of str, optional
+        Model families ('rf', 'xgb', 'nn') whose ensemble the variants
+        imitate and fall back to; defaults to every family in models.
+        predict_compact needs these families enabled to fall back.
+    
+    Returns:
+    --------
+    list of dict : The manifest; the first entry is the full ensemble, every
+        other one a variant with '*_delta' fields relative to it
+    """
+    families = sorted({name.split('_')[0] for name in models} if teacher is None else teacher)
+    teacher_models = {name: model for name, model in models.items()
+                      if name.split('_')[0] in families}
+    
+    rng = np.random.default_rng(seed)
+    X_transfer = np.vstack([np.asarray(X_train, dtype=np.float32),
+                            transfer_set(X_train, transfer_rows, rng=rng)])
+    X_calib = transfer_set(X_train, calibration_rows, rng=rng)
+    X_test = np.asarray(X_test, dtype=np.float32)
+    
+    vote, wqi = ensemble_outputs(teacher_models, X_transfer, label_encoder)
+    calib_vote, _ = ensemble_outputs(teacher_models, X_calib, label_encoder)
+    teacher_test = ensemble_outputs(teacher_models, X_test, label_encoder)
+    y_test = (np.asarray(y_class_test), np.asarray(y_wqi_test))
+    
+    ensemble = {'name': 'ensemble', **_scores(*y_test, *teacher_test), 'agreement': 1.0,
+                'min_confidence': 0.0, 'coverage': 1.0,
+                'latency_us': ensemble_latency_us(teacher_models, X_test, label_encoder),
+                'teacher': families, 'scaler': scaler_fingerprint(scaler)}
+    
+    variants = {}
+    if 'rf_classifier' in models and 'rf_regressor' in models:
+        # Greedy selection scores every tree on every row, so it uses a sample
+        sample = rng.choice(len(X_transfer), min(len(X_transfer), 5_000), replace=False)
+        variants.update(pruned_forests(models, X_transfer[sample], vote[sample], wqi[sample],
+                                       prune_sizes))
+    if 'xgb_classifier' in models and 'xgb_regressor' in models:
+        variants.update(truncated_boosters(models, xgb_rounds))
+    variants.update(distilled_trees(X_transfer, vote, wqi, distill_depths, seed))
+    
+    compact_dir = os.path.join(models_dir, COMPACT_DIRNAME)
+    os.makedirs(compact_dir, exist_ok=True)
+    manifest = [ensemble]
+    for name, arrays in variants.items():
+        report = evaluate_variant(name, arrays, teacher_test, y_test, X_test, X_calib, calib_vote)
+        for metric in ('accuracy', 'r2', 'rmse'):
+            report[f'{metric}_delta'] = report[metric] - ensemble[metric]
+        report['latency_with_fallback_us'] = (report['latency_us'] + (1 - report['coverage'])
+                                              * ensemble['latency_us'])
+        manifest.append(report)
+        for task, part in zip(('classifier', 'regressor'), arrays):
+            np.savez(os.path.join(compact_dir, f'{name}_{task}.npz'), **part)
+    
+    tmp_path = os.path.join(compact_dir, f'{MANIFEST_FILENAME}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(compact_dir, MANIFEST_FILENAME))
+    return manifest
+
+
+def load_manifest(models_dir, scaler=None):
+    """
+    Saved variant reports (see compress_models), or [] when there are none
+    
+    Raises:
+    -------
+    ValueError : when scaler is given and the variants were built for another one
+    """
+    path = os.path.join(models_dir, COMPACT_DIRNAME, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        manifest = json.load(f)
+    if scaler is not None and manifest and manifest[0].get('scaler') != scaler_fingerprint(scaler):
+        raise ValueError(f"Compact variants in {os.path.dirname(path)} were built for a different "
+                         "scaler; rebuild them with compression.compress_models")
+    return manifest
+
+
+def select_variant(manifest, budget_us):
+    """
+    Variant agreeing most with the full ensemble among those within budget_us
+    (ties go to the faster one)
+    
+    Raises:
+    -------
+    ValueError : when no variant fits the budget
+    """
+    variants = [v for v in manifest if v['name'] != 'ensemble']
+    if not variants:
+        raise ValueError("No compact variants saved; run compression first")
+    fitting = [v for v in variants if v['latency_us'] <= budget_us]
+    if not fitting:
+        fastest = min(variants, key=lambda v: v['latency_us'])
+        raise ValueError(f"No compact variant fits {budget_us} µs; the fastest, "
+                         f"{fastest['name']}, takes {fastest['latency_us']:.1f} µs")
+    return max(fitting, key=lambda v: (v['agreement'], -v['latency_us']))
+
+
+def load_variant(models_dir, name):
+    """(classifier, regressor) FlatForests of a saved variant"""
+    from numpy_runtime import load_model
+    compact_dir = os.path.join(models_dir, COMPACT_DIRNAME)
+    return tuple(load_model(os.path.join(compact_dir, f'{name}_{task}.npz'))
+                 for task in ('classifier', 'regressor'))
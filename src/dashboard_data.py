@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Dashboard Data Artifacts
+Pre-aggregated JSON files read by the static dashboard in docs/
+
+Instead of shipping the monitoring CSV, the pipeline writes these small
+summaries, so the browser downloads kilobytes whatever the dataset size:
+    
+    summary.json             headline counts, class counts, WQI histogram, model scores
+    water_bodies.json        per water body WQI statistics and monthly trend
+    feature_importance.json  Random Forest importances (and mean |SHAP| when saved)
+    stations/index.json      shard count and the station -> shard rule
+    stations/shard-NN.json   monthly WQI series of the stations in one shard
+
+Station series are split into shards by station code, and the dashboard only
+fetches the shard of the station being viewed.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from wqi import CLASS_THRESHOLDS
+
+FORMAT_VERSION = 1
+
+CLASS_ORDER = ['Safe/Potable', 'Polluted', 'Highly Polluted']
+
+HISTOGRAM_BIN_WIDTH = 10
+
+DEFAULT_SHARDS = 16
+
+
+def _round(values, decimals=2):
+    """Floats rounded for the browser, NaN as null"""
+    return [None if pd.isna(v) else round(float(v), decimals) for v in values]
+
+
+def _write_json(obj, path):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def shard_of(station_code, n_shards):
+    """Shard holding a station's series; the dashboard applies the same rule"""
+    return int(station_code) % n_shards
+
+
+# ============================================================================
+# Aggregates
+# ============================================================================
+
+def class_counts(df):
+    counts = df['Water_Quality_Class'].value_counts()
+    return {label: int(counts.get(label, 0)) for label in CLASS_ORDER}
+
+
+def wqi_histogram(wqi, bin_width=HISTOGRAM_BIN_WIDTH):
+    """Counts per WQI bin on [0, 100]; the last bin includes 100"""
+    edges = np.arange(0, 100 + bin_width, bin_width)
+    counts, _ = np.histogram(np.clip(wqi, 0, 100), bins=edges)
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+
+def water_body_summary(df, aggregates=None):
+    """
+    WQI statistics per water body for the current data, with the monthly
+    sample-weighted mean WQI from the station store's (station, period) table
+    """
+    grouped = df.groupby('water_bodies', sort=True)
+    stats = grouped['WQI'].agg(['size', 'mean', 'median', 'min', 'max'])
+    counts = pd.crosstab(df['water_bodies'], df['Water_Quality_Class'])
+    
+    trends = {}
+    if aggregates is not None and len(aggregates):
+        monthly = aggregates.groupby(['water_body', 'period'], sort=True)[['wqi_sum', 'n']].sum()
+        monthly['wqi_mean'] = monthly['wqi_sum'] / monthly['n']
+        for body, series in monthly['wqi_mean'].groupby(level=0):
+            trends[body] = {'periods': series.index.get_level_values(1).tolist(),
+                            'wqi_mean': _round(series)}
+    
+    bodies = []
+    for body, row in stats.sort_values('size', ascending=False).iterrows():
+        bodies.append({
+            'name': ' '.join(str(body).split()),
+            'samples': int(row['size']),
+            'wqi_mean': round(float(row['mean']), 2),
+            'wqi_median': round(float(row['median']), 2),
+            'wqi_min': round(float(row['min']), 2),
+            'wqi_max': round(float(row['max']), 2),
+            'class_counts': {label: int(counts.at[body, label]) if label in counts else 0
+                             for label in CLASS_ORDER},
+            'trend': trends.get(body, {'periods': [], 'wqi_mean': []})
+        })
+    return bodies
+
+
+def feature_importance(model, feature_names, global_importances=None, top=None):
+    """
+    Impurity importances of a fitted forest, highest first
+    
+    global_importances (see explain.load_global_importances) adds the mean
+    |SHAP| of the same model when it was saved.
+    """
+    order = np.argsort(model.feature_importances_)[::-1][:top]
+    shap_values = (global_importances or {}).get('mean_abs_shap', {})
+    return [{'feature': feature_names[i],
+             'importance': round(float(model.feature_importances_[i]), 4),
+             'mean_abs_shap': (round(float(shap_values[feature_names[i]]), 4)
+                               if feature_names[i] in shap_values else None)}
+            for i in order]
+
+
+def station_shards(aggregates, n_shards=DEFAULT_SHARDS):
+    """
+    Monthly series per station from the station store, grouped into shards
+    
+    Returns:
+    --------
+    dict : shard number -> {station code: {'name', 'water_body', 'periods',
+        'wqi_mean', 'wqi_mean_3m', 'wqi_mean_12m', 'class', 'samples'}}
+    """
+    shards = {shard: {} for shard in range(n_shards)}
+    if aggregates is None or not len(aggregates):
+        return shards
+    
+    # The aggregate table is sorted by (station, period)
+    for code, rows in aggregates.groupby('Station code', sort=True):
+        shards[shard_of(code, n_shards)][str(code)] = {
+            'name': rows['station_name'].iloc[-1],
+            'water_body': ' '.join(str(rows['water_body'].iloc[-1]).split()),
+            'periods': rows['period'].tolist(),
+            'wqi_mean': _round(rows['wqi_mean']),
+            'wqi_mean_3m': _round(rows['wqi_mean_3m']),
+            'wqi_mean_12m': _round(rows['wqi_mean_12m']),
+            'class': rows['class'].tolist(),
+            'samples': rows['n'].astype(int).tolist()
+        }
+    return shards
+
+
+# ============================================================================
+# Writing
+# ============================================================================
+
+def write_dashboard_data(out_dir, df, period, reports=None, importances=None, aggregates=None,
+                         n_shards=DEFAULT_SHARDS):
+    """
+    Write every dashboard artifact, replacing the previous ones
+    
+    Parameters:
+    -----------
+    out_dir : str
+        Usually docs/data/dashboard
+    df : pd.DataFrame
+        Cleaned, labelled readings of the current period (run_analysis's
+        df_clean): 'Station code', 'water_bodies', 'WQI', 'Water_Quality_Class'
+    period : str
+        'YYYY-MM' of df
+    reports : dict, optional
+        training.train_parallel reports; their test scores go into summary.json
+    importances : list of dict, optional
+        Output of feature_importance()
+    aggregates : pd.DataFrame, optional
+        StationStore.aggregates(), for monthly trends and station series
+    
+    Returns:
+    --------
+    dict : file name -> size in bytes
+    """
+    stations_dir = os.path.join(out_dir, 'stations')
+    if os.path.isdir(stations_dir):
+        # A different shard count must not leave stale shards behind
+        shutil.rmtree(stations_dir)
+    os.makedirs(stations_dir)
+    
+    wqi = df['WQI'].to_numpy(dtype=float)
+    models = {name: {metric: round(float(report[metric]), 4)
+                     for metric in ('accuracy', 'r2', 'rmse') if metric in report}
+              for name, report in (reports or {}).items()}
+    summary = {
+        'format_version': FORMAT_VERSION,
+        'generated': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'period': period,
+        'samples': len(df),
+        'stations': int(df['Station code'].nunique()),
+        'water_bodies': int(df['water_bodies'].nunique()),
+        'wqi_mean': round(float(np.mean(wqi)), 2),
+        'wqi_median': round(float(np.median(wqi)), 2),
+        'thresholds': CLASS_THRESHOLDS,
+        'class_counts': class_counts(df),
+        'wqi_histogram': wqi_histogram(wqi),
+        'models': models,
+        'station_shards': n_shards
+    }
+    
+    files = {
+        'summary.json': summary,
+        'water_bodies.json': water_body_summary(df, aggregates),
+        'feature_importance.json': importances or [],
+        os.path.join('stations', 'index.json'): {
+            'shards': n_shards, 'rule': 'station code % shards',
+            'periods': sorted(aggregates['period'].unique().tolist())
+            if aggregates is not None and len(aggregates) else []
+        }
+    }
+    for shard, series in station_shards(aggregates, n_shards).items():
+        files[os.path.join('stations', f'shard-{shard:02d}.json')] = series
+    
+    sizes = {}
+    for name, obj in files.items():
+        path = os.path.join(out_dir, name)
+        _write_json(obj, path)
+        sizes[name] = os.path.getsize(path)
+    return sizes
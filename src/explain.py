@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Model Explanations
+Batched TreeSHAP attributions for the Random Forest and XGBoost models
+
+XGBoost models are explained by XGBoost's own multi-threaded TreeSHAP
+(``pred_contribs``). Random Forests go through ``shap.TreeExplainer``; its
+C++ kernel is single-threaded, so large batches are split over a pool of
+worker processes that each build the explainer once. Either way one call
+covers the whole batch instead of one explainer call per row.
+
+Attributions are in the model's output units: class probability for Random
+Forest classifiers, log-odds (softmax margin) for XGBoost classifiers and
+WQI points for regressors. For every row, base value + attributions equals
+the model output.
+"""
+
+import json
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from prediction_cache import PredictionCache
+
+GLOBAL_IMPORTANCE_FILENAME = 'global_importance.json'
+
+# Rows of the training matrix summarized into global importances
+GLOBAL_SAMPLE_ROWS = 2_000
+
+# Below this many rows per worker a Random Forest batch stays in-process
+MIN_ROWS_PER_WORKER = 256
+
+TREE_FAMILIES = ('rf', 'xgb')
+
+
+# ============================================================================
+# TreeSHAP
+# ============================================================================
+
+def _rf_shap(explainer, X):
+    """shap.TreeExplainer output as (n_samples, n_outputs, n_features + 1), bias last"""
+    values = explainer.shap_values(X, check_additivity=False)
+    # Older shap returns one array per class, newer a (n, features, classes) array
+    if isinstance(values, list):
+        values = np.stack(values, axis=1)
+    elif values.ndim == 3:
+        values = values.transpose(0, 2, 1)
+    else:
+        values = values[:, None, :]
+    
+    base = np.broadcast_to(np.atleast_1d(explainer.expected_value), values.shape[1:2])
+    bias = np.broadcast_to(base[None, :, None], (len(X), values.shape[1], 1))
+    return np.concatenate([values, bias], axis=2)
+
+
+_worker_explainer = None
+
+
+def _init_worker(model_bytes):
+    global _worker_explainer
+    import shap
+    _worker_explainer = shap.TreeExplainer(pickle.loads(model_bytes))
+
+
+def _worker_shap(X):
+    return _rf_shap(_worker_explainer, X)
+
+
+class TreeShapExplainer:
+    """TreeSHAP for one fitted Random Forest or XGBoost model"""
+    
+    def __init__(self, family, model, n_jobs=None):
+        """
+        Parameters:
+        -----------
+        family : str
+            'rf' or 'xgb'
+        model : fitted sklearn forest or XGBoost sklearn-API model
+        n_jobs : int, optional
+            XGBoost threads, or Random Forest worker processes; defaults to
+            the number of cores
+        """
+        if family not in TREE_FAMILIES:
+            raise ValueError("TreeSHAP explanations need a tree model: 'rf' or 'xgb'")
+        self.family = family
+        self.model = model
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self._explainer = None
+        self._pool = None
+    
+    def shap_values(self, X):
+        """
+        Attributions for a preprocessed float32 matrix
+        
+        Returns:
+        --------
+        np.ndarray : (n_samples, n_outputs, n_features + 1); the last column
+            is the base value. n_outputs is the number of classes for
+            classifiers and 1 for regressors.
+        """
+        if self.family == 'xgb':
+            import xgboost as xgb
+            booster = self.model.get_booster()
+            booster.set_param({'nthread': self.n_jobs})
+            contribs = booster.predict(xgb.DMatrix(X), pred_contribs=True)
+            return contribs if contribs.ndim == 3 else contribs[:, None, :]
+        
+        n_workers = min(self.n_jobs, len(X) // MIN_ROWS_PER_WORKER)
+        if n_workers <= 1:
+            if self._explainer is None:
+                import shap
+                self._explainer = shap.TreeExplainer(self.model)
+            return _rf_shap(self._explainer, X)
+        
+        if self._pool is None:
+            # spawn: the parent may hold TensorFlow/OpenMP state that fork would copy
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.n_jobs, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker, initargs=(pickle.dumps(self.model),))
+        chunks = np.array_split(X, n_workers)
+        return np.concatenate(list(self._pool.map(_worker_shap, chunks)))
+    
+    def close(self):
+        """Stop the worker processes, if any were started"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class ExplanationCache(PredictionCache):
+    """PredictionCache holding the flattened attributions of each (quantized sample, model)"""
+    
+    def lookup(self, keys, name, width):
+        """
+        Fetch cached attribution rows
+        
+        Returns:
+        --------
+        tuple : (float64 (n, width) array with NaN rows for misses, boolean miss mask)
+        """
+        values = np.full((len(keys), width), np.nan)
+        missing = np.ones(len(keys), dtype=bool)
+        with self._lock:
+            entries = self._entries
+            for i, key in enumerate(keys):
+                row = entries.get((key, name))
+                if row is not None:
+                    entries.move_to_end((key, name))
+                    values[i] = row
+                    missing[i] = False
+            hits = len(keys) - int(missing.sum())
+            self.stats['hits'] += hits
+            self.stats['misses'] += len(keys) - hits
+        return values, missing
+    
+    def store(self, keys, name, values):
+        with self._lock:
+            entries = self._entries
+            for key, row in zip(keys, values):
+                entries[(key, name)] = np.array(row, dtype=np.float64)
+                entries.move_to_end((key, name))
+            overflow = len(entries) - self.max_size
+            for _ in range(max(overflow, 0)):
+                entries.popitem(last=False)
+            self.stats['evictions'] += max(overflow, 0)
+
+
+# ============================================================================
+# Global importances (computed when the models are saved)
+# ============================================================================
+
+def global_importances(models, X, feature_names, max_rows=GLOBAL_SAMPLE_ROWS, seed=42,
+                       n_jobs=None):
+    """
+    Mean |SHAP| per feature for every tree model
+    
+    Parameters:
+    -----------
+    models : dict
+        name -> fitted model (keys of training.JOBS); non-tree models are skipped
+    X : np.ndarray
+        Preprocessed training rows; a random sample of max_rows is explained
+    feature_names : list of str
+    
+    Returns:
+    --------
+    dict : name -> {'mean_abs_shap': {feature: value}, 'rows': n}; for
+        classifiers the absolute attributions are summed over classes
+    """
+    X = np.asarray(X, dtype=np.float32)
+    if len(X) > max_rows:
+        X = X[np.random.default_rng(seed).choice(len(X), max_rows, replace=False)]
+    
+    importances = {}
+    for name, model in models.items():
+        family = name.split('_')[0]
+        if family not in TREE_FAMILIES:
+            continue
+        explainer = TreeShapExplainer(family, model, n_jobs)
+        try:
+            values = explainer.shap_values(X)[:, :, :-1]
+        finally:
+            explainer.close()
+        mean_abs = np.abs(values).sum(axis=1).mean(axis=0)
+        importances[name] = {
+            'mean_abs_shap': {f: float(v) for f, v in zip(feature_names, mean_abs)},
+            'rows': len(X)
+        }
+    return importances
+
+
+def save_global_importances(importances, models_dir):
+    path = os.path.join(models_dir, GLOBAL_IMPORTANCE_FILENAME)
+    with open(path, 'w') as f:
+        json.dump(importances, f, indent=2)
+    return path
+
+
+def load_global_importances(models_dir):
+    """Importances written at training time, or {} for models saved without them"""
+    path = os.path.join(models_dir, GLOBAL_IMPORTANCE_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
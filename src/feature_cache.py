@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Cleaned Feature Matrix Cache
+Columnar (Arrow IPC) cache of the cleaned, WQI-labelled dataset
+
+A hit saves re-parsing and re-cleaning the CSV, not memory: the file is
+memory-mapped for reading, but to_pandas() copies the columns into ordinary
+NumPy-backed columns, which the feature matrix and WQI code expect.
+"""
+
+import hashlib
+import json
+import os
+
+# Bump whenever cleaning or WQI logic changes so old caches are never reused
+CACHE_VERSION = 1
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 of a file, read in blocks so large archives are not loaded whole"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(csv_path, standards, key_parameters):
+    """Key derived from the source CSV contents, the standards and the feature list"""
+    config = json.dumps(
+        {'version': CACHE_VERSION, 'standards': standards, 'key_parameters': list(key_parameters)},
+        sort_keys=True
+    )
+    digest = hashlib.sha256()
+    digest.update(file_digest(csv_path).encode())
+    digest.update(config.encode())
+    return digest.hexdigest()[:16]
+
+
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f'clean_{key}.arrow')
+
+
+def load_cached(cache_dir, key):
+    """
+    Read a cached cleaned dataset (columns are copied out of the mapped file)
+    
+    Returns:
+    --------
+    pd.DataFrame or None : The cached df_clean, or None on a miss or when
+        pyarrow is not installed
+    """
+    path = cache_path(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return None
+    
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas()
+
+
+def save_cache(df, cache_dir, key):
+    """
+    Write df as an uncompressed Arrow IPC file, which reads back without decoding
+    
+    Returns:
+    --------
+    str or None : Path written, or None when pyarrow is not installed
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+    except ImportError:
+        return None
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, key)
+    tmp_path = f'{path}.tmp'
+    feather.write_feather(pa.Table.from_pandas(df, preserve_index=True), tmp_path,
+                          compression='uncompressed')
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+"""
+Incremental Retraining
+Fold a new month of samples into the saved models without refitting from scratch
+    
+    python src/incremental.py new_month.csv --models-dir models
+
+The cost of an update depends only on the new rows plus a bounded replay
+sample of older ones:
+
+- Imputer medians come from per-feature value counts at instrument precision,
+  an exact sufficient statistic for the median that is merged, not refit.
+- The scaler is updated with StandardScaler.partial_fit (running mean/var).
+  Every saved model is then re-parameterized for the new scaling, so its
+  predictions on readings at instrument precision are unchanged before any
+  new training starts; the update stops if the replay sample says otherwise.
+- Random Forests grow extra trees on the new data (warm_start), XGBoost
+  continues boosting from the saved booster, and the Keras nets are
+  fine-tuned from their saved weights at a lower learning rate.
+- Compact variants (see compression.py) are rebuilt from the updated models,
+  since they take inputs scaled by the old scaler.
+
+The replay sample keeps every class represented in each update, which both
+warm-started classifiers need and which limits forgetting in the nets.
+"""
+
+import argparse
+import json
+import logging
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import REGISTRY, get_logger, log_event
+from compression import COMPACT_DIRNAME, MANIFEST_FILENAME, compress_models
+from ingest import load_clean_data
+from prediction_cache import DEFAULT_DECIMALS, INSTRUMENT_DECIMALS
+from training import DEFAULT_PARAMS, JOBS, evaluate_model, load_model, model_path, save_artifacts
+from training_data import split_order
+from wqi import STANDARDS, calculate_wqi_frame, classify_wqi_array
+
+STATE_FILENAME = 'training_state.npz'
+
+REPLAY_PER_CLASS = 64
+EXTRA_TREES = 20
+# Forests stay the size run_analysis.py trains: each update replaces the oldest trees
+MAX_TREES = DEFAULT_PARAMS['rf']['n_estimators']
+EXTRA_ROUNDS = 20
+NN_EPOCHS = 20
+NN_LEARNING_RATE = 1e-4
+
+
+# ============================================================================
+# Sufficient statistics
+# ============================================================================
+
+def _merge_counts(values, counts, new_values):
+    """Add new (non-NaN) observations to a sorted value -> count table"""
+    new_values, new_counts = np.unique(new_values, return_counts=True)
+    merged, inverse = np.unique(np.concatenate([values, new_values]), return_inverse=True)
+    return merged, np.bincount(inverse, weights=np.concatenate([counts, new_counts]))
+
+
+def _median_from_counts(values, counts):
+    """Same result as np.median over the expanded observations"""
+    total = int(counts.sum())
+    if total == 0:
+        return np.nan
+    cum = np.cumsum(counts)
+    lo = values[np.searchsorted(cum, (total - 1) // 2, side='right')]
+    hi = values[np.searchsorted(cum, total // 2, side='right')]
+    return (lo + hi) / 2
+
+
+class TrainingState:
+    """
+    Everything about past training data an incremental update needs
+    
+    Attributes:
+    -----------
+    feature_names : list of str
+    value_counts : list of (values, counts) arrays, one pair per feature
+    replay_X, replay_class, replay_wqi : arrays
+        Raw features, labels and WQI of the reservoir sample
+    class_seen : dict
+        Label -> number of samples of that class ever offered to the reservoir
+    n_samples : int
+        Samples folded in so far
+    """
+    
+    def __init__(self, feature_names, value_counts, replay_X, replay_class, replay_wqi,
+                 class_seen, n_samples, seed=42):
+        self.feature_names = list(feature_names)
+        self.value_counts = value_counts
+        self.replay_X = replay_X
+        self.replay_class = replay_class
+        self.replay_wqi = replay_wqi
+        self.class_seen = class_seen
+        self.n_samples = n_samples
+        self._rng = np.random.default_rng(seed + n_samples)
+        self._factor = np.array([10.0 ** INSTRUMENT_DECIMALS.get(f, DEFAULT_DECIMALS)
+                                 for f in self.feature_names])
+    
+    @classmethod
+    def empty(cls, feature_names, seed=42):
+        n_features = len(feature_names)
+        return cls(feature_names, [(np.empty(0), np.empty(0)) for _ in range(n_features)],
+                   np.empty((0, n_features)), np.empty(0, dtype=object), np.empty(0), {}, 0,
+                   seed)
+    
+    @classmethod
+    def from_data(cls, X, y_class, y_wqi, seed=42, chunk_rows=65536):
+        """
+        Build the state of a full training run
+        
+        Parameters:
+        -----------
+        X : pd.DataFrame
+            Raw (un-imputed) feature columns
+        y_class, y_wqi : array-like
+            Class labels and WQI of the same rows
+        chunk_rows : int
+            Rows converted to float64 at a time; the result does not depend on it
+        """
+        state = cls.empty(list(X.columns), seed)
+        y_class, y_wqi = np.asarray(y_class), np.asarray(y_wqi)
+        for start in range(0, len(X), chunk_rows):
+            end = start + chunk_rows
+            state.update(X.iloc[start:end].to_numpy(dtype=np.float64, na_value=np.nan),
+                         y_class[start:end], y_wqi[start:end])
+        return state
+    
+    def update(self, X, y_class, y_wqi):
+        """Fold new raw rows into the value counts and the replay reservoir"""
+        X = np.asarray(X, dtype=np.float64)
+        quantized = np.rint(X * self._factor) / self._factor
+        for j, (values, counts) in enumerate(self.value_counts):
+            column = quantized[:, j]
+            self.value_counts[j] = _merge_counts(values, counts, column[~np.isnan(column)])
+        
+        # Reservoir sampling per class keeps a uniform sample of every class
+        replay_X, replay_class = list(self.replay_X), list(self.replay_class)
+        replay_wqi = list(self.replay_wqi)
+        slots = {}
+        for i, label in enumerate(replay_class):
+            slots.setdefault(label, []).append(i)
+        
+        for row, label, wqi in zip(X, y_class, y_wqi):
+            seen = self.class_seen.get(label, 0) + 1
+            self.class_seen[label] = seen
+            class_slots = slots.setdefault(label, [])
+            if len(class_slots) < REPLAY_PER_CLASS:
+                class_slots.append(len(replay_X))
+                replay_X.append(row)
+                replay_class.append(label)
+                replay_wqi.append(wqi)
+            else:
+                k = self._rng.integers(0, seen)
+                if k < REPLAY_PER_CLASS:
+                    replay_X[class_slots[k]], replay_wqi[class_slots[k]] = row, wqi
+        
+        n_features = len(self.feature_names)
+        self.replay_X = np.array(replay_X, dtype=np.float64).reshape(-1, n_features)
+        self.replay_class = np.array(replay_class, dtype=object)
+        self.replay_wqi = np.array(replay_wqi, dtype=np.float64)
+        self.n_samples += len(X)
+    
+    def medians(self):
+        """Per-feature medians of every sample seen, as SimpleImputer computes them"""
+        return np.array([_median_from_counts(v, c) for v, c in self.value_counts])
+    
+    def save(self, path):
+        arrays = {
+            'feature_names': np.array(self.feature_names),
+            'replay_X': self.replay_X,
+            'replay_class': self.replay_class.astype(str),
+            'replay_wqi': self.replay_wqi,
+            'class_seen': np.array(json.dumps({str(k): int(v) for k, v in self.class_seen.items()})),
+            'n_samples': np.array(self.n_samples)
+        }
+        for j, (values, counts) in enumerate(self.value_counts):
+            arrays[f'values_{j}'] = values
+            arrays[f'counts_{j}'] = counts
+        
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        return path
+    
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            feature_names = [str(f) for f in data['feature_names']]
+            value_counts = [(data[f'values_{j}'], data[f'counts_{j}'])
+                            for j in range(len(feature_names))]
+            return cls(feature_names, value_counts, data['replay_X'],
+                       data['replay_class'].astype(object), data['replay_wqi'],
+                       json.loads(str(data['class_seen'])), int(data['n_samples']))
+
+
+# ============================================================================
+# Re-parameterizing models for a new scaler
+# ============================================================================
+
+def reading_steps(feature_names):
+    """Smallest difference between two lab readings of each feature (INSTRUMENT_DECIMALS)"""
+    return np.array([10.0 ** -INSTRUMENT_DECIMALS.get(f, DEFAULT_DECIMALS) for f in feature_names])
+
+
+def _snap_thresholds(thresholds, features, old_mean, old_scale, step, strict):
+    """
+    Move split thresholds (old scaled units) halfway between two grid points
+    in raw units, keeping every grid value on the side it went before
+    
+    A threshold taken from an observed value sits exactly on a grid point,
+    where float32 rounding after a change of scaling decides the side. The
+    grid has half the reading step, so imputed medians of an even number of
+    readings are on it too. strict is XGBoost's `x < t`; sklearn splits on
+    `x <= t`.
+    """
+    mean, scale = old_mean[features], old_scale[features]
+    half = step[features] / 2
+    nearest = np.round((thresholds * scale + mean) / half) * half
+    # The side the nearest grid value took, scaled as the predictor scales it
+    z = ((nearest - mean) / scale).astype(np.float32)
+    left = z < thresholds if strict else z <= thresholds
+    return np.where(left, nearest + half / 2, nearest - half / 2)
+
+
+def rescale_model_inputs(name, model, old_mean, old_scale, new_mean, new_scale, step=None):
+    """
+    Rewrite a model trained on (x - old_mean) / old_scale so that it gives the
+    same output on (x - new_mean) / new_scale
+    
+    For the nets the first Dense layer absorbs the change of scaling (an exact
+    affine re-parameterization up to float rounding). Tree thresholds are
+    mapped through it; with step (raw units per feature, see reading_steps)
+    each one is first snapped between two readings, so no reading at that
+    precision changes sides through float32 rounding.
+    """
+    # z_old = z_new * gain + shift
+    gain = new_scale / old_scale
+    shift = (new_mean - old_mean) / old_scale
+    family = JOBS[name][0]
+    
+    def remap(thresholds, features, strict):
+        if step is None:
+            return (thresholds - shift[features]) / gain[features]
+        raw = _snap_thresholds(thresholds, features, old_mean, old_scale, step, strict)
+        return (raw - new_mean[features]) / new_scale[features]
+    
+    if family == 'rf':
+        for tree in model.estimators_:
+            nodes = tree.tree_
+            split = nodes.feature >= 0
+            thresholds = nodes.threshold
+            thresholds[split] = remap(thresholds[split], nodes.feature[split], strict=False)
+    elif family == 'xgb':
+        booster = model.get_booster()
+        config = json.loads(booster.save_raw('json'))
+        for tree in config['learner']['gradient_booster']['model']['trees']:
+            children = np.asarray(tree['left_children'])
+            features = np.asarray(tree['split_indices'])
+            # Stored as float32 and printed shortest-round-trip, so parse back to float32
+            conditions = np.asarray(tree['split_conditions'], dtype=np.float32).astype(np.float64)
+            split = children != -1
+            conditions[split] = remap(conditions[split], features[split], strict=True)
+            tree['split_conditions'] = conditions.tolist()
+        booster.load_model(bytearray(json.dumps(config).encode('utf-8')))
+    else:
+        dense = model.layers[0]
+        kernel, bias = dense.get_weights()
+        dense.set_weights([kernel * gain[:, None].astype(kernel.dtype),
+                           (bias + shift @ kernel).astype(bias.dtype)])
+    return model
+
+
+def model_outputs(name, model, X):
+    """Class probabilities or WQI of one model, the outputs rescaling must preserve"""
+    family, task = JOBS[name]
+    if family == 'nn':
+        return model.predict(X, verbose=0)
+    return model.predict_proba(X) if task == 'classification' else model.predict(X)
+
+
+# ============================================================================
+# Warm-start fitting
+# ============================================================================
+
+def warm_start_model(name, model, X, y, n_threads=None, extra_trees=EXTRA_TREES,
+                     extra_rounds=EXTRA_ROUNDS, nn_epochs=NN_EPOCHS,
+                     nn_learning_rate=NN_LEARNING_RATE, max_trees=MAX_TREES):
+    """
+    Continue training a saved model on new (scaled) data
+    
+    Parameters:
+    -----------
+    name : str
+        Key of training.JOBS
+    extra_trees : int
+        Trees added to a Random Forest
+    extra_rounds : int
+        Boosting rounds appended to an XGBoost model
+    nn_epochs, nn_learning_rate : int, float
+        Fine-tuning budget of the Keras nets
+    max_trees : int or None
+        Drop the oldest Random Forest trees beyond this many; None lets the
+        forest grow by extra_trees on every update
+    """
+    family = JOBS[name][0]
+    if n_threads and family in ('rf', 'xgb'):
+        model.set_params(n_jobs=n_threads)
+    
+    if family == 'rf':
+        if max_trees and len(model.estimators_) + extra_trees > max_trees:
+            model.estimators_ = model.estimators_[len(model.estimators_) + extra_trees - max_trees:]
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + extra_trees)
+        model.fit(X, y)
+        model.set_params(warm_start=False)
+    elif family == 'xgb':
+        model.set_params(n_estimators=extra_rounds)
+        model.fit(X, y, xgb_model=model.get_booster())
+    else:
+        from tensorflow.keras.callbacks import EarlyStopping
+        model.optimizer.learning_rate.assign(nn_learning_rate)
+        # Too few rows to spare a validation split: stop on the training loss
+        validation_split = 0.2 if len(X) >= 50 else 0.0
+        monitor = 'val_loss' if validation_split else 'loss'
+        model.fit(X, y, validation_split=validation_split, epochs=nn_epochs, batch_size=32,
+                  callbacks=[EarlyStopping(monitor=monitor, patience=5,
+                                           restore_best_weights=True)],
+                  verbose=0)
+    return model
+
+
+def _labelled(df):
+    df = df.assign(WQI=calculate_wqi_frame(df, STANDARDS))
+    df['Water_Quality_Class'] = classify_wqi_array(df['WQI'])
+    return df.dropna(subset=['WQI', 'Water_Quality_Class'])
+
+
+def retrain_incremental(new_csv, models_dir='models', archive_csv=None, holdout=0.2,
+                        n_threads=None, max_trees=MAX_TREES, seed=42):
+    """
+    Fold new_csv into the models in models_dir and save them in place
+    
+    Parameters:
+    -----------
+    new_csv : str
+        Newly arrived monitoring data (same layout as the original CSV)
+    models_dir : str
+        Artifacts written by run_analysis.py
+    archive_csv : str, optional
+        Original training CSV; only needed to build training_state.npz for
+        models trained before incremental updates existed. Its test split
+        (split_order) is left out, as run_analysis.py leaves it out.
+    holdout : float
+        Fraction of the new rows kept out of training to score before/after
+    n_threads : int, optional
+        Thread budget for the tree models
+    max_trees : int or None
+        Cap on Random Forest size (oldest trees are dropped); None for no cap
+    
+    Returns:
+    --------
+    dict : name -> {'fit_s', 'before', 'after'} where before/after are the
+        evaluate_model scores on the held-out new rows
+    """
+    log = get_logger('incremental')
+    
+    def load_pickle(name):
+        with open(os.path.join(models_dir, f'{name}.pkl'), 'rb') as f:
+            return pickle.load(f)
+    
+    feature_names = load_pickle('feature_names')
+    imputer, scaler = load_pickle('imputer'), load_pickle('scaler')
+    label_encoder = load_pickle('label_encoder')
+    models = {name: load_model(name, model_path(models_dir, name)) for name in JOBS
+              if os.path.exists(model_path(models_dir, name))}
+    
+    state_path = os.path.join(models_dir, STATE_FILENAME)
+    if os.path.exists(state_path):
+        state = TrainingState.load(state_path)
+    elif archive_csv:
+        archive = _labelled(load_clean_data(archive_csv))
+        # The training rows of run_analysis.py's split, as the saved imputer and scaler saw
+        order, n_train = split_order(label_encoder.transform(archive['Water_Quality_Class']))
+        archive = archive.iloc[order[:n_train]]
+        state = TrainingState.from_data(archive[feature_names], archive['Water_Quality_Class'],
+                                        archive['WQI'], seed)
+    else:
+        raise FileNotFoundError(
+            f"{state_path} not found; pass the original training CSV as archive_csv once"
+        )
+    
+    new = _labelled(load_clean_data(new_csv))
+    unknown = set(new['Water_Quality_Class']) - set(label_encoder.classes_)
+    if unknown:
+        raise ValueError(f"New classes {sorted(unknown)} need a full retrain")
+    
+    rng = np.random.default_rng(seed)
+    is_holdout = rng.random(len(new)) < holdout
+    train, test = new[~is_holdout], new[is_holdout]
+    log_event(log, 'data_loaded', f"📊 {len(new)} new samples ({len(train)} train, "
+              f"{len(test)} held out); {state.n_samples} seen before",
+              new=len(new), train=len(train), holdout=len(test), seen=state.n_samples)
+    
+    def impute(X_raw):
+        # The preprocessors were fitted on DataFrames; keep the column names
+        X = pd.DataFrame(X_raw, columns=feature_names)
+        return pd.DataFrame(imputer.transform(X), columns=feature_names)
+    
+    def prepare(df):
+        X = scaler.transform(impute(df[feature_names].to_numpy(dtype=np.float64)))
+        return X, label_encoder.transform(df['Water_Quality_Class']), df['WQI'].to_numpy()
+    
+    def score(df):
+        if df.empty:
+            return {}
+        X, y_class, y_wqi = prepare(df)
+        return {name: evaluate_model(name, model, X, y_class if JOBS[name][1] == 'classification'
+                                     else y_wqi) for name, model in models.items()}
+    
+    before = score(test)
+    
+    # Preprocessors: exact running statistics instead of a refit
+    replay_X, replay_class = state.replay_X, state.replay_class
+    replay_wqi = state.replay_wqi
+    X_new_raw = train[feature_names].to_numpy(dtype=np.float64)
+    state.update(X_new_raw, train['Water_Quality_Class'].to_numpy(), train['WQI'].to_numpy())
+    
+    old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+    imputer.statistics_ = state.medians()
+    scaler.partial_fit(impute(X_new_raw))
+    
+    # Re-parameterized models must answer the replay sample exactly as before
+    X_check = impute(replay_X).to_numpy()
+    X_check_old = ((X_check - old_mean) / old_scale).astype(np.float32)
+    X_check_new = ((X_check - scaler.mean_) / scaler.scale_).astype(np.float32)
+    step = reading_steps(feature_names)
+    for name, model in models.items():
+        expected = model_outputs(name, model, X_check_old) if len(X_check) else None
+        rescale_model_inputs(name, model, old_mean, old_scale, scaler.mean_, scaler.scale_, step)
+        if expected is None:
+            continue
+        actual = model_outputs(name, model, X_check_new)
+        if not np.allclose(actual, expected, rtol=1e-4, atol=1e-4):
+            changed = int((~np.isclose(actual, expected, rtol=1e-4, atol=1e-4))
+                          .reshape(len(X_check), -1).any(axis=1).sum())
+            raise RuntimeError(f"Rescaling {name} to the updated scaler changed its output on "
+                               f"{changed} of {len(X_check)} replay samples; nothing was saved")
+    
+    # New rows plus the replay sample drawn before they were added
+    X_fit = np.vstack([X_new_raw, replay_X])
+    X_fit = scaler.transform(impute(X_fit)).astype(np.float32)
+    y_class_fit = label_encoder.transform(np.concatenate([train['Water_Quality_Class'], replay_class]))
+    y_wqi_fit = np.concatenate([train['WQI'].to_numpy(), replay_wqi])
+    missing = set(range(len(label_encoder.classes_))) - set(y_class_fit)
+    if missing:
+        raise ValueError(f"No samples of {list(label_encoder.classes_[sorted(missing)])} to warm-start "
+                         "the classifiers with; a full retrain is needed")
+    
+    fit_s = {}
+    for name, model in models.items():
+        y = y_class_fit if JOBS[name][1] == 'classification' else y_wqi_fit
+        start = time.perf_counter()
+        warm_start_model(name, model, X_fit, y, n_threads=n_threads, max_trees=max_trees)
+        fit_s[name] = time.perf_counter() - start
+        REGISTRY.observe('incremental_fit_seconds', fit_s[name], model=name)
+    
+    after = score(test)
+    
+    save_artifacts(models_dir, models, imputer, scaler, label_encoder, feature_names,
+                   X_reference=X_fit)
+    state.save(state_path)
+    
+    compact_dir = os.path.join(models_dir, COMPACT_DIRNAME)
+    if os.path.isdir(compact_dir):
+        if test.empty:
+            # Nothing held out to score and calibrate them on; predict_compact
+            # then finds no variants instead of feeding them the new scaling
+            manifest_path = os.path.join(compact_dir, MANIFEST_FILENAME)
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
+            log_event(log, 'compact_invalidated', "⚠️  No held-out rows: compact variants removed",
+                      level=logging.WARNING)
+        else:
+            X_test, y_class_test, y_wqi_test = prepare(test)
+            manifest = compress_models(models, label_encoder, X_fit, X_test, y_class_test,
+                                       y_wqi_test, models_dir, scaler)
+            log_event(log, 'compact_rebuilt', f"🗜️  {len(manifest) - 1} compact variants rebuilt",
+                      variants=[v['name'] for v in manifest[1:]])
+    
+    return {name: {'fit_s': fit_s[name], 'before': before.get(name, {}),
+                   'after': after.get(name, {})} for name in models}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally retrain the saved models on new data")
+    parser.add_argument('new_csv')
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--archive', help="Original training CSV (first update of old models only)")
+    parser.add_argument('--holdout', type=float, default=0.2)
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--max-trees', type=int, default=MAX_TREES,
+                        help="Cap on Random Forest size; 0 for no cap (default: %(default)s)")
+    args = parser.parse_args()
+    
+    log = get_logger('incremental')
+    start = time.perf_counter()
+    results = retrain_incremental(args.new_csv, args.models_dir, args.archive, args.holdout,
+                                  args.threads, args.max_trees or None)
+    
+    log.info(f"{'Model':16s} {'Fit s':>8s}  Before → After (held-out new rows)")
+    for name, r in results.items():
+        metric = 'accuracy' if 'accuracy' in r['after'] else 'r2'
+        change = (f"{r['before'][metric]:.4f} → {r['after'][metric]:.4f} ({metric})"
+                  if r['after'] else 'n/a')
+        log_event(log, 'model_updated', f"{name:16s} {r['fit_s']:8.2f}  {change}",
+                  model=name, **r)
+    log_event(log, 'update_complete',
+              f"✅ Models in '{args.models_dir}/' updated in {time.perf_counter() - start:.1f}s",
+              models_dir=args.models_dir)
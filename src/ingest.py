@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Water Quality Data Ingestion
+Stream the monitoring CSV in chunks, filtering and cleaning each chunk
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# Samples with these remarks were never actually measured
+REMARKS_TO_REMOVE = ['dried up', 'lake emptied', 'under renovation', 'not collected',
+                     'No Access', 'lake covered', 'Lake covered']
+REMARKS_PATTERN = re.compile('|'.join(re.escape(r) for r in REMARKS_TO_REMOVE), re.IGNORECASE)
+
+KEY_PARAMETERS = [
+    'DO (mg/L)', 'pH', 'Conductivity (mS/cm)', 'BOD (mg/L)', 'COD (mg/L)',
+    'Nitrate', 'Nitrite-N (mg/L)', 'Fecal Coliform (MPN/100ml)',
+    'Total Coliform (MPN/100ml)', 'Turbidity (NTU)', 'Total Alk. (mg/L)',
+    'Chloride (mg/L)', 'TDS (mg/L)', 'TSS (mg/L)', 'Total Phosphate (mg/L)',
+    'Ammonia', 'Hardness (mg/L)', 'Fluoride (mg/L)'
+]
+
+METADATA_COLS = ['Station code', 'water_bodies', 'Station name']
+
+# Placeholder strings used by the monitoring labs for below-detection readings
+NON_NUMERIC_MARKERS = ['BDL', 'Less than 1.8', 'NIL', '']
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def clean_numeric_column(series):
+    series = series.replace(NON_NUMERIC_MARKERS, np.nan)
+    return pd.to_numeric(series, errors='coerce').astype('float64')
+
+
+def read_header(path):
+    """Column names of the CSV without reading any rows"""
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def iter_clean_chunks(path, chunksize=DEFAULT_CHUNKSIZE, key_parameters=KEY_PARAMETERS,
+                      stats=None):
+    """
+    Yield cleaned DataFrame chunks of the monitoring CSV
+    
+    Only the metadata, Remarks and key parameter columns are read, with their
+    dtypes declared upfront (parameters as text, since labs report 'BDL' and
+    similar markers). Each chunk has invalid samples removed in a single regex
+    pass, parameters converted to numbers, and rows with too many missing
+    values dropped, so memory stays bounded by chunksize.
+    
+    Parameters:
+    -----------
+    path : str
+        Monitoring CSV in the Water_Quality_Data_06_2025.csv layout
+    chunksize : int
+        Rows parsed per chunk
+    key_parameters : list of str
+        Parameter columns to keep
+    stats : dict, optional
+        Updated in place with rows_read, columns, rows_invalid (remarks),
+        rows_incomplete (missing values), rows_kept and the sets of
+        stations and water_bodies seen
+    
+    Yields:
+    -------
+    pd.DataFrame : metadata + numeric parameter columns, original row index
+    """
+    header = read_header(path)
+    params = [col for col in key_parameters if col in header]
+    metadata = [col for col in METADATA_COLS if col in header]
+    usecols = metadata + params + (['Remarks'] if 'Remarks' in header else [])
+    
+    dtype = {col: object for col in params}
+    dtype.update({col: str for col in ['Station name', 'water_bodies', 'Remarks'] if col in usecols})
+    if 'Station code' in usecols:
+        dtype['Station code'] = 'Int64'
+    
+    # Same rule as the original batch cleaning: metadata plus half the parameters
+    thresh = len(metadata) + len(key_parameters) * 0.5
+    
+    if stats is not None:
+        stats.update(rows_read=0, columns=len(header), rows_invalid=0, rows_incomplete=0,
+                     rows_kept=0,
+                     stations=set(), water_bodies=set())
+    
+    reader = pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize)
+    for chunk in reader:
+        n_read = len(chunk)
+        if stats is not None:
+            stats['rows_read'] += n_read
+            if 'Station code' in chunk:
+                stats['stations'].update(chunk['Station code'].dropna().unique())
+            if 'water_bodies' in chunk:
+                stats['water_bodies'].update(chunk['water_bodies'].dropna().unique())
+        
+        if 'Remarks' in chunk:
+            invalid = chunk['Remarks'].str.contains(REMARKS_PATTERN, na=False).to_numpy(dtype=bool)
+            chunk = chunk.loc[~invalid, metadata + params]
+        n_valid = len(chunk)
+        
+        chunk = chunk.assign(**{col: clean_numeric_column(chunk[col]) for col in params})
+        chunk = chunk.dropna(thresh=thresh)
+        
+        if stats is not None:
+            stats['rows_invalid'] += n_read - n_valid
+            stats['rows_incomplete'] += n_valid - len(chunk)
+            stats['rows_kept'] += len(chunk)
+        
+        yield chunk
+
+
+def load_clean_data(path, chunksize=DEFAULT_CHUNKSIZE, key_parameters=KEY_PARAMETERS,
+                    stats=None):
+    """Concatenate every cleaned chunk into one DataFrame"""
+    chunks = list(iter_clean_chunks(path, chunksize, key_parameters, stats))
+    if not chunks:
+        raise ValueError(f"No valid samples found in {path}")
+    return pd.concat(chunks)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Pipeline and Predictor Instrumentation
+Timers, counters and gauges, process memory readings and a structured step log
+
+Every metric is a (name, labels) series kept in a process-wide registry. A
+timer observation is two perf_counter calls and one locked dict update, so
+the hooks stay on in production. The registry can be read as a dict
+(``snapshot``) or rendered in the Prometheus text exposition format
+(``to_prometheus``).
+
+Log records go to the 'water_quality' logger. They are printed as the usual
+emoji lines, or as one JSON object per line when WQ_LOG_FORMAT=json.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+LOGGER_NAME = 'water_quality'
+METRIC_PREFIX = 'wq'
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and timers"""
+    
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._counters = {}
+        self._gauges = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+    
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter"""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def set(self, name, value, **labels):
+        """Set a gauge"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+    
+    def observe(self, name, seconds, **labels):
+        """Record one duration"""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            count, total, longest = self._timers.get(key, (0, 0.0, 0.0))
+            self._timers[key] = (count + 1, total + seconds, max(longest, seconds))
+    
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time the enclosed block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+    
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timers.clear()
+    
+    def snapshot(self):
+        """
+        Current values as plain data
+        
+        Returns:
+        --------
+        dict : {'counters': [...], 'gauges': [...], 'timers': [...]}, each a
+            list of {'name', 'labels', ...} records
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timers = dict(self._timers)
+        
+        return {
+            'counters': [{'name': n, 'labels': dict(l), 'value': v}
+                         for (n, l), v in sorted(counters.items())],
+            'gauges': [{'name': n, 'labels': dict(l), 'value': v}
+                       for (n, l), v in sorted(gauges.items())],
+            'timers': [{'name': n, 'labels': dict(l), 'count': c, 'total_s': t, 'max_s': m}
+                       for (n, l), (c, t, m) in sorted(timers.items())]
+        }
+    
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        """Render the registry in the Prometheus text exposition format"""
+        def series(name, labels, suffix=''):
+            label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            return f"{prefix}_{name}{suffix}" + (f"{{{label_str}}}" if label_str else '')
+        
+        snap = self.snapshot()
+        lines, typed = [], set()
+        
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {prefix}_{name} {kind}")
+        
+        for rec in snap['counters']:
+            declare(rec['name'], 'counter')
+            lines.append(f"{series(rec['name'], rec['labels'])} {rec['value']}")
+        for rec in snap['gauges']:
+            declare(rec['name'], 'gauge')
+            lines.append(f"{series(rec['name'], rec['labels'])} {rec['value']}")
+        for rec in snap['timers']:
+            declare(rec['name'], 'summary')
+            lines.append(f"{series(rec['name'], rec['labels'], '_count')} {rec['count']}")
+            lines.append(f"{series(rec['name'], rec['labels'], '_sum')} {rec['total_s']:.9f}")
+        for rec in snap['timers']:
+            declare(f"{rec['name']}_max", 'gauge')
+            lines.append(f"{series(rec['name'], rec['labels'], '_max')} {rec['max_s']:.9f}")
+        
+        return '\n'.join(lines) + '\n'
+    
+    def write_prometheus(self, path, prefix=METRIC_PREFIX):
+        """Write the text dump atomically (e.g. for node_exporter's textfile collector)"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(tmp_path, path)
+        return path
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Process-wide registry used by the predictor and run_analysis.py
+REGISTRY = Metrics()
+
+
+# ============================================================================
+# Structured logging
+# ============================================================================
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, event, message and fields"""
+    
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 6),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'event': getattr(record, 'event', None),
+            'msg': record.getMessage().strip()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def get_logger(name=None):
+    """
+    Logger under 'water_quality', writing to stdout on first use
+    
+    WQ_LOG_FORMAT=json switches to JSON lines; WQ_LOG_LEVEL sets the level.
+    """
+    root = logging.getLogger(LOGGER_NAME)
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        if os.environ.get('WQ_LOG_FORMAT', 'text').lower() == 'json':
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter('%(message)s'))
+        root.addHandler(handler)
+        root.setLevel(os.environ.get('WQ_LOG_LEVEL', 'INFO').upper())
+        root.propagate = False
+    return root.getChild(name) if name else root
+
+
+def log_event(logger, event, message='', level=logging.INFO, **fields):
+    """Log message with a machine-readable event name and fields"""
+    logger.log(level, message, extra={'event': event, 'fields': fields})
+
+
+# ============================================================================
+# Process memory
+# ============================================================================
+
+def _proc_status_mb(field):
+    """A kB field of /proc/self/status in MB, or None off Linux"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb():
+    """Current resident set size of this process in MB"""
+    current = _proc_status_mb('VmRSS')
+    return peak_rss_mb() if current is None else current
+
+
+def peak_rss_mb():
+    """Peak resident set size since start-up or the last reset_peak_rss() in MB"""
+    peak = _proc_status_mb('VmHWM')
+    if peak is None:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return peak
+
+
+def reset_peak_rss():
+    """
+    Restart the peak RSS counter at the current RSS (Linux only)
+    
+    Returns:
+    --------
+    bool : False when the kernel offers no reset, in which case peak_rss_mb()
+        keeps reporting the peak since start-up
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class PipelineSteps:
+    """
+    Sequential step timer for linear scripts
+    
+    start() closes the running step, logs its duration and records it as
+    the pipeline_step_seconds timer, then logs the new step's banner.
+    
+    Each step's memory is recorded as well: RSS at its end, the peak RSS
+    reached during it and that peak above the RSS it started with (the
+    pipeline_step_peak_rss_megabytes and pipeline_step_peak_growth_megabytes
+    gauges).
+    """
+    
+    def __init__(self, metrics=REGISTRY, logger=None):
+        self.metrics = metrics
+        self.logger = logger or get_logger('pipeline')
+        self.durations = {}
+        self.memory = {}
+        self._current = None
+        self._started = None
+        self._start_rss = None
+    
+    def start(self, step, message=None, **fields):
+        self.finish()
+        reset_peak_rss()
+        self._current, self._started = step, time.perf_counter()
+        self._start_rss = rss_mb()
+        if message is not None:
+            log_event(self.logger, 'step_start', message, step=step, **fields)
+    
+    def finish(self, **fields):
+        if self._current is None:
+            return
+        elapsed = time.perf_counter() - self._started
+        memory = {'rss_mb': rss_mb(), 'peak_rss_mb': peak_rss_mb()}
+        memory['peak_growth_mb'] = max(0.0, memory['peak_rss_mb'] - self._start_rss)
+        self.durations[self._current] = elapsed
+        self.memory[self._current] = memory
+        self.metrics.observe('pipeline_step_seconds', elapsed, step=self._current)
+        self.metrics.set('pipeline_step_peak_rss_megabytes', memory['peak_rss_mb'], step=self._current)
+        self.metrics.set('pipeline_step_peak_growth_megabytes', memory['peak_growth_mb'],
+                         step=self._current)
+        log_event(self.logger, 'step_end',
+                  f"   ⏱️  {self._current}: {elapsed:.2f}s, peak {memory['peak_rss_mb']:.1f} MB "
+                  f"(+{memory['peak_growth_mb']:.1f} MB)",
+                  level=logging.DEBUG, step=self._current, duration_s=round(elapsed, 6),
+                  **{k: round(v, 1) for k, v in memory.items()}, **fields)
+        self._current = None
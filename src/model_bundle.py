@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Water Quality Model Bundle
+Versioned single-file container for the predictor's artifacts
+
+Layout::
+    
+    b'WQBUNDLE' | uint32 format version | uint64 manifest length | manifest JSON
+    | segments, each starting on a 64-byte boundary
+
+The manifest carries the feature order, class labels and, for every segment,
+its offset, size and SHA-256. Preprocessor parameters are stored as raw
+little-endian arrays and opened with ``np.memmap``, so worker processes that
+load the same bundle share those pages. XGBoost models are stored in XGBoost's
+native UBJSON format, Keras models as their ``.keras`` archive, and only the
+Random Forests still use pickle (verified against the manifest checksum
+before being unpickled).
+
+The NumPy-runtime exports (see numpy_runtime.py) are stored as array segments
+too. A predictor with runtime='numpy' memory-maps them instead of building a
+private copy, so any number of worker processes share one copy of every model.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import struct
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+MAGIC = b'WQBUNDLE'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+HEADER = struct.Struct('<8sIQ')
+
+BUNDLE_FILENAME = 'model_bundle.wqb'
+
+MODEL_FORMATS = {'rf': 'pickle', 'xgb': 'xgboost-ubj', 'nn': 'keras'}
+
+
+class BundleError(ValueError):
+    """Raised for malformed, unsupported or corrupted bundles"""
+
+
+# ============================================================================
+# Array-backed preprocessors (same interface the predictor uses)
+# ============================================================================
+
+class ArrayImputer:
+    """Median imputation from a stored statistics vector"""
+    
+    def __init__(self, statistics):
+        self.statistics_ = statistics
+    
+    def transform(self, X):
+        X = np.array(X, dtype=float)
+        missing = np.isnan(X)
+        X[missing] = np.broadcast_to(self.statistics_, X.shape)[missing]
+        return X
+
+
+class ArrayScaler:
+    """Standard scaling from stored mean and scale vectors"""
+    
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+    
+    def transform(self, X):
+        return (np.asarray(X, dtype=float) - self.mean_) / self.scale_
+
+
+class ArrayLabelEncoder:
+    """Label encoding from a stored list of class names"""
+    
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes, dtype=object)
+    
+    def transform(self, labels):
+        lookup = {label: i for i, label in enumerate(self.classes_)}
+        return np.array([lookup[label] for label in labels], dtype=int)
+    
+    def inverse_transform(self, encoded):
+        return self.classes_[np.asarray(encoded, dtype=int)]
+
+
+# ============================================================================
+# Writing
+# ============================================================================
+
+def _serialize_model(name, model):
+    if isinstance(model, (bytes, bytearray)):
+        # Already serialized in the native format, e.g. a .keras archive read from disk
+        return bytes(model)
+    family = name.split('_')[0]
+    if family == 'xgb':
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f'{name}.ubj')
+            model.save_model(path)
+            with open(path, 'rb') as f:
+                return f.read()
+    if family == 'nn':
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f'{name}.keras')
+            model.save(path)
+            with open(path, 'rb') as f:
+                return f.read()
+    return pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def write_bundle(path, feature_names, imputer, scaler, label_encoder, models,
+                 runtime_models=None):
+    """
+    Write every artifact the predictor needs into one bundle file
+    
+    Parameters:
+    -----------
+    path : str
+        Output file (written atomically)
+    feature_names : list of str
+        Training feature order
+    imputer, scaler, label_encoder : fitted sklearn objects
+        SimpleImputer(strategy='median'), StandardScaler and LabelEncoder
+    models : dict
+        '<family>_<task>' -> fitted model (or its native serialized bytes),
+        e.g. {'rf_classifier': ...}
+    runtime_models : dict, optional
+        '<family>_<task>' -> arrays from numpy_runtime.export_model, stored
+        as 'runtime.<name>.<array>' segments
+    """
+    segments = {
+        'imputer.statistics': np.asarray(imputer.statistics_, dtype='<f8'),
+        'scaler.mean': np.asarray(scaler.mean_, dtype='<f8'),
+        'scaler.scale': np.asarray(scaler.scale_, dtype='<f8'),
+    }
+    for name, model in models.items():
+        segments[f'model.{name}'] = _serialize_model(name, model)
+    runtime_models = runtime_models or {}
+    for name, arrays in runtime_models.items():
+        for key, arr in arrays.items():
+            arr = np.asarray(arr)
+            # np.array rather than np.ascontiguousarray, which turns scalars into 1-d arrays
+            segments[f'runtime.{name}.{key}'] = np.array(
+                arr, dtype=arr.dtype.newbyteorder('<'), order='C')
+    
+    entries, blobs, offset = {}, [], 0
+    for seg_name, seg in segments.items():
+        data = seg.tobytes() if isinstance(seg, np.ndarray) else bytes(seg)
+        entry = {
+            'offset': offset,
+            'nbytes': len(data),
+            'sha256': hashlib.sha256(data).hexdigest()
+        }
+        if isinstance(seg, np.ndarray):
+            entry.update(kind='array', dtype=seg.dtype.str, shape=list(seg.shape))
+        else:
+            entry.update(kind='bytes', format=MODEL_FORMATS[seg_name.split('.')[1].split('_')[0]])
+        entries[seg_name] = entry
+        
+        padding = -len(data) % ALIGNMENT
+        blobs.append(data + b'\0' * padding)
+        offset += len(data) + padding
+    
+    manifest = json.dumps({
+        'format_version': FORMAT_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'feature_names': list(feature_names),
+        'classes': [str(c) for c in label_encoder.classes_],
+        'models': sorted(models),
+        'runtime_models': sorted(runtime_models),
+        'segments': entries
+    }).encode('utf-8')
+    
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(manifest)) + manifest
+    header += b'\0' * (-len(header) % ALIGNMENT)
+    
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return path
+
+
+# ============================================================================
+# Reading
+# ============================================================================
+
+class ModelBundle:
+    """Read-only view of a bundle file; models are deserialized on request"""
+    
+    def __init__(self, path, verify=True):
+        self.path = path
+        self.verify = verify
+        
+        with open(path, 'rb') as f:
+            raw = f.read(HEADER.size)
+            if len(raw) < HEADER.size:
+                raise BundleError(f"{path} is too short to be a model bundle")
+            magic, version, manifest_len = HEADER.unpack(raw)
+            if magic != MAGIC:
+                raise BundleError(f"{path} is not a model bundle")
+            if version != FORMAT_VERSION:
+                raise BundleError(f"Unsupported bundle version {version} (expected {FORMAT_VERSION})")
+            self.manifest = json.loads(f.read(manifest_len).decode('utf-8'))
+        
+        header_len = HEADER.size + manifest_len
+        self._data_start = header_len + (-header_len % ALIGNMENT)
+        self.feature_names = self.manifest['feature_names']
+        self.models = self.manifest['models']
+        self.runtime_models = self.manifest.get('runtime_models', [])
+        
+        self.imputer = ArrayImputer(self.array('imputer.statistics'))
+        self.scaler = ArrayScaler(self.array('scaler.mean'), self.array('scaler.scale'))
+        self.label_encoder = ArrayLabelEncoder(self.manifest['classes'])
+    
+    @property
+    def checksum(self):
+        """Digest of the manifest, which changes whenever any segment does"""
+        return hashlib.sha256(json.dumps(self.manifest, sort_keys=True).encode()).hexdigest()
+    
+    def _entry(self, name):
+        try:
+            return self.manifest['segments'][name]
+        except KeyError:
+            raise BundleError(f"Segment '{name}' not found in {self.path}") from None
+    
+    def _check(self, name, data):
+        if self.verify and hashlib.sha256(data).hexdigest() != self._entry(name)['sha256']:
+            raise BundleError(f"Checksum mismatch for segment '{name}' in {self.path}")
+    
+    def array(self, name):
+        """Memory-mapped, read-only view of an array segment"""
+        entry = self._entry(name)
+        if entry['nbytes'] == 0:
+            # mmap cannot map zero bytes
+            return np.empty(tuple(entry['shape']), dtype=np.dtype(entry['dtype']))
+        arr = np.memmap(self.path, mode='r', dtype=np.dtype(entry['dtype']),
+                        offset=self._data_start + entry['offset'], shape=tuple(entry['shape']))
+        self._check(name, memoryview(arr).cast('B'))
+        return arr
+    
+    def runtime_arrays(self, name):
+        """Memory-mapped arrays of a NumPy-runtime export, keyed like the .npz"""
+        if name not in self.runtime_models:
+            raise BundleError(f"No NumPy-runtime export of '{name}' in {self.path}")
+        prefix = f'runtime.{name}.'
+        return {seg[len(prefix):]: self.array(seg)
+                for seg in self.manifest['segments'] if seg.startswith(prefix)}
+    
+    def raw(self, name):
+        """Bytes of a segment"""
+        entry = self._entry(name)
+        with open(self.path, 'rb') as f:
+            f.seek(self._data_start + entry['offset'])
+            data = f.read(entry['nbytes'])
+        self._check(name, data)
+        return data
+    
+    def load_model(self, name):
+        """Deserialize '<family>_<task>' from its native format"""
+        seg_name = f'model.{name}'
+        fmt = self._entry(seg_name)['format']
+        data = self.raw(seg_name)
+        
+        if fmt == 'xgboost-ubj':
+            import xgboost as xgb
+            model = xgb.XGBClassifier() if name.endswith('classifier') else xgb.XGBRegressor()
+            model.load_model(bytearray(data))
+            return model
+        if fmt == 'keras':
+            from tensorflow import keras
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, f'{name}.keras')
+                with open(path, 'wb') as f:
+                    f.write(data)
+                return keras.models.load_model(path)
+        return pickle.loads(data)
+
+
+def read_bundle(path, verify=True):
+    return ModelBundle(path, verify=verify)
+
+
+def bundle_models_dir(models_dir):
+    """Build models_dir/model_bundle.wqb from the individual artifact files"""
+    def load_pickle(name):
+        with open(os.path.join(models_dir, f'{name}.pkl'), 'rb') as f:
+            return pickle.load(f)
+    
+    models, runtime_models = {}, {}
+    for family in MODEL_FORMATS:
+        for task in ('classifier', 'regressor'):
+            name = f'{family}_{task}'
+            export_path = os.path.join(models_dir, f'{name}.npz')
+            if os.path.exists(export_path):
+                with np.load(export_path, allow_pickle=False) as data:
+                    runtime_models[name] = {key: data[key] for key in data.files}
+            if family == 'nn':
+                path = os.path.join(models_dir, f'{name}.keras')
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        models[name] = f.read()
+            elif os.path.exists(os.path.join(models_dir, f'{name}.pkl')):
+                models[name] = load_pickle(name)
+    
+    return write_bundle(
+        os.path.join(models_dir, BUNDLE_FILENAME),
+        feature_names=load_pickle('feature_names'),
+        imputer=load_pickle('imputer'),
+        scaler=load_pickle('scaler'),
+        label_encoder=load_pickle('label_encoder'),
+        models=models,
+        runtime_models=runtime_models
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Pack a models/ directory into a single bundle file")
+    parser.add_argument('models_dir', nargs='?', default='models')
+    args = parser.parse_args()
+    
+    path = bundle_models_dir(args.models_dir)
+    print(f"✅ Wrote {path} ({os.path.getsize(path) / 1024:.0f} KB)")
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+NumPy Inference Runtime
+Run the Keras MLPs and the RF/XGBoost forests without TensorFlow or xgboost
+
+Export (needs the training libraries)::
+    
+    export_models({'nn_classifier': model, ...}, 'models')  # -> models/<name>.npz
+
+Inference (NumPy only)::
+    
+    model = load_model('models/nn_classifier.npz')
+    model.predict(X)
+
+MLPs are stored as a chain of dense layers with every BatchNormalization
+folded into the dense layer that follows it. Forests are stored as one flat
+array-of-nodes (feature, threshold, children, leaf value) per ensemble and
+evaluated for all trees at once, level by level.
+"""
+
+import json
+
+import numpy as np
+
+ACTIVATIONS = {
+    'linear': lambda z: z,
+    'relu': lambda z: np.maximum(z, 0, out=z),
+    'softmax': None,  # handled in NumpyMLP.predict (needs the row max)
+}
+
+# Rows evaluated per pass through a forest; bounds the (rows x trees) node matrix
+FOREST_CHUNK_ROWS = 4096
+
+# A single row is walked through the trees in plain Python when at most this
+# many node visits (trees x depth) are needed: below that, the fixed cost of
+# the vectorized level-by-level pass dominates
+SCALAR_MAX_VISITS = 1024
+
+
+# ============================================================================
+# Dense networks
+# ============================================================================
+
+def export_keras_mlp(model):
+    """
+    Flatten a Sequential Dense/BatchNormalization/Dropout stack
+    
+    A BatchNormalization computing gamma * (h - mean) / sqrt(var + eps) + beta
+    is the affine map a * h + c, which is absorbed by the next Dense layer:
+    W' = a[:, None] * W and b' = b + c @ W. Dropout is the identity at
+    inference time.
+    
+    Returns:
+    --------
+    dict : 'kind', 'activations' and W0, b0, W1, b1, ... arrays
+    """
+    layers, pending = [], None  # pending = (a, c) from a BatchNormalization
+    
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        if kind in ('Dropout', 'InputLayer'):
+            continue
+        
+        if kind == 'BatchNormalization':
+            weights = layer.get_weights()
+            gamma = weights.pop(0) if layer.scale else 1.0
+            beta = weights.pop(0) if layer.center else 0.0
+            mean, var = weights
+            a = gamma / np.sqrt(var + layer.epsilon)
+            c = beta - a * mean
+            if pending is not None:
+                # Two consecutive BNs compose into one affine map
+                a, c = pending[0] * a, pending[1] * a + c
+            pending = (np.asarray(a, dtype=np.float64), np.asarray(c, dtype=np.float64))
+            continue
+        
+        if kind != 'Dense':
+            raise ValueError(f"Cannot export layer type {kind}")
+        
+        kernel, bias = (w.astype(np.float64) for w in layer.get_weights())
+        if pending is not None:
+            a, c = pending
+            bias = bias + c @ kernel
+            kernel = a[:, None] * kernel
+            pending = None
+        layers.append((kernel, bias, layer.activation.__name__))
+    
+    if pending is not None:
+        raise ValueError("A BatchNormalization after the last Dense layer cannot be folded")
+    
+    arrays = {'kind': np.array('mlp'),
+              'activations': np.array(json.dumps([act for _, _, act in layers]))}
+    for i, (kernel, bias, _) in enumerate(layers):
+        arrays[f'W{i}'] = kernel.astype(np.float32)
+        arrays[f'b{i}'] = bias.astype(np.float32)
+    return arrays
+
+
+class NumpyMLP:
+    """Dense network evaluated with NumPy matrix products"""
+    
+    def __init__(self, arrays):
+        self.activations = json.loads(str(arrays['activations']))
+        for act in self.activations:
+            if act not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation '{act}'")
+        self.weights = [(np.ascontiguousarray(arrays[f'W{i}']), np.ascontiguousarray(arrays[f'b{i}']))
+                        for i in range(len(self.activations))]
+    
+    def predict(self, X, verbose=0):
+        """Same output shape as keras Model.predict: (n, units of last layer)"""
+        h = np.asarray(X, dtype=np.float32)
+        for (W, b), act in zip(self.weights, self.activations):
+            h = h @ W
+            h += b
+            if act == 'softmax':
+                h -= h.max(axis=1, keepdims=True)
+                np.exp(h, out=h)
+                h /= h.sum(axis=1, keepdims=True)
+            else:
+                h = ACTIVATIONS[act](h)
+        return h
+
+
+# ============================================================================
+# Tree ensembles
+# ============================================================================
+
+def _concat_trees(trees):
+    """
+    Merge per-tree node arrays into one flat array-of-nodes
+    
+    Each tree is (feature, threshold, left, right, default_left, value) with
+    child indices local to the tree and -1 marking leaves.
+    """
+    offsets = np.cumsum([0] + [len(t[0]) for t in trees[:-1]])
+    roots = offsets.astype(np.int32)
+    
+    feature, threshold, left, right, default_left, value = (
+        np.concatenate(parts) for parts in zip(*trees))
+    is_leaf = left < 0
+    node_offsets = np.repeat(offsets, [len(t[0]) for t in trees])
+    # Leaves point at themselves so finished rows stay put during traversal
+    self_index = np.arange(len(left))
+    left = np.where(is_leaf, self_index, left + node_offsets).astype(np.int32)
+    right = np.where(is_leaf, self_index, right + node_offsets).astype(np.int32)
+    feature = np.where(is_leaf, 0, feature).astype(np.int32)
+    
+    return {
+        'roots': roots, 'feature': feature, 'threshold': threshold,
+        'left': left, 'right': right, 'default_left': default_left.astype(bool),
+        'value': value
+    }
+
+
+def export_sklearn_forest(model, estimators=None):
+    """
+    Flatten a fitted RandomForestClassifier/RandomForestRegressor
+    
+    estimators selects a subset of the forest's trees (see compression.py);
+    a single fitted decision tree is exported as a forest of one.
+    """
+    is_classifier = hasattr(model, 'classes_')
+    if estimators is None:
+        estimators = getattr(model, 'estimators_', [model])
+    trees = []
+    for est in estimators:
+        t = est.tree_
+        value = t.value[:, 0, :].astype(np.float64)
+        if is_classifier:
+            # predict_proba averages per-tree class fractions
+            value = value / value.sum(axis=1, keepdims=True)
+        trees.append((t.feature, t.threshold.astype(np.float64), t.children_left,
+                      t.children_right, np.zeros(t.node_count, dtype=bool), value))
+    
+    arrays = _concat_trees(trees)
+    arrays.update(
+        kind=np.array('sklearn_forest'),
+        # sklearn compares float32 features with <= against float64 thresholds
+        strict=np.array(False),
+        max_depth=np.array(max(est.tree_.max_depth for est in estimators)),
+        tree_group=np.zeros(len(trees), dtype=np.int32),
+        n_outputs=np.array(arrays['value'].shape[1]),
+        base_score=np.zeros(arrays['value'].shape[1]),
+        objective=np.array('classifier' if is_classifier else 'regressor'),
+        classes=np.asarray(model.classes_) if is_classifier else np.array([])
+    )
+    return arrays
+
+
+def export_xgboost(model):
+    """
+    Flatten a fitted XGBClassifier/XGBRegressor, or a Booster (e.g. the first
+    rounds of one: booster[:k]), from its JSON model dump
+    """
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    learner = json.loads(booster.save_raw(raw_format='json'))['learner']
+    objective = learner['objective']['name']
+    if objective not in ('multi:softprob', 'multi:softmax', 'reg:squarederror'):
+        raise ValueError(f"Unsupported XGBoost objective '{objective}'")
+    
+    booster = learner['gradient_booster']
+    if booster['name'] != 'gbtree':
+        raise ValueError(f"Unsupported XGBoost booster '{booster['name']}'")
+    gbtree = booster['model']
+    
+    trees, max_depth = [], 0
+    for tree in gbtree['trees']:
+        left = np.asarray(tree['left_children'], dtype=np.int64)
+        n_nodes = len(left)
+        # Leaf values are stored in split_conditions for leaf nodes
+        cond = np.asarray(tree['split_conditions'], dtype=np.float32)
+        is_leaf = left < 0
+        trees.append((np.asarray(tree['split_indices'], dtype=np.int64),
+                      cond.astype(np.float64),
+                      left,
+                      np.asarray(tree['right_children'], dtype=np.int64),
+                      np.asarray(tree['default_left'], dtype=bool),
+                      np.where(is_leaf, cond, 0).astype(np.float64).reshape(n_nodes, 1)))
+        
+        parents = np.asarray(tree['parents'], dtype=np.int64)
+        depth = np.zeros(n_nodes, dtype=np.int64)
+        for node in range(1, n_nodes):
+            depth[node] = depth[parents[node]] + 1
+        max_depth = max(max_depth, int(depth.max()))
+    
+    param = learner['learner_model_param']
+    n_outputs = max(int(param['num_class']), 1)
+    base_score = np.array([float(v) for v in param['base_score'].strip('[]').split(',')])
+    base_score = np.broadcast_to(base_score, (n_outputs,)).astype(np.float64)
+    
+    arrays = _concat_trees(trees)
+    arrays.update(
+        kind=np.array('xgboost'),
+        # XGBoost sends x < split_condition left
+        strict=np.array(True),
+        max_depth=np.array(max_depth),
+        tree_group=np.asarray(gbtree['tree_info'], dtype=np.int32),
+        n_outputs=np.array(n_outputs),
+        base_score=base_score,
+        objective=np.array(objective),
+        classes=np.arange(n_outputs) if objective.startswith('multi') else np.array([])
+    )
+    return arrays
+
+
+class FlatForest:
+    """Array-of-nodes evaluator shared by the sklearn and XGBoost exports"""
+    
+    def __init__(self, arrays):
+        self.kind = str(arrays['kind'])
+        self.objective = str(arrays['objective'])
+        self.roots = arrays['roots']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.default_left = arrays['default_left']
+        self.value = arrays['value']
+        self.strict = bool(arrays['strict'])
+        self.max_depth = int(arrays['max_depth'])
+        self.tree_group = arrays['tree_group']
+        self.n_outputs = int(arrays['n_outputs'])
+        self.base_score = arrays['base_score']
+        self.classes_ = arrays['classes']
+        self._scalar = len(self.roots) * self.max_depth <= SCALAR_MAX_VISITS
+        self._nodes = None
+    
+    def _row_leaves(self, x):
+        """Leaf index per tree for one row, walking the nodes in Python"""
+        if self._nodes is None:
+            # Lists only for small forests, so large memory-mapped ones stay shared
+            self._nodes = (self.roots.tolist(), self.feature.tolist(), self.threshold.tolist(),
+                           self.left.tolist(), self.right.tolist(), self.default_left.tolist())
+        roots, feature, threshold, left, right, default_left = self._nodes
+        x = x.tolist()
+        
+        leaves = []
+        for node in roots:
+            while left[node] != node:
+                value = x[feature[node]]
+                if value != value:
+                    go_left = default_left[node]
+                elif self.strict:
+                    go_left = value < threshold[node]
+                else:
+                    go_left = value <= threshold[node]
+                node = left[node] if go_left else right[node]
+            leaves.append(node)
+        return leaves
+    
+    def leaves(self, X):
+        """Leaf node index reached by every row in every tree: (n, n_trees)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        if n_rows == 1 and self._scalar:
+            return np.array([self._row_leaves(X[0])], dtype=np.int64)
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.int64) * n_features)[:, None]
+        node = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        has_missing = np.isnan(flat_X).any()
+        
+        # np.take on flat arrays is much cheaper than 2-D fancy indexing
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offsets + self.feature.take(node))
+            thr = self.threshold.take(node)
+            go_left = (x < thr) if self.strict else (x <= thr)
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.default_left.take(node), go_left)
+            node = np.where(go_left, self.left.take(node), self.right.take(node))
+        return node
+    
+    def raw_predict(self, X):
+        """
+        Averaged leaf values (sklearn) or summed margins (XGBoost): (n, n_outputs)
+        """
+        X = np.asarray(X, dtype=np.float32)
+        out = np.empty((len(X), self.n_outputs), dtype=np.float64)
+        
+        for start in range(0, len(X), FOREST_CHUNK_ROWS):
+            leaves = self.leaves(X[start:start + FOREST_CHUNK_ROWS])
+            if self.kind == 'sklearn_forest':
+                out[start:start + len(leaves)] = self.value[leaves].mean(axis=1)
+            else:
+                leaf_values = self.value[leaves, 0]
+                margins = np.tile(self.base_score, (len(leaves), 1))
+                for group in range(self.n_outputs):
+                    margins[:, group] += leaf_values[:, self.tree_group == group].sum(axis=1)
+                out[start:start + len(leaves)] = margins
+        return out
+    
+    def predict_proba(self, X):
+        raw = self.raw_predict(X)
+        if self.kind == 'sklearn_forest':
+            return raw
+        raw -= raw.max(axis=1, keepdims=True)
+        np.exp(raw, out=raw)
+        return raw / raw.sum(axis=1, keepdims=True)
+    
+    def predict(self, X):
+        """Encoded classes for classifiers, values for regressors (sklearn API)"""
+        if self.objective in ('regressor', 'reg:squarederror'):
+            return self.raw_predict(X)[:, 0]
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+# ============================================================================
+# Export / load entry points
+# ============================================================================
+
+def export_model(name, model):
+    """Arrays for '<family>_<task>' ready for np.savez"""
+    family = name.split('_')[0]
+    if family == 'nn':
+        return export_keras_mlp(model)
+    if family == 'xgb':
+        return export_xgboost(model)
+    return export_sklearn_forest(model)
+
+
+def export_models(models, out_dir):
+    """Write every model in models ({name: fitted model}) to out_dir/<name>.npz"""
+    paths = {}
+    for name, model in models.items():
+        paths[name] = f'{out_dir}/{name}.npz'
+        np.savez(paths[name], **export_model(name, model))
+    return paths
+
+
+def from_arrays(arrays):
+    """
+    NumpyMLP or FlatForest over exported arrays
+    
+    The arrays are used as they are, so read-only memory-mapped arrays (see
+    ModelBundle.runtime_arrays) stay shared between processes.
+    """
+    if str(arrays['kind']) == 'mlp':
+        return NumpyMLP(arrays)
+    return FlatForest(arrays)
+
+
+def load_model(path):
+    """Load an exported model; returns a NumpyMLP or FlatForest"""
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+    return from_arrays(arrays)
+
+
+if __name__ == "__main__":
+    import argparse
+    import pickle
+    
+    parser = argparse.ArgumentParser(description="Export saved models to the NumPy runtime format")
+    parser.add_argument('models_dir', nargs='?', default='models')
+    args = parser.parse_args()
+    
+    models = {}
+    for family in ('rf', 'xgb', 'nn'):
+        for task in ('classifier', 'regressor'):
+            name = f'{family}_{task}'
+            if family == 'nn':
+                from tensorflow import keras
+                models[name] = keras.models.load_model(f'{args.models_dir}/{name}.keras')
+            else:
+                with open(f'{args.models_dir}/{name}.pkl', 'rb') as f:
+                    models[name] = pickle.load(f)
+    
+    for name, path in export_models(models, args.models_dir).items():
+        print(f"✅ {name} -> {path}")
@@ -4,19 +4,172 @@ Water Quality Prediction Script
 Use trained models to predict water quality for new samples
 """
 
+import hashlib
+import os
 import pickle
 import numpy as np
 import pandas as pd
-from tensorflow import keras
+
+import numpy_runtime
+from compression import load_manifest, load_variant, select_variant
+from explain import TREE_FAMILIES, ExplanationCache, TreeShapExplainer, load_global_importances
+from instrumentation import REGISTRY, get_logger, log_event
+from model_bundle import BUNDLE_FILENAME, read_bundle
+from prediction_cache import PredictionCache
+from wqi import classify_wqi_array
+
+MODEL_NAMES = {
+    'rf': 'Random Forest',
+    'xgb': 'XGBoost',
+    'nn': 'Neural Network'
+}
+
+
+def _model_property(model, task):
+    """Attribute that loads '<model>_<task>' on first access"""
+    return property(lambda self: self._get_model(model, task))
+
 
 class WaterQualityPredictor:
     """Predict water quality using trained models"""
     
-    def __init__(self, models_dir='models'):
-        """Load trained models and preprocessors"""
+    rf_classifier = _model_property('rf', 'classifier')
+    xgb_classifier = _model_property('xgb', 'classifier')
+    nn_classifier = _model_property('nn', 'classifier')
+    rf_regressor = _model_property('rf', 'regressor')
+    xgb_regressor = _model_property('xgb', 'regressor')
+    nn_regressor = _model_property('nn', 'regressor')
+    
+    def __init__(self, models_dir='models', models=('rf', 'xgb', 'nn'), lazy=True,
+                 use_bundle=True, runtime='native', cache_size=0, cache_decimals=None,
+                 metrics=None, explain_cache_size=10_000, explain_jobs=None, budget_us=None,
+                 min_confidence=None):
+        """
+        Load preprocessors and, unless lazy, the selected models
+        
+        Parameters:
+        -----------
+        models_dir : str
+            Directory holding the saved artifacts
+        models : tuple of str
+            Model families this predictor may use: any of 'rf', 'xgb', 'nn'.
+            TensorFlow is only imported when 'nn' is actually loaded.
+        lazy : bool
+            Defer loading each model until its first prediction
+        use_bundle : bool
+            Read artifacts from models_dir/model_bundle.wqb when it exists
+            instead of the individual pickle/.keras files
+        runtime : str
+            'native' runs the sklearn/XGBoost/Keras models; 'numpy' runs the
+            exported <name>.npz models with NumPy only (no TensorFlow,
+            scikit-learn or xgboost needed for inference). With a bundle,
+            'numpy' memory-maps the model arrays from it, so worker
+            processes share one read-only copy instead of loading their own.
+        cache_size : int
+            Keep up to this many per-sample, per-model results in an LRU
+            cache keyed on the inputs rounded to instrument precision
+            (0 disables caching). Inputs are rounded before inference
+            either way once the cache is on, so hits and misses agree.
+        cache_decimals : dict, optional
+            Per-feature overrides of prediction_cache.INSTRUMENT_DECIMALS
+        metrics : instrumentation.Metrics, optional
+            Registry receiving load, preprocess, inference and decode timings;
+            defaults to the process-wide instrumentation.REGISTRY
+        explain_cache_size : int
+            Samples per model whose explain() attributions are kept, keyed
+            like the prediction cache (0 disables it)
+        explain_jobs : int, optional
+            Cores used by explain(); defaults to all of them
+        budget_us : float, optional
+            Default per-sample latency budget of predict_compact
+        min_confidence : float, optional
+            Default confidence below which predict_compact falls back to the
+            full ensemble; otherwise each variant's calibrated threshold
+        """
+        unknown = [m for m in models if m not in MODEL_NAMES]
+        if unknown or not models:
+            raise ValueError("Models must be a non-empty subset of 'rf', 'xgb', 'nn'")
+        if runtime not in ('native', 'numpy'):
+            raise ValueError("Runtime must be 'native' or 'numpy'")
+        
         self.models_dir = models_dir
+        self.models = tuple(models)
+        self.runtime = runtime
+        self.use_bundle = use_bundle
+        self.metrics = REGISTRY if metrics is None else metrics
+        self.log = get_logger('predictor')
+        self._load_artifacts()
+        
+        self.cache = None
+        if cache_size:
+            self.cache = PredictionCache(self.feature_names, cache_size, cache_decimals)
+            self.cache.bind(self._fingerprint())
+        
+        self.budget_us = budget_us
+        self.min_confidence = min_confidence
+        
+        self.explain_jobs = explain_jobs
+        self.explain_cache = None
+        if explain_cache_size:
+            self.explain_cache = ExplanationCache(self.feature_names, explain_cache_size,
+                                                  cache_decimals)
+            self.explain_cache.bind(self._fingerprint())
+        
+        if not lazy:
+            self.load_models()
+            log_event(self.log, 'models_loaded', "✅ All models loaded successfully!",
+                      models=list(self.models), runtime=self.runtime)
+    
+    def _load_artifacts(self):
+        """Open the bundle (or pickled preprocessors); models stay unloaded"""
+        self._loaded = {}
+        self.bundle = None
+        for explainer in getattr(self, '_explainers', {}).values():
+            explainer.close()
+        self._explainers = {}
+        self._global_importances = None
+        self._compact_manifest = None
+        
+        bundle_path = os.path.join(self.models_dir, BUNDLE_FILENAME)
+        if self.use_bundle and os.path.exists(bundle_path):
+            # Preprocessor parameters are memory-mapped straight from the bundle
+            with self.metrics.timer('predictor_load_seconds', artifact='bundle'):
+                self.bundle = read_bundle(bundle_path)
+            self.scaler = self.bundle.scaler
+            self.label_encoder = self.bundle.label_encoder
+            self.imputer = self.bundle.imputer
+            self.feature_names = self.bundle.feature_names
+        else:
+            with self.metrics.timer('predictor_load_seconds', artifact='preprocessors'):
+                self._load_preprocessors()
+        self._prepare_kernel()
+    
+    def _fingerprint(self):
+        """Identify the artifacts in use: the bundle checksum, else file stamps"""
+        if self.bundle is not None and self.runtime == 'native':
+            return self.bundle.checksum
+        
+        digest = hashlib.sha256(self.runtime.encode())
+        for name in sorted(os.listdir(self.models_dir)):
+            st = os.stat(os.path.join(self.models_dir, name))
+            digest.update(f'{name}:{st.st_size}:{st.st_mtime_ns};'.encode())
+        return digest.hexdigest()
+    
+    def reload(self):
+        """
+        Re-read the artifacts in models_dir (e.g. after retraining)
         
-        # Load preprocessors
+        Cached predictions and explanations are dropped when the bundle or
+        model files changed.
+        """
+        self._load_artifacts()
+        for cache in (self.cache, self.explain_cache):
+            if cache is not None:
+                cache.bind(self._fingerprint())
+    
+    def _load_preprocessors(self):
+        """Load the individually pickled preprocessors"""
+        models_dir = self.models_dir
         with open(f'{models_dir}/scaler.pkl', 'rb') as f:
             self.scaler = pickle.load(f)
         with open(f'{models_dir}/label_encoder.pkl', 'rb') as f:
@@ -25,40 +178,429 @@ class WaterQualityPredictor:
             self.imputer = pickle.load(f)
         with open(f'{models_dir}/feature_names.pkl', 'rb') as f:
             self.feature_names = pickle.load(f)
+    
+    def _get_model(self, model, task):
+        """Return a fitted model, loading it from disk on first use"""
+        key = f'{model}_{task}'
+        if key in self._loaded:
+            return self._loaded[key]
         
-        # Load models
-        with open(f'{models_dir}/rf_classifier.pkl', 'rb') as f:
-            self.rf_classifier = pickle.load(f)
-        with open(f'{models_dir}/xgb_classifier.pkl', 'rb') as f:
-            self.xgb_classifier = pickle.load(f)
-        self.nn_classifier = keras.models.load_model(f'{models_dir}/nn_classifier.keras')
+        if model not in self.models:
+            raise ValueError(
+                f"Model '{model}' is not enabled for this predictor (models={self.models})"
+            )
         
-        with open(f'{models_dir}/rf_regressor.pkl', 'rb') as f:
-            self.rf_regressor = pickle.load(f)
-        with open(f'{models_dir}/xgb_regressor.pkl', 'rb') as f:
-            self.xgb_regressor = pickle.load(f)
-        self.nn_regressor = keras.models.load_model(f'{models_dir}/nn_regressor.keras')
+        with self.metrics.timer('predictor_load_seconds', artifact=key):
+            if self.runtime == 'numpy' and self.bundle is not None \
+                    and key in self.bundle.runtime_models:
+                # Zero-copy: the arrays stay pages of the bundle in the OS page cache
+                self._loaded[key] = numpy_runtime.from_arrays(self.bundle.runtime_arrays(key))
+            elif self.runtime == 'numpy':
+                self._loaded[key] = numpy_runtime.load_model(f'{self.models_dir}/{key}.npz')
+            elif self.bundle is not None and key in self.bundle.models:
+                self._loaded[key] = self.bundle.load_model(key)
+            elif model == 'nn':
+                # Imported here so rf/xgb-only workers never pay TensorFlow start-up
+                from tensorflow import keras
+                self._loaded[key] = keras.models.load_model(f'{self.models_dir}/{key}.keras')
+            else:
+                with open(f'{self.models_dir}/{key}.pkl', 'rb') as f:
+                    self._loaded[key] = pickle.load(f)
         
-        print("✅ All models loaded successfully!")
+        return self._loaded[key]
+    
+    def load_models(self):
+        """Eagerly load every selected model (e.g. to warm a worker before serving)"""
+        for model in self.models:
+            for task in ('classifier', 'regressor'):
+                self._get_model(model, task)
+    
+    def _prepare_kernel(self):
+        """Precompute the vectors used by the fused impute-and-scale kernel"""
+        medians = np.asarray(self.imputer.statistics_, dtype=np.float64)
+        self._scale_mean = np.asarray(self.scaler.mean_, dtype=np.float64)
+        self._scale_scale = np.asarray(self.scaler.scale_, dtype=np.float64)
+        # A missing value always scales to the same number, so impute post-scaling
+        self._scaled_fill = (medians - self._scale_mean) / self._scale_scale
+    
+    def _to_matrix(self, data):
+        """
+        Convert input into a fresh float64 (n_samples, n_features) array
+        
+        Returns:
+        --------
+        tuple : (array, row index for the results)
+        """
+        features = self.feature_names
+        if isinstance(data, dict):
+            row = [data[f] for f in features]
+            X = np.array([[np.nan if v is None else v for v in row]], dtype=np.float64)
+            return X, pd.RangeIndex(1)
+        if isinstance(data, pd.DataFrame):
+            return data[features].to_numpy(dtype=np.float64, na_value=np.nan, copy=True), data.index
+        if isinstance(data, (list, tuple)) and data and isinstance(data[0], dict):
+            X = np.array([[np.nan if r[f] is None else r[f] for f in features] for r in data],
+                         dtype=np.float64)
+            return X, pd.RangeIndex(len(X))
+        
+        # Plain arrays are assumed to follow the training feature order
+        X = np.array(data, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != len(features):
+            raise ValueError(
+                f"Array input must have shape (n_samples, {len(features)})"
+            )
+        return X, pd.RangeIndex(len(X))
+    
+    def _preprocess_matrix(self, X):
+        """Impute and scale a float64 matrix in place; returns contiguous float32"""
+        with self.metrics.timer('predictor_preprocess_seconds'):
+            missing = np.isnan(X)
+            np.subtract(X, self._scale_mean, out=X)
+            np.divide(X, self._scale_scale, out=X)
+            np.copyto(X, self._scaled_fill, where=missing)
+            X = X.astype(np.float32, order='C')
+        
+        self.metrics.inc('predictor_rows_preprocessed_total', len(X))
+        return X
     
     def preprocess_data(self, data):
-        """Preprocess input data"""
-        # Ensure we have all required features
-        df = pd.DataFrame([data]) if isinstance(data, dict) else data
+        """Preprocess input data (median imputation + standard scaling)"""
+        X, _ = self._to_matrix(data)
+        return self._preprocess_matrix(X)
+    
+    def _classify_encoded(self, X, model):
+        """Run one classifier over a preprocessed matrix, returning encoded labels"""
+        if model == 'rf':
+            pred = self.rf_classifier.predict(X)
+        elif model == 'xgb':
+            pred = self.xgb_classifier.predict(X)
+        elif model == 'nn':
+            pred = np.argmax(self.nn_classifier.predict(X, verbose=0), axis=1)
+        else:
+            raise ValueError("Model must be 'rf', 'xgb', or 'nn'")
+        return np.asarray(pred, dtype=int)
+    
+    def _regress(self, X, model):
+        """Run one regressor over a preprocessed matrix, returning WQI values"""
+        if model == 'rf':
+            wqi = self.rf_regressor.predict(X)
+        elif model == 'xgb':
+            wqi = self.xgb_regressor.predict(X)
+        elif model == 'nn':
+            wqi = self.nn_regressor.predict(X, verbose=0).reshape(-1)
+        else:
+            raise ValueError("Model must be 'rf', 'xgb', or 'nn'")
+        return np.asarray(wqi, dtype=float)
+    
+    def _run_models(self, X, jobs):
+        """
+        Run several (model, task) pairs over one raw float64 matrix
+        
+        Without a cache the matrix is preprocessed once and every model sees
+        all rows. With a cache, only rows that some model has not seen before
+        are preprocessed and predicted, and each unique row only once.
+        
+        Returns:
+        --------
+        dict : (model, task) -> encoded labels (int) or WQI values (float)
+        """
+        if self.cache is None:
+            X = self._preprocess_matrix(X)
+            return {(model, task): self._predict_task(X, model, task) for model, task in jobs}
+        
+        X, keys = self.cache.quantize(X)
+        found = {job: self.cache.lookup(keys, f'{job[0]}_{job[1]}') for job in jobs}
+        for (model, task), (_, miss) in found.items():
+            n_missed = int(miss.sum())
+            self.metrics.inc('predictor_cache_hits_total', len(keys) - n_missed,
+                             model=model, task=task)
+            self.metrics.inc('predictor_cache_misses_total', n_missed, model=model, task=task)
+        
+        missing = np.logical_or.reduce([miss for _, miss in found.values()])
+        if missing.any():
+            # Repeats inside the batch are predicted once
+            first_rows = {}
+            for i in np.flatnonzero(missing):
+                first_rows.setdefault(keys[i], i)
+            rows = np.fromiter(first_rows.values(), dtype=np.intp, count=len(first_rows))
+            new_keys = list(first_rows)
+            X_new = self._preprocess_matrix(X[rows])
+            
+            for (model, task), (values, miss) in found.items():
+                pred = self._predict_task(X_new, model, task)
+                self.cache.store(new_keys, f'{model}_{task}', pred)
+                lookup = dict(zip(new_keys, pred))
+                for i in np.flatnonzero(miss):
+                    values[i] = lookup[keys[i]]
+        
+        return {(model, task): values.astype(int) if task == 'classifier' else values
+                for (model, task), (values, _) in found.items()}
+    
+    def _predict_task(self, X, model, task):
+        with self.metrics.timer('predictor_inference_seconds', model=model, task=task):
+            if task == 'classifier':
+                pred = self._classify_encoded(X, model)
+            else:
+                pred = self._regress(X, model)
+        
+        self.metrics.inc('predictor_rows_predicted_total', len(X), model=model, task=task)
+        return pred
+    
+    def _decode(self, encoded):
+        """Encoded class indices -> class names"""
+        with self.metrics.timer('predictor_decode_seconds'):
+            return self.label_encoder.inverse_transform(encoded)
+    
+    def cache_stats(self):
+        """Hit/miss/eviction counters and size of the prediction cache, if enabled"""
+        if self.cache is None:
+            return None
+        return {**self.cache.stats, 'size': len(self.cache), 'max_size': self.cache.max_size}
+    
+    def _shap_values(self, X, model, task):
+        """(n, n_outputs, n_features + 1) attributions, served from the cache where possible"""
+        key = f'{model}_{task}'
+        if key not in self._explainers:
+            self._explainers[key] = TreeShapExplainer(model, self._get_model(model, task),
+                                                      self.explain_jobs)
+        explainer = self._explainers[key]
+        n_outputs = len(self.label_encoder.classes_) if task == 'classifier' else 1
+        shape = (n_outputs, len(self.feature_names) + 1)
+        
+        if self.explain_cache is None:
+            return explainer.shap_values(self._preprocess_matrix(X))
         
-        # Select only feature columns
-        df = df[self.feature_names]
+        X, keys = self.explain_cache.quantize(X)
+        values, miss = self.explain_cache.lookup(keys, key, shape[0] * shape[1])
+        n_missed = int(miss.sum())
+        self.metrics.inc('predictor_explain_cache_hits_total', len(keys) - n_missed,
+                         model=model, task=task)
+        self.metrics.inc('predictor_explain_cache_misses_total', n_missed, model=model, task=task)
         
-        # Impute missing values
-        df_imputed = pd.DataFrame(
-            self.imputer.transform(df),
-            columns=self.feature_names
-        )
+        if n_missed:
+            first_rows = {}
+            for i in np.flatnonzero(miss):
+                first_rows.setdefault(keys[i], i)
+            rows = np.fromiter(first_rows.values(), dtype=np.intp, count=len(first_rows))
+            new_keys = list(first_rows)
+            new = explainer.shap_values(self._preprocess_matrix(X[rows])).reshape(len(rows), -1)
+            self.explain_cache.store(new_keys, key, new)
+            lookup = dict(zip(new_keys, new))
+            for i in np.flatnonzero(miss):
+                values[i] = lookup[keys[i]]
+        return values.reshape(len(X), *shape)
+    
+    def explain(self, data, model='rf', task='classifier', target=None):
+        """
+        Per-sample TreeSHAP attributions of a Random Forest or XGBoost model
         
-        # Scale features
-        df_scaled = self.scaler.transform(df_imputed)
+        Parameters:
+        -----------
+        data : dict, list of dicts, pd.DataFrame or 2-D array
+            Water quality parameters, one sample per row
+        model : str
+            'rf' or 'xgb'
+        task : str
+            'classifier' or 'regressor'
+        target : str, optional
+            Class to explain (e.g. 'Highly Polluted'); defaults to each
+            sample's predicted class
+        
+        Returns:
+        --------
+        pd.DataFrame : Indexed like the input, one attribution column per
+            feature plus 'base_value' and 'output' (their sum: the class
+            probability for 'rf', the class log-odds for 'xgb', or the WQI).
+            Classifier explanations also carry 'explained_class'.
+        """
+        if model not in TREE_FAMILIES:
+            raise ValueError("Explanations need a tree model: 'rf' or 'xgb'")
+        if task not in ('classifier', 'regressor'):
+            raise ValueError("Task must be 'classifier' or 'regressor'")
+        if self.runtime != 'native':
+            raise ValueError("Explanations need runtime='native'")
         
-        return df_scaled
+        X, index = self._to_matrix(data)
+        with self.metrics.timer('predictor_explain_seconds', model=model, task=task):
+            values = self._shap_values(X, model, task)
+        self.metrics.inc('predictor_rows_explained_total', len(X), model=model, task=task)
+        
+        if task == 'classifier':
+            if target is None:
+                # The largest output is the predicted class for both model types
+                class_idx = np.argmax(values.sum(axis=2), axis=1)
+            else:
+                class_idx = np.full(len(X), self.label_encoder.transform([target])[0])
+            chosen = values[np.arange(len(X)), class_idx]
+        else:
+            chosen = values[:, 0]
+        
+        result = pd.DataFrame(chosen[:, :-1], index=index, columns=self.feature_names)
+        result['base_value'] = chosen[:, -1]
+        result['output'] = chosen.sum(axis=1)
+        if task == 'classifier':
+            result['explained_class'] = self._decode(class_idx)
+        return result
+    
+    def global_importance(self, model='rf', task='classifier'):
+        """
+        Mean |SHAP| per feature over the training data, computed when the models were saved
+        
+        Returns:
+        --------
+        pd.Series : Importances sorted high to low, or None for models saved without them
+        """
+        if self._global_importances is None:
+            self._global_importances = load_global_importances(self.models_dir)
+        entry = self._global_importances.get(f'{model}_{task}')
+        if entry is None:
+            return None
+        return pd.Series(entry['mean_abs_shap'], name='mean_abs_shap').sort_values(ascending=False)
+    
+    def compact_variants(self):
+        """
+        Compact variants saved by compression.compress_models
+        
+        Returns:
+        --------
+        pd.DataFrame : One row per variant, plus the full 'ensemble' first,
+            with test scores, deltas to the ensemble, 'agreement',
+            'min_confidence', 'coverage', 'latency_us' and (variants only)
+            'latency_with_fallback_us'
+        """
+        return pd.DataFrame(self._compact_reports())
+    
+    def _compact_reports(self):
+        if self._compact_manifest is None:
+            self._compact_manifest = load_manifest(self.models_dir, self.scaler)
+        return self._compact_manifest
+    
+    def _get_compact(self, name):
+        """(classifier, regressor) of a compact variant, loaded on first use"""
+        key = f'compact_{name}'
+        if key not in self._loaded:
+            with self.metrics.timer('predictor_load_seconds', artifact=key):
+                self._loaded[key] = load_variant(self.models_dir, name)
+        return self._loaded[key]
+    
+    def predict_compact(self, data, budget_us=None, min_confidence=None):
+        """
+        Classify with the best compact variant that fits a latency budget
+        
+        The variant agreeing most with the full ensemble among those whose
+        measured per-sample latency is within budget_us answers every row
+        it is confident about. Less confident rows are rerun through
+        predict_ensemble with the model families the variants were
+        calibrated against, and take its class vote and averaged WQI.
+        
+        Parameters:
+        -----------
+        data : dict, list of dicts, pd.DataFrame or 2-D array
+            Water quality parameters, one sample per row
+        budget_us : float, optional
+            Per-sample model latency budget in µs; defaults to the
+            predictor's budget_us
+        min_confidence : float, optional
+            Fall back below this class probability; defaults to the
+            predictor's min_confidence, then to the variant's calibrated
+            threshold
+        
+        Returns:
+        --------
+        pd.DataFrame : 'class', 'wqi', 'confidence' (of the compact model)
+            and 'model' (the variant, or 'ensemble' for fallback rows),
+            indexed like the input
+        """
+        budget_us = self.budget_us if budget_us is None else budget_us
+        if budget_us is None:
+            raise ValueError("predict_compact needs a latency budget (budget_us)")
+        reports = self._compact_reports()
+        variant = select_variant(reports, budget_us)
+        name = variant['name']
+        
+        if min_confidence is None:
+            min_confidence = self.min_confidence
+        if min_confidence is None:
+            min_confidence = variant['min_confidence']
+        # The thresholds only hold against the ensemble they were calibrated on
+        teacher = tuple(reports[0]['teacher'])
+        disabled = [m for m in teacher if m not in self.models]
+        if disabled and (min_confidence is None or min_confidence > 0):
+            raise ValueError(f"Compact variants fall back to the {'/'.join(teacher)} ensemble; "
+                             f"enable {', '.join(disabled)} or pass min_confidence=0")
+        classifier, regressor = self._get_compact(name)
+        
+        X, index = self._to_matrix(data)
+        raw = X.copy()
+        X = self._preprocess_matrix(X)
+        with self.metrics.timer('predictor_inference_seconds', model=name, task='compact'):
+            proba = classifier.predict_proba(X)
+            wqi = regressor.predict(X)
+        self.metrics.inc('predictor_rows_predicted_total', len(X), model=name, task='compact')
+        
+        confidence = proba.max(axis=1)
+        results = pd.DataFrame({
+            'class': self._decode(classifier.classes_[np.argmax(proba, axis=1)]).astype(object),
+            'wqi': wqi,
+            'confidence': confidence,
+            'model': name
+        }, index=index)
+        
+        low = confidence < (np.inf if min_confidence is None else min_confidence)
+        if low.any():
+            full = self.predict_ensemble(raw[low], teacher)
+            results.loc[low, 'class'] = full['class_vote'].to_numpy()
+            results.loc[low, 'wqi'] = full['avg_wqi'].to_numpy()
+            results.loc[low, 'model'] = 'ensemble'
+        self.metrics.inc('predictor_compact_fallback_total', int(low.sum()), model=name)
+        return results
+    
+    def predict_class_batch(self, data, model='rf'):
+        """
+        Predict water quality classification for many samples at once
+        
+        Preprocessing and the model run a single time over all rows.
+        
+        Parameters:
+        -----------
+        data : dict, list of dicts, pd.DataFrame or 2-D array
+            Water quality parameters, one sample per row
+        model : str
+            Model to use: 'rf', 'xgb', or 'nn'
+        
+        Returns:
+        --------
+        pd.Series : Predicted classes, indexed like the input rows
+        """
+        X, index = self._to_matrix(data)
+        encoded = self._run_models(X, [(model, 'classifier')])[model, 'classifier']
+        
+        labels = self._decode(encoded)
+        return pd.Series(labels, index=index, name='Water_Quality_Class')
+    
+    def predict_wqi_batch(self, data, model='rf'):
+        """
+        Predict Water Quality Index for many samples at once
+        
+        Preprocessing and the model run a single time over all rows.
+        
+        Parameters:
+        -----------
+        data : dict, list of dicts, pd.DataFrame or 2-D array
+            Water quality parameters, one sample per row
+        model : str
+            Model to use: 'rf', 'xgb', or 'nn'
+        
+        Returns:
+        --------
+        pd.Series : Predicted WQI values, indexed like the input rows
+        """
+        X, index = self._to_matrix(data)
+        wqi = self._run_models(X, [(model, 'regressor')])[model, 'regressor']
+        
+        return pd.Series(wqi, index=index, name='WQI')
     
     def predict_class(self, data, model='rf'):
         """
@@ -75,18 +617,7 @@ class WaterQualityPredictor:
         --------
         str : Predicted class (Safe/Potable, Polluted, or Highly Polluted)
         """
-        X = self.preprocess_data(data)
-        
-        if model == 'rf':
-            pred = self.rf_classifier.predict(X)[0]
-        elif model == 'xgb':
-            pred = self.xgb_classifier.predict(X)[0]
-        elif model == 'nn':
-            pred = np.argmax(self.nn_classifier.predict(X, verbose=0), axis=1)[0]
-        else:
-            raise ValueError("Model must be 'rf', 'xgb', or 'nn'")
-        
-        return self.label_encoder.inverse_transform([pred])[0]
+        return self.predict_class_batch(data, model).iloc[0]
     
     def predict_wqi(self, data, model='rf'):
         """
@@ -103,45 +634,88 @@ class WaterQualityPredictor:
         --------
         float : Predicted WQI value
         """
-        X = self.preprocess_data(data)
-        
-        if model == 'rf':
-            wqi = self.rf_regressor.predict(X)[0]
-        elif model == 'xgb':
-            wqi = self.xgb_regressor.predict(X)[0]
-        elif model == 'nn':
-            wqi = self.nn_regressor.predict(X, verbose=0)[0][0]
-        else:
-            raise ValueError("Model must be 'rf', 'xgb', or 'nn'")
-        
-        return float(wqi)
+        return float(self.predict_wqi_batch(data, model).iloc[0])
     
-    def predict_all(self, data):
+    def predict_ensemble(self, data, models=None):
         """
-        Get predictions from all models
+        Run every classifier and regressor over one shared preprocessed buffer
+        
+        Parameters:
+        -----------
+        data : dict, list of dicts, pd.DataFrame or 2-D array
+            Water quality parameters, one sample per row
+        models : tuple of str, optional
+            Models to include; defaults to every model enabled on the predictor
         
         Returns:
         --------
-        dict : Predictions from all models
+        pd.DataFrame : One row per sample with '<model>_class' and '<model>_wqi'
+            columns, plus 'avg_wqi' and the majority 'class_vote'. A three-way
+            split vote falls back to the class of the averaged WQI.
         """
-        results = {
+        models = self.models if models is None else tuple(models)
+        X, index = self._to_matrix(data)
+        outputs = self._run_models(X, [(model, task) for model in models
+                                       for task in ('classifier', 'regressor')])
+        
+        results = pd.DataFrame(index=index)
+        encoded, wqis = [], []
+        for model in models:
+            enc = outputs[model, 'classifier']
+            wqi = outputs[model, 'regressor']
+            encoded.append(enc)
+            wqis.append(wqi)
+            results[f'{model}_class'] = self._decode(enc)
+            results[f'{model}_wqi'] = wqi
+        
+        avg_wqi = np.mean(wqis, axis=0)
+        results['avg_wqi'] = avg_wqi
+        
+        # Majority vote over the encoded labels
+        encoded = np.vstack(encoded)
+        n_classes = len(self.label_encoder.classes_)
+        votes = (encoded[None, :, :] == np.arange(n_classes)[:, None, None]).sum(axis=1)
+        winner = self._decode(np.argmax(votes, axis=0)).astype(object)
+        split = votes.max(axis=0) == 1
+        if len(models) > 1 and split.any():
+            winner[split] = classify_wqi_array(avg_wqi[split])
+        results['class_vote'] = winner
+        
+        return results
+    
+    def format_result(self, row, models=None):
+        """Turn one predict_ensemble row into the predict_all dictionary"""
+        models = self.models if models is None else models
+        return {
             'Classification': {
-                'Random Forest': self.predict_class(data, 'rf'),
-                'XGBoost': self.predict_class(data, 'xgb'),
-                'Neural Network': self.predict_class(data, 'nn')
+                MODEL_NAMES[model]: row[f'{model}_class'] for model in models
             },
             'WQI Prediction': {
-                'Random Forest': round(self.predict_wqi(data, 'rf'), 2),
-                'XGBoost': round(self.predict_wqi(data, 'xgb'), 2),
-                'Neural Network': round(self.predict_wqi(data, 'nn'), 2)
-            }
+                MODEL_NAMES[model]: round(float(row[f'{model}_wqi']), 2) for model in models
+            },
+            'Average WQI': round(float(row['avg_wqi']), 2),
+            'Class Vote': row['class_vote']
         }
+    
+    def predict_all(self, data):
+        """
+        Get predictions from all enabled models
         
-        return results
+        Returns:
+        --------
+        dict : Predictions from all models, with the averaged WQI and class vote
+        """
+        return self.format_result(self.predict_ensemble(data).iloc[0])
 
 
-# Example usage
+# Example usage; with arguments, score a whole file (see bulk_score.py)
 if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        from bulk_score import main
+        main()
+        sys.exit()
+    
     print("=" * 80)
     print("WATER QUALITY PREDICTION SYSTEM")
     print("=" * 80)
@@ -176,7 +750,7 @@ if __name__ == "__main__":
     
     try:
         # Initialize predictor
-        predictor = WaterQualityPredictor()
+        predictor = WaterQualityPredictor(lazy=False)
         
         # Get predictions
         results = predictor.predict_all(sample_data)
@@ -193,9 +767,9 @@ if __name__ == "__main__":
         for model, wqi in results['WQI Prediction'].items():
             print(f"   {model:20s}: {wqi:.2f}")
         
-        # Average predictions
-        avg_wqi = sum(results['WQI Prediction'].values()) / len(results['WQI Prediction'])
+        avg_wqi = results['Average WQI']
         print(f"\n   Average WQI: {avg_wqi:.2f}")
+        print(f"   Class Vote:  {results['Class Vote']}")
         
         # Interpretation
         print("\n" + "=" * 80)
@@ -212,7 +786,7 @@ if __name__ == "__main__":
             print("   The water is severely polluted. Not suitable for use.")
         
         print("=" * 80)
-        
+    
     except FileNotFoundError:
         print("\n❌ Error: Models not found!")
         print("Please run the Jupyter notebook first to train and save the models.")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Prediction Result Cache
+Bounded LRU memo of per-sample model outputs for WaterQualityPredictor
+
+Readings are quantized to the precision the monitoring labs report before they
+are used as keys, so a re-submitted sample (an unchanged sensor, a polling
+dashboard) hits the cache even if it went through a float round-trip. Each
+entry is keyed on the quantized feature vector and the '<model>_<task>' name,
+and the whole cache is tied to a fingerprint of the loaded models: binding a
+different fingerprint drops every entry.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Decimal places the labs report each parameter with (see the 2025 dataset)
+INSTRUMENT_DECIMALS = {
+    'DO (mg/L)': 2,
+    'pH': 2,
+    'Conductivity (mS/cm)': 0,
+    'BOD (mg/L)': 1,
+    'COD (mg/L)': 0,
+    'Nitrate': 2,
+    'Nitrite-N (mg/L)': 2,
+    'Fecal Coliform (MPN/100ml)': 1,
+    'Total Coliform (MPN/100ml)': 0,
+    'Turbidity (NTU)': 1,
+    'Total Alk. (mg/L)': 0,
+    'Chloride (mg/L)': 0,
+    'TDS (mg/L)': 2,
+    'TSS (mg/L)': 0,
+    'Total Phosphate (mg/L)': 2,
+    'Ammonia': 2,
+    'Hardness (mg/L)': 2,
+    'Fluoride (mg/L)': 2
+}
+DEFAULT_DECIMALS = 2
+
+DEFAULT_CACHE_SIZE = 100_000
+
+
+class PredictionCache:
+    """LRU map of (quantized sample, model name) -> prediction"""
+    
+    def __init__(self, feature_names, max_size=DEFAULT_CACHE_SIZE, decimals=None):
+        """
+        Parameters:
+        -----------
+        feature_names : list of str
+            Column order of the matrices that will be quantized
+        max_size : int
+            Most entries kept; the least recently used is evicted beyond that
+        decimals : dict, optional
+            Per-feature overrides of INSTRUMENT_DECIMALS
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        
+        decimals = {**INSTRUMENT_DECIMALS, **(decimals or {})}
+        self.feature_names = list(feature_names)
+        self.max_size = max_size
+        self._factor = np.array([10.0 ** decimals.get(f, DEFAULT_DECIMALS)
+                                 for f in self.feature_names])
+        
+        self.fingerprint = None
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def bind(self, fingerprint):
+        """Attach the cache to a model set, clearing it if the models changed"""
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                if self.fingerprint is not None:
+                    self.stats['invalidations'] += 1
+                self._entries.clear()
+                self.fingerprint = fingerprint
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def quantize(self, X):
+        """
+        Round a raw (n_samples, n_features) matrix to instrument precision
+        
+        Returns:
+        --------
+        tuple : (quantized float64 matrix, one hashable key per row)
+        """
+        steps = np.rint(X * self._factor)
+        quantized = steps / self._factor
+        
+        # Missing values get a sentinel so NaN rows still compare equal
+        steps[np.isnan(steps)] = np.iinfo(np.int64).min
+        codes = steps.astype(np.int64)
+        return quantized, [row.tobytes() for row in codes]
+    
+    def lookup(self, keys, name):
+        """
+        Fetch cached results for one model
+        
+        Returns:
+        --------
+        tuple : (float64 array with NaN for misses, boolean miss mask)
+        """
+        values = np.full(len(keys), np.nan)
+        missing = np.ones(len(keys), dtype=bool)
+        hits = 0
+        with self._lock:
+            entries = self._entries
+            for i, key in enumerate(keys):
+                value = entries.get((key, name))
+                if value is not None:
+                    entries.move_to_end((key, name))
+                    values[i] = value
+                    missing[i] = False
+                    hits += 1
+            self.stats['hits'] += hits
+            self.stats['misses'] += len(keys) - hits
+        return values, missing
+    
+    def store(self, keys, name, values):
+        """Insert freshly computed results, evicting the oldest entries"""
+        with self._lock:
+            entries = self._entries
+            for key, value in zip(keys, values):
+                entries[(key, name)] = float(value)
+                entries.move_to_end((key, name))
+            overflow = len(entries) - self.max_size
+            for _ in range(max(overflow, 0)):
+                entries.popitem(last=False)
+            self.stats['evictions'] += max(overflow, 0)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Water Quality Prediction Server
+asyncio HTTP front end that micro-batches single-sample requests
+
+Concurrent requests are queued and merged into one predict_ensemble call as
+soon as either max_batch_size samples are waiting or the oldest has waited
+max_delay_ms. The fixed per-call cost of the models (Keras predict in
+particular) is then paid once per batch instead of once per request.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import get_logger, log_event
+from predict_water_quality import WaterQualityPredictor
+
+
+class MicroBatcher:
+    """Queue single samples and run them through the predictor in batches"""
+    
+    def __init__(self, predictor, max_batch_size=256, max_delay_ms=2.0, models=None):
+        """
+        Parameters:
+        -----------
+        predictor : WaterQualityPredictor
+            Loaded predictor shared by all requests
+        max_batch_size : int
+            Largest number of samples merged into one inference call
+        max_delay_ms : float
+            Longest time the first sample of a batch waits for company
+        models : tuple of str, optional
+            Models to run; defaults to every model enabled on the predictor
+        """
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.0
+        self.models = predictor.models if models is None else tuple(models)
+        
+        self.stats = {'requests': 0, 'batches': 0, 'errors': 0}
+        self._queue = None
+        self._task = None
+        # Inference runs off the event loop, one batch at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='wq-infer')
+    
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        # Anything still queued will never be served
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Prediction server is shutting down"))
+        self._executor.shutdown(wait=True)
+    
+    async def predict(self, sample):
+        """Predict one sample; resolves to the same dict as predict_all"""
+        if self._task is None:
+            raise RuntimeError("MicroBatcher.start() must be awaited before predict()")
+        
+        # Reject bad samples here so they cannot fail a whole batch
+        sample = self._validate(sample)
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((sample, future))
+        return await future
+    
+    def _validate(self, sample):
+        """The sample's features as floats (None for missing readings), or ValueError"""
+        missing = [f for f in self.predictor.feature_names if f not in sample]
+        if missing:
+            raise ValueError(f"Missing features: {', '.join(missing)}")
+        
+        values, invalid = {}, []
+        for f in self.predictor.feature_names:
+            value = sample[f]
+            if value is None:
+                values[f] = None
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                invalid.append(f"{f}={sample[f]!r}")
+                continue
+            if math.isinf(value):
+                invalid.append(f"{f}={sample[f]!r}")
+                continue
+            values[f] = None if math.isnan(value) else value
+        if invalid:
+            raise ValueError(f"Features must be numbers or null: {', '.join(invalid)}")
+        return values
+    
+    async def _collect(self, batch):
+        """
+        Wait for one sample, then gather more until size or time runs out
+        
+        Samples are appended to batch as they leave the queue, so a
+        cancellation can still answer the ones already taken.
+        """
+        loop = asyncio.get_running_loop()
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.max_delay
+        
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+    
+    def _infer(self, samples):
+        ensemble = self.predictor.predict_ensemble(samples, self.models)
+        return [self.predictor.format_result(row, self.models)
+                for row in ensemble.to_dict('records')]
+    
+    def _infer_each(self, samples):
+        """Per-sample results of a failed batch, with the exception in place of a result"""
+        results = []
+        for sample in samples:
+            try:
+                results.extend(self._infer([sample]))
+            except Exception as e:
+                results.append(e)
+        return results
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = []
+                await self._collect(batch)
+                samples = [sample for sample, _ in batch]
+                
+                self.stats['batches'] += 1
+                self.stats['requests'] += len(batch)
+                metrics = self.predictor.metrics
+                metrics.inc('server_batches_total')
+                metrics.inc('server_requests_total', len(batch))
+                try:
+                    with metrics.timer('server_batch_seconds'):
+                        results = await loop.run_in_executor(self._executor, self._infer, samples)
+                except Exception as e:
+                    if len(batch) == 1:
+                        results = [e]
+                    else:
+                        # Rerun the samples one at a time so only the failing ones fail
+                        results = await loop.run_in_executor(self._executor, self._infer_each,
+                                                             samples)
+                
+                for (_, future), result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        self.stats['errors'] += 1
+                        metrics.inc('server_errors_total')
+                    if not future.done():
+                        if isinstance(result, Exception):
+                            future.set_exception(result)
+                        else:
+                            future.set_result(result)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Prediction server is shutting down"))
+            raise
+
+
+# ============================================================================
+# HTTP front end
+# ============================================================================
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}
+
+
+class PredictionServer:
+    """
+    Minimal HTTP/1.1 server (stdlib only)
+    
+    POST /predict  body: one sample object, or a list of them
+    GET  /health   batching statistics
+    GET  /metrics  predictor and server metrics in Prometheus text format
+    """
+    
+    def __init__(self, batcher):
+        self.batcher = batcher
+    
+    async def _dispatch(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok', **self.batcher.stats}
+        if method == 'GET' and path == '/metrics':
+            return 200, self.batcher.predictor.metrics.to_prometheus()
+        if method != 'POST' or path != '/predict':
+            return 404, {'error': f'No route for {method} {path}'}
+        
+        try:
+            payload = json.loads(body or b'null')
+            if isinstance(payload, list):
+                result = await asyncio.gather(*(self.batcher.predict(s) for s in payload))
+            elif isinstance(payload, dict):
+                result = await self.batcher.predict(payload)
+            else:
+                return 400, {'error': 'Body must be a JSON object or a list of objects'}
+        except (ValueError, TypeError) as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': str(e)}
+        return 200, result
+    
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path = request_line.decode('latin-1').split()[:2]
+                
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                
+                status, payload = await self._dispatch(method, path, body)
+                if isinstance(payload, str):
+                    content_type = 'text/plain; version=0.0.4'
+                    data = payload.encode('utf-8')
+                else:
+                    content_type = 'application/json'
+                    data = json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(predictor, host='127.0.0.1', port=8000, **batcher_kwargs):
+    """Run the prediction server until cancelled"""
+    batcher = MicroBatcher(predictor, **batcher_kwargs)
+    await batcher.start()
+    server = await asyncio.start_server(PredictionServer(batcher).handle, host, port)
+    log_event(get_logger('server'), 'serving',
+              f"✅ Serving on http://{host}:{port} "
+              f"(batch ≤ {batcher.max_batch_size}, window {batcher.max_delay * 1000:.1f} ms)",
+              host=host, port=port, max_batch_size=batcher.max_batch_size,
+              max_delay_ms=batcher.max_delay * 1000)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-batching water quality prediction server")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--models', default='rf,xgb,nn', help="Comma-separated model families")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-delay-ms', type=float, default=2.0)
+    args = parser.parse_args()
+    
+    predictor = WaterQualityPredictor(args.models_dir, models=tuple(args.models.split(',')),
+                                      lazy=False)
+    try:
+        asyncio.run(serve(predictor, args.host, args.port,
+                          max_batch_size=args.max_batch_size, max_delay_ms=args.max_delay_ms))
+    except KeyboardInterrupt:
+        pass
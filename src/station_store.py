@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Station History Store
+Partitioned Parquet archive of labelled readings, indexed by station, water
+body and sampling period, with precomputed per-station rolling aggregates
+
+Layout::
+    
+    <root>/readings/<water body>/<YYYY-MM>.parquet   rows sorted by Station code
+    <root>/aggregates.parquet                        one row per station and period
+
+Each monthly CSV is one sampling period. A reading lookup opens only the
+files of the station's water bodies in the requested period range, and
+Parquet row-group statistics on the sorted 'Station code' column skip every
+row group that cannot contain the station. Trend queries never touch the
+readings at all: they read the aggregates table, which holds per-period
+counts, WQI statistics, class counts and calendar-month rolling means.
+"""
+
+import argparse
+import glob
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from wqi import classify_wqi_array
+
+READINGS_DIR = 'readings'
+AGGREGATES_FILE = 'aggregates.parquet'
+
+ROLLING_WINDOWS = (3, 12)
+ROW_GROUP_ROWS = 8_192
+
+CLASS_COLUMNS = {
+    'Safe/Potable': 'n_safe',
+    'Polluted': 'n_polluted',
+    'Highly Polluted': 'n_highly_polluted'
+}
+
+PERIOD_PATTERN = re.compile(r'^\d{4}-\d{2}$')
+
+
+def period_from_filename(path):
+    """'Water_Quality_Data_06_2025.csv' -> '2025-06'"""
+    match = re.search(r'(\d{2})_(\d{4})', os.path.basename(path))
+    if not match:
+        raise ValueError(f"No MM_YYYY sampling period in file name {path!r}")
+    return f'{match.group(2)}-{match.group(1)}'
+
+
+def _slug(name):
+    return re.sub(r'[^0-9A-Za-z]+', '_', str(name)).strip('_') or 'unknown'
+
+
+def _month_number(periods):
+    """'YYYY-MM' strings -> months since year 0, so windows can span years"""
+    periods = pd.Series(periods, dtype=str)
+    return periods.str[:4].astype(int).to_numpy() * 12 + periods.str[5:7].astype(int).to_numpy() - 1
+
+
+def _write_parquet(table, path, **kwargs):
+    import pyarrow.parquet as pq
+    tmp_path = f'{path}.tmp'
+    pq.write_table(table, tmp_path, **kwargs)
+    os.replace(tmp_path, path)
+
+
+def period_aggregates(df, period):
+    """Per-station statistics of one period's labelled readings"""
+    grouped = df.groupby('Station code', sort=True)
+    agg = grouped.agg(
+        station_name=('Station name', 'last'),
+        water_body=('water_bodies', 'last'),
+        n=('WQI', 'size'),
+        wqi_sum=('WQI', 'sum'),
+        wqi_min=('WQI', 'min'),
+        wqi_max=('WQI', 'max')
+    )
+    counts = pd.crosstab(df['Station code'], df['Water_Quality_Class'])
+    for label, column in CLASS_COLUMNS.items():
+        agg[column] = counts[label].reindex(agg.index, fill_value=0) if label in counts else 0
+    
+    agg = agg.reset_index()
+    agg.insert(1, 'period', period)
+    return agg
+
+
+def rolling_aggregates(agg):
+    """
+    Add calendar-month rolling means and classes to a (station, period) table
+    
+    Months without samples count as gaps, so a 12-month window always covers
+    the twelve months up to and including the period, whatever was sampled.
+    """
+    agg = agg.sort_values(['Station code', 'period'], ignore_index=True)
+    agg['wqi_mean'] = agg['wqi_sum'] / agg['n']
+    agg['class'] = classify_wqi_array(agg['wqi_mean'].to_numpy())
+    
+    station = pd.factorize(agg['Station code'], sort=True)[0].astype(np.int64)
+    key = station * 1_000_000 + _month_number(agg['period'])
+    
+    polluted = (agg['n_polluted'] + agg['n_highly_polluted']).to_numpy(dtype=np.float64)
+    sums = {'n': agg['n'].to_numpy(dtype=np.float64),
+            'wqi': agg['wqi_sum'].to_numpy(dtype=np.float64), 'polluted': polluted}
+    cums = {name: np.concatenate([[0.0], np.cumsum(values)]) for name, values in sums.items()}
+    
+    end = np.arange(1, len(agg) + 1)
+    for window in ROLLING_WINDOWS:
+        # First row of the same station inside the window (keys are sorted)
+        start = np.searchsorted(key, key - (window - 1), side='left')
+        n = cums['n'][end] - cums['n'][start]
+        wqi_mean = (cums['wqi'][end] - cums['wqi'][start]) / n
+        agg[f'wqi_mean_{window}m'] = wqi_mean
+        agg[f'class_{window}m'] = classify_wqi_array(wqi_mean)
+        agg[f'polluted_share_{window}m'] = (cums['polluted'][end] - cums['polluted'][start]) / n
+    return agg
+
+
+class StationStore:
+    """Append-by-period archive with station and water body lookups"""
+    
+    def __init__(self, root='store'):
+        self.root = root
+        self._aggregates = None
+    
+    # ------------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------------
+    
+    def append(self, df, period, overwrite=True):
+        """
+        Store one sampling period of labelled readings
+        
+        Parameters:
+        -----------
+        df : pd.DataFrame
+            Cleaned readings with 'Station code', 'Station name',
+            'water_bodies', the parameter columns, 'WQI' and
+            'Water_Quality_Class' (df_clean in run_analysis.py)
+        period : str
+            Sampling period as 'YYYY-MM'
+        overwrite : bool
+            Replace the period if it was stored before; otherwise a stored
+            period raises ValueError
+        
+        Returns:
+        --------
+        dict : rows stored, rows skipped (no station code) and stations
+        """
+        import pyarrow as pa
+        
+        if not PERIOD_PATTERN.match(period):
+            raise ValueError(f"Period must look like 'YYYY-MM', got {period!r}")
+        if self.has_period(period):
+            if not overwrite:
+                raise ValueError(f"Period {period} is already stored")
+            for path in self._period_files(period):
+                os.remove(path)
+        
+        has_station = df['Station code'].notna().to_numpy()
+        df = df[has_station].dropna(subset=['WQI', 'Water_Quality_Class'])
+        df = df.astype({'Station code': 'int64'}).sort_values('Station code', kind='stable')
+        
+        for water_body, rows in df.groupby('water_bodies', sort=False):
+            directory = os.path.join(self.root, READINGS_DIR, _slug(water_body))
+            os.makedirs(directory, exist_ok=True)
+            table = pa.Table.from_pandas(rows.assign(period=period), preserve_index=False)
+            _write_parquet(table, os.path.join(directory, f'{period}.parquet'),
+                           row_group_size=ROW_GROUP_ROWS)
+        
+        aggregates = self.aggregates()
+        aggregates = aggregates[aggregates['period'] != period] if len(aggregates) else None
+        new = period_aggregates(df, period)
+        combined = pd.concat([aggregates, new], ignore_index=True) if aggregates is not None else new
+        self._aggregates = rolling_aggregates(combined[list(new.columns)])
+        _write_parquet(pa.Table.from_pandas(self._aggregates, preserve_index=False),
+                       os.path.join(self.root, AGGREGATES_FILE))
+        
+        return {'rows': len(df), 'skipped': int((~has_station).sum()),
+                'stations': int(df['Station code'].nunique())}
+    
+    # ------------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------------
+    
+    def _period_files(self, period):
+        return glob.glob(os.path.join(self.root, READINGS_DIR, '*', f'{period}.parquet'))
+    
+    def periods(self):
+        """Every stored sampling period, oldest first"""
+        return sorted(self.aggregates()['period'].unique()) if len(self.aggregates()) else []
+    
+    def has_period(self, period):
+        return bool(self._period_files(period))
+    
+    def aggregates(self):
+        """The (station, period) aggregate table, cached in memory after the first read"""
+        if self._aggregates is None:
+            path = os.path.join(self.root, AGGREGATES_FILE)
+            if os.path.exists(path):
+                self._aggregates = pd.read_parquet(path)
+            else:
+                self._aggregates = pd.DataFrame()
+        return self._aggregates
+    
+    def stations(self):
+        """One row per station: name, water body, first/last period and sample count"""
+        agg = self.aggregates()
+        # The table is sorted by (station, period), so first/last rows are first/last periods
+        first = agg.drop_duplicates('Station code', keep='first').set_index('Station code')
+        last = agg.drop_duplicates('Station code', keep='last').set_index('Station code')
+        grouped = agg.groupby('Station code', sort=True)['n']
+        return pd.DataFrame({
+            'station_name': last['station_name'],
+            'water_body': last['water_body'],
+            'first_period': first['period'],
+            'last_period': last['period'],
+            'n_periods': grouped.size(),
+            'n_samples': grouped.sum()
+        })
+    
+    def _read(self, water_bodies, start, end, columns, station_code=None):
+        import pyarrow.dataset as ds
+        
+        files = []
+        for water_body in water_bodies:
+            directory = os.path.join(self.root, READINGS_DIR, _slug(water_body))
+            for path in sorted(glob.glob(os.path.join(directory, '*.parquet'))):
+                period = os.path.basename(path)[:-len('.parquet')]
+                if (start is None or period >= start) and (end is None or period <= end):
+                    files.append(path)
+        if not files:
+            return pd.DataFrame(columns=columns)
+        
+        dataset = ds.dataset(files, format='parquet')
+        row_filter = ds.field('Station code') == int(station_code) if station_code is not None else None
+        table = dataset.to_table(columns=columns, filter=row_filter)
+        return table.to_pandas().sort_values('period', kind='stable', ignore_index=True)
+    
+    def station_history(self, station_code, start=None, end=None, columns=None):
+        """
+        Every stored reading of one station
+        
+        Parameters:
+        -----------
+        station_code : int
+        start, end : str, optional
+            Inclusive 'YYYY-MM' period bounds
+        columns : list of str, optional
+            Columns to read (all by default); 'period' is always useful to keep
+        
+        Returns:
+        --------
+        pd.DataFrame : Readings ordered by period
+        """
+        agg = self.aggregates()
+        if not len(agg):
+            return pd.DataFrame(columns=columns)
+        water_bodies = agg.loc[agg['Station code'] == int(station_code), 'water_body'].unique()
+        return self._read(water_bodies, start, end, columns, station_code)
+    
+    def water_body_history(self, water_body, start=None, end=None, columns=None):
+        """Every stored reading of one water body, ordered by period"""
+        return self._read([water_body], start, end, columns)
+    
+    def station_trend(self, station_code, start=None, end=None):
+        """Per-period and rolling WQI/class aggregates of one station"""
+        agg = self.aggregates()
+        if not len(agg):
+            return agg
+        mask = agg['Station code'].to_numpy() == int(station_code)
+        return self._in_range(agg[mask], start, end)
+    
+    def water_body_trend(self, water_body, start=None, end=None):
+        """Per-station, per-period aggregates of every station on one water body"""
+        agg = self.aggregates()
+        if not len(agg):
+            return agg
+        return self._in_range(agg[agg['water_body'] == water_body], start, end)
+    
+    @staticmethod
+    def _in_range(agg, start, end):
+        if start is not None:
+            agg = agg[agg['period'] >= start]
+        if end is not None:
+            agg = agg[agg['period'] <= end]
+        return agg.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Station history store")
+    parser.add_argument('--root', default='store')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    ingest_cmd = commands.add_parser('ingest', help="Add a monitoring CSV as one sampling period")
+    ingest_cmd.add_argument('csv')
+    ingest_cmd.add_argument('--period', help="YYYY-MM (default: parsed from the file name)")
+    
+    station_cmd = commands.add_parser('station', help="Rolling WQI trend of one station")
+    station_cmd.add_argument('code', type=int)
+    station_cmd.add_argument('--start')
+    station_cmd.add_argument('--end')
+    
+    body_cmd = commands.add_parser('water-body', help="Trend of every station on a water body")
+    body_cmd.add_argument('name')
+    body_cmd.add_argument('--start')
+    body_cmd.add_argument('--end')
+    args = parser.parse_args()
+    
+    store = StationStore(args.root)
+    pd.set_option('display.width', 200)
+    columns = ['Station code', 'period', 'n', 'wqi_mean', 'class', 'wqi_mean_3m', 'wqi_mean_12m',
+               'class_12m']
+    
+    if args.command == 'ingest':
+        from ingest import load_clean_data
+        from wqi import STANDARDS, calculate_wqi_frame
+        
+        df = load_clean_data(args.csv)
+        df['WQI'] = calculate_wqi_frame(df, STANDARDS)
+        df['Water_Quality_Class'] = classify_wqi_array(df['WQI'])
+        period = args.period or period_from_filename(args.csv)
+        stats = store.append(df, period)
+        print(f"✅ Stored {stats['rows']} readings from {stats['stations']} stations as {period} "
+              f"({stats['skipped']} without a station code skipped)")
+    elif args.command == 'station':
+        print(store.station_trend(args.code, args.start, args.end)[columns].to_string(index=False))
+    else:
+        print(store.water_body_trend(args.name, args.start, args.end)[columns].to_string(index=False))
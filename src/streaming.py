@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Streaming Water Quality Scoring
+Score live sensor readings incrementally from compact per-station state
+
+Readings arrive one at a time from an async iterator or an asyncio.Queue and
+are scored in micro-batches (same trade-off as serving.MicroBatcher). For
+each station the scorer keeps:
+
+- the latest value of every parameter. A reading that leaves a parameter out
+  is forward-filled from the station's last report, not from the global
+  training median.
+- the WQI of its last `window` readings, which give the rolling mean and
+  standard deviation.
+- its current class. When the class changes, crossing the 70/40 thresholds
+  of classify_water_quality, an event is emitted for the reading that crossed.
+
+A batch only reads and updates the state rows of the stations it contains;
+history is never recomputed. Within a batch everything is vectorized, and
+readings from the same station are applied in arrival order.
+"""
+
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+
+from ingest import KEY_PARAMETERS
+from instrumentation import REGISTRY
+from wqi import CLASS_THRESHOLDS, STANDARDS, calculate_wqi_matrix
+
+CLASS_NAMES = ('Safe/Potable', 'Polluted', 'Highly Polluted')
+
+# BOUNDARIES[i] separates CLASS_NAMES[i] from CLASS_NAMES[i + 1]
+BOUNDARIES = (CLASS_THRESHOLDS['Safe/Potable'], CLASS_THRESHOLDS['Polluted'])
+
+# Put this on a queue to end the stream
+END_OF_STREAM = None
+
+
+def _ffill_groups(a, heads):
+    """
+    Forward-fill NaNs down the rows of a 2-D array without crossing groups
+    
+    heads are the first row of each group; a NaN there stays NaN.
+    """
+    rows = np.arange(len(a))[:, None]
+    idx = np.where(np.isnan(a), 0, rows)
+    idx[heads] = rows[heads]
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return np.take_along_axis(a, idx, axis=0)
+
+
+def _class_codes(wqi):
+    """Index into CLASS_NAMES as float, NaN where the WQI is unknown"""
+    with np.errstate(invalid='ignore'):
+        codes = np.select([wqi >= BOUNDARIES[0], wqi >= BOUNDARIES[1]], [0.0, 1.0], 2.0)
+    codes[np.isnan(wqi)] = np.nan
+    return codes
+
+
+class StreamingScorer:
+    """Per-station streaming WQI, rolling statistics and threshold-crossing events"""
+    
+    def __init__(self, parameters=None, window=12, predictor=None, models=None,
+                 station_key='Station code', time_key='timestamp', max_batch_size=8192,
+                 max_delay_ms=50.0, metrics=None):
+        """
+        Parameters:
+        -----------
+        parameters : list of str, optional
+            Parameters tracked per station; defaults to ingest.KEY_PARAMETERS
+        window : int
+            Readings per station in the rolling WQI statistics
+        predictor : WaterQualityPredictor, optional
+            Also run the models on every forward-filled reading. Their
+            features are added to the tracked parameters, and the
+            predictor's median imputer only fills parameters a station has
+            never reported.
+        models : tuple of str, optional
+            Models to run; defaults to every model enabled on the predictor
+        station_key, time_key : str
+            Reading fields holding the station id and the (optional) time,
+            which is passed through to results and events
+        max_batch_size : int
+            Largest number of readings scored together
+        max_delay_ms : float
+            Longest time the first reading of a batch waits for company
+        metrics : instrumentation.Metrics, optional
+            Defaults to the process-wide instrumentation.REGISTRY
+        """
+        self.parameters = list(parameters or KEY_PARAMETERS)
+        self.predictor = predictor
+        self.models = models
+        if predictor is not None:
+            self.parameters += [f for f in predictor.feature_names if f not in self.parameters]
+            self._feature_cols = [self.parameters.index(f) for f in predictor.feature_names]
+        self._wqi_cols = [i for i, p in enumerate(self.parameters) if p in STANDARDS]
+        
+        self.window = window
+        self.station_key = station_key
+        self.time_key = time_key
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.0
+        self.metrics = REGISTRY if metrics is None else metrics
+        
+        self._slots = {}
+        self.stations = []
+        self._latest = np.full((0, len(self.parameters)), np.nan)
+        self._history = np.full((0, window), np.nan)
+        self._class = np.full(0, np.nan)
+        self.stats = {'readings': 0, 'batches': 0, 'events': 0}
+    
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+    
+    def _grow(self, n_stations):
+        """Enlarge the state arrays (doubling) to hold n_stations"""
+        capacity = max(n_stations, 2 * len(self._latest), 64)
+        for name in ('_latest', '_history', '_class'):
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], np.nan)
+            new[:len(old)] = old
+            setattr(self, name, new)
+    
+    def _station_slots(self, stations):
+        slots = self._slots
+        for station in stations:
+            if station not in slots:
+                slots[station] = len(self.stations)
+                self.stations.append(station)
+        if len(self.stations) > len(self._latest):
+            self._grow(len(self.stations))
+        return np.fromiter((slots[s] for s in stations), dtype=np.int64, count=len(stations))
+    
+    def station_state(self, station):
+        """
+        Current state of one station
+        
+        Returns:
+        --------
+        dict : latest parameter values, last WQI, rolling mean/std/count and class
+        """
+        slot = self._slots[station]
+        history = self._history[slot]
+        seen = history[~np.isnan(history)]
+        code = self._class[slot]
+        return {
+            'latest': {p: float(v) for p, v in zip(self.parameters, self._latest[slot])
+                       if not np.isnan(v)},
+            'wqi': float(history[-1]),
+            'rolling_wqi_mean': float(seen.mean()) if len(seen) else np.nan,
+            'rolling_wqi_std': float(seen.std()) if len(seen) else np.nan,
+            'window_count': len(seen),
+            'class': np.nan if np.isnan(code) else CLASS_NAMES[int(code)]
+        }
+    
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+    
+    def process_arrays(self, stations, values, times=None):
+        """
+        Score one batch of readings given as arrays
+        
+        Parameters:
+        -----------
+        stations : sequence
+            Station id of each reading, in arrival order
+        values : np.ndarray
+            (n_readings, len(self.parameters)) values, NaN where a reading
+            does not report a parameter
+        times : sequence, optional
+            Time of each reading, copied into results and events
+        
+        Returns:
+        --------
+        tuple : (pd.DataFrame with one row per reading in arrival order:
+            station, time, 'WQI', 'class', 'rolling_wqi_mean',
+            'rolling_wqi_std', 'window_count' and any model outputs;
+            list of event dicts in arrival order)
+        """
+        n, W = len(values), self.window
+        if n == 0:
+            return pd.DataFrame(), []
+        
+        with self.metrics.timer('stream_batch_seconds'):
+            slots = self._station_slots(stations)
+            
+            # Group readings by station, keeping arrival order inside each group
+            order = np.argsort(slots, kind='stable')
+            sorted_slots = slots[order]
+            starts = np.flatnonzero(np.r_[True, sorted_slots[1:] != sorted_slots[:-1]])
+            groups = sorted_slots[starts]
+            sizes = np.diff(np.r_[starts, n])
+            group_of = np.repeat(np.arange(len(groups)), sizes)
+            rank = np.arange(n) - starts[group_of]
+            
+            # Each group is laid out as [station state, readings...]
+            heads = starts + np.arange(len(groups))
+            pos = np.arange(n) + group_of + 1
+            tails = pos[starts + sizes - 1]
+            
+            ext = np.empty((n + len(groups), len(self.parameters)))
+            ext[heads] = self._latest[groups]
+            ext[pos] = values[order]
+            filled = _ffill_groups(ext, heads)
+            self._latest[groups] = filled[tails]
+            X = filled[pos]
+            wqi = calculate_wqi_matrix(X[:, self._wqi_cols],
+                                       [self.parameters[i] for i in self._wqi_cols])
+            
+            # Rolling window: lay out [last W WQIs, new WQIs] per group and
+            # gather the W values ending at each new reading
+            offsets = np.r_[0, np.cumsum(W + sizes)[:-1]]
+            seq = np.empty(int((W + sizes).sum()))
+            seq[offsets[:, None] + np.arange(W)] = self._history[groups]
+            new = offsets[group_of] + W + rank
+            seq[new] = wqi
+            windows = seq[new[:, None] + np.arange(1 - W, 1)]
+            valid = ~np.isnan(windows)
+            count = valid.sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.where(valid, windows, 0.0).sum(axis=1) / count
+                dev = np.where(valid, windows - mean[:, None], 0.0)
+                std = np.sqrt((dev * dev).sum(axis=1) / count)
+            self._history[groups] = seq[(offsets + sizes)[:, None] + np.arange(W)]
+            
+            # Classes: a reading without a WQI leaves the station's class as it was
+            codes = _class_codes(wqi)
+            ext_codes = np.empty((n + len(groups), 1))
+            ext_codes[heads, 0] = self._class[groups]
+            ext_codes[pos, 0] = codes
+            current = _ffill_groups(ext_codes, heads)[:, 0]
+            previous = current[pos - 1]
+            changed = np.flatnonzero(~np.isnan(codes) & ~np.isnan(previous) & (codes != previous))
+            self._class[groups] = current[tails]
+            
+            # Back to arrival order
+            unsort = np.empty(n, dtype=np.int64)
+            unsort[order] = np.arange(n)
+            results = pd.DataFrame({self.station_key: np.asarray(stations, dtype=object)})
+            if times is not None:
+                results[self.time_key] = np.asarray(times, dtype=object)
+            results['WQI'] = wqi[unsort]
+            results['class'] = np.array((np.nan,) + CLASS_NAMES, dtype=object)[
+                np.nan_to_num(codes[unsort], nan=-1).astype(int) + 1]
+            results['rolling_wqi_mean'] = mean[unsort]
+            results['rolling_wqi_std'] = std[unsort]
+            results['window_count'] = count[unsort].astype(int)
+            if self.predictor is not None:
+                predictions = self.predictor.predict_ensemble(
+                    X[unsort][:, self._feature_cols], self.models)
+                results = pd.concat([results, predictions], axis=1)
+            
+            events = []
+            for i in sorted(order[changed]):
+                j = unsort[i]
+                old, cur = int(previous[j]), int(codes[j])
+                event = {
+                    'event': 'class_change',
+                    'station': stations[i],
+                    'wqi': float(wqi[j]),
+                    'previous_class': CLASS_NAMES[old],
+                    'class': CLASS_NAMES[cur],
+                    'direction': 'worse' if cur > old else 'better',
+                    'crossed': list(BOUNDARIES[min(old, cur):max(old, cur)])
+                }
+                if times is not None:
+                    event['time'] = times[i]
+                events.append(event)
+        
+        self.stats['readings'] += n
+        self.stats['batches'] += 1
+        self.stats['events'] += len(events)
+        self.metrics.inc('stream_readings_total', n)
+        self.metrics.inc('stream_events_total', len(events))
+        return results, events
+    
+    def process(self, readings):
+        """
+        Score one batch of readings given as dicts
+        
+        Each reading holds station_key, optionally time_key, and any subset
+        of the parameters (missing or None means not reported).
+        
+        Returns:
+        --------
+        tuple : (results, events), as for process_arrays
+        """
+        params = self.parameters
+        stations = [r[self.station_key] for r in readings]
+        values = np.array([[r.get(p) for p in params] for r in readings], dtype=np.float64)
+        values = values.reshape(len(readings), len(params))
+        times = None
+        if readings and self.time_key in readings[0]:
+            times = [r.get(self.time_key) for r in readings]
+        return self.process_arrays(stations, values, times)
+    
+    # ------------------------------------------------------------------
+    # Async consumption
+    # ------------------------------------------------------------------
+    
+    async def _collect(self, queue):
+        """
+        Wait for one reading, then gather more until size or time runs out
+        
+        Returns:
+        --------
+        tuple : (readings, whether END_OF_STREAM was reached)
+        """
+        loop = asyncio.get_running_loop()
+        item = await queue.get()
+        if item is END_OF_STREAM:
+            return [], True
+        batch = [item]
+        deadline = loop.time() + self.max_delay
+        
+        while len(batch) < self.max_batch_size:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is END_OF_STREAM:
+                return batch, True
+            batch.append(item)
+        
+        return batch, False
+    
+    async def _pump(self, source, queue):
+        try:
+            async for reading in source:
+                await queue.put(reading)
+        finally:
+            await queue.put(END_OF_STREAM)
+    
+    async def stream(self, source):
+        """
+        Score readings as they arrive
+        
+        Parameters:
+        -----------
+        source : async iterator of dicts, or asyncio.Queue
+            A queue is read until END_OF_STREAM (None) is put on it
+        
+        Yields:
+        -------
+        tuple : (results, events) for each micro-batch, as for process_arrays
+        """
+        pump = None
+        if isinstance(source, asyncio.Queue):
+            queue = source
+        else:
+            queue = asyncio.Queue(maxsize=4 * self.max_batch_size)
+            pump = asyncio.create_task(self._pump(source, queue))
+        
+        try:
+            done = False
+            while not done:
+                batch, done = await self._collect(queue)
+                if batch:
+                    yield self.process(batch)
+            if pump is not None:
+                # Re-raise an error from the source
+                await pump
+        finally:
+            if pump is not None and not pump.done():
+                pump.cancel()
+
+
+async def replay(readings):
+    """Async iterator over an in-memory list of readings (for tests and benchmarks)"""
+    for reading in readings:
+        yield reading
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    from ingest import load_clean_data
+    
+    parser = argparse.ArgumentParser(description="Replay a monitoring CSV through the streaming scorer")
+    parser.add_argument('csv', help="Monitoring CSV, replayed in row order")
+    parser.add_argument('--window', type=int, default=12)
+    args = parser.parse_args()
+    
+    df = load_clean_data(args.csv)
+    scorer = StreamingScorer(window=args.window)
+    readings = df[['Station code'] + [p for p in scorer.parameters if p in df]].to_dict('records')
+    
+    async def main():
+        async for _, events in scorer.stream(replay(readings)):
+            for event in events:
+                print(json.dumps(event, default=str))
+    
+    asyncio.run(main())
+    print(f"✅ {scorer.stats['readings']:,} readings from {len(scorer.stations):,} stations, "
+          f"{scorer.stats['events']:,} class changes")
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Parallel Model Training
+Fit the six water quality models concurrently with a per-model CPU budget
+
+Each fit runs in its own interpreter (``python training.py --job ...``) so that
+TensorFlow, XGBoost and scikit-learn thread pools never share a process, the
+core budget can be applied through environment variables before any library
+is imported, and peak memory is measured per model.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from explain import global_importances, save_global_importances
+from instrumentation import peak_rss_mb
+from model_bundle import BUNDLE_FILENAME, write_bundle
+from numpy_runtime import export_model
+
+# name -> (family, task)
+JOBS = {
+    'rf_classifier': ('rf', 'classification'),
+    'xgb_classifier': ('xgb', 'classification'),
+    'nn_classifier': ('nn', 'classification'),
+    'rf_regressor': ('rf', 'regression'),
+    'xgb_regressor': ('xgb', 'regression'),
+    'nn_regressor': ('nn', 'regression'),
+}
+
+# Relative share of cores per family: RF trees parallelise almost perfectly,
+# XGBoost less so, and the small Keras MLPs gain little beyond a few threads
+CORE_WEIGHTS = {'rf': 4, 'xgb': 3, 'nn': 1}
+
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']
+
+# Hyperparameters of run_analysis.py; tuning.py searches around them and
+# build_model/fit_model take per-family overrides
+DEFAULT_PARAMS = {
+    'rf': {'n_estimators': 200, 'max_depth': 15, 'min_samples_split': 5, 'min_samples_leaf': 2},
+    'xgb': {'n_estimators': 200, 'max_depth': 8, 'learning_rate': 0.1,
+            'subsample': 0.8, 'colsample_bytree': 0.8},
+    'nn': {'units': [128, 64, 32], 'dropout': [0.3, 0.3, 0.2], 'learning_rate': 1e-3,
+           'batch_size': 32, 'epochs': 100, 'patience': 15}
+}
+
+
+# ============================================================================
+# Model definitions (hyperparameters used by run_analysis.py)
+# ============================================================================
+
+def model_params(name, params=None):
+    """DEFAULT_PARAMS of the model's family updated with params"""
+    return {**DEFAULT_PARAMS[JOBS[name][0]], **(params or {})}
+
+
+def build_model(name, n_threads, n_features, n_classes=None, params=None):
+    """Construct an unfitted model restricted to n_threads"""
+    family, task = JOBS[name]
+    params = model_params(name, params)
+    
+    if family == 'rf':
+        from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+        cls = RandomForestClassifier if task == 'classification' else RandomForestRegressor
+        return cls(**params, random_state=42, n_jobs=n_threads)
+    
+    if family == 'xgb':
+        import xgboost as xgb
+        cls = xgb.XGBClassifier if task == 'classification' else xgb.XGBRegressor
+        return cls(**params, random_state=42, n_jobs=n_threads)
+    
+    import tensorflow as tf
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense, Dropout, BatchNormalization
+    from tensorflow.keras.optimizers import Adam
+    
+    tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    
+    # A scalar dropout applies to every hidden layer
+    units = params['units']
+    dropout = params['dropout']
+    dropout = dropout if isinstance(dropout, (list, tuple)) else [dropout] * len(units)
+    
+    layers = []
+    for i, width in enumerate(units):
+        kwargs = {'input_shape': (n_features,)} if i == 0 else {}
+        layers += [Dense(width, activation='relu', **kwargs),
+                   BatchNormalization(), Dropout(dropout[min(i, len(dropout) - 1)])]
+    head = [Dense(n_classes, activation='softmax')] if task == 'classification' else [Dense(1)]
+    model = Sequential(layers + head)
+    
+    optimizer = Adam(learning_rate=params['learning_rate'])
+    if task == 'classification':
+        model.compile(optimizer=optimizer, loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    else:
+        model.compile(optimizer=optimizer, loss='mse', metrics=['mae'])
+    return model
+
+
+def fit_model(name, model, X_train, y_train, params=None):
+    """Fit one model with the training settings used by run_analysis.py"""
+    family, _ = JOBS[name]
+    if family == 'nn':
+        from tensorflow.keras.callbacks import EarlyStopping
+        params = model_params(name, params)
+        model.fit(X_train, y_train, validation_split=0.2,
+                  epochs=params['epochs'], batch_size=params['batch_size'],
+                  callbacks=[EarlyStopping(patience=params['patience'], restore_best_weights=True)],
+                  verbose=0)
+    else:
+        model.fit(X_train, y_train)
+    return model
+
+
+def evaluate_model(name, model, X_test, y_test):
+    """Accuracy for classifiers, R² and RMSE for regressors"""
+    from sklearn.metrics import accuracy_score, mean_squared_error, r2_score
+    family, task = JOBS[name]
+    
+    if task == 'classification':
+        if family == 'nn':
+            y_pred = np.argmax(model.predict(X_test, verbose=0), axis=1)
+        else:
+            y_pred = model.predict(X_test)
+        return {'accuracy': float(accuracy_score(y_test, y_pred))}
+    
+    if family == 'nn':
+        y_pred = model.predict(X_test, verbose=0).flatten()
+    else:
+        y_pred = model.predict(X_test)
+    return {
+        'r2': float(r2_score(y_test, y_pred)),
+        'rmse': float(np.sqrt(mean_squared_error(y_test, y_pred)))
+    }
+
+
+def model_path(out_dir, name):
+    ext = 'keras' if JOBS[name][0] == 'nn' else 'pkl'
+    return os.path.join(out_dir, f'{name}.{ext}')
+
+
+def save_model(name, model, path):
+    if JOBS[name][0] == 'nn':
+        model.save(path)
+    else:
+        with open(path, 'wb') as f:
+            pickle.dump(model, f)
+
+
+def load_model(name, path):
+    if JOBS[name][0] == 'nn':
+        from tensorflow import keras
+        return keras.models.load_model(path)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_artifacts(models_dir, models, imputer, scaler, label_encoder, feature_names,
+                   X_reference=None):
+    """
+    Write everything WaterQualityPredictor reads from models_dir
+    
+    Per-model files (.pkl / .keras), the pickled preprocessors, the single-file
+    bundle (see model_bundle.py) and the NumPy-only exports (see numpy_runtime.py).
+    Given X_reference (scaled training rows), the tree models' global SHAP
+    importances are saved as well (see explain.py).
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    for name, model in models.items():
+        save_model(name, model, model_path(models_dir, name))
+    
+    for name, obj in (('scaler', scaler), ('label_encoder', label_encoder),
+                      ('imputer', imputer), ('feature_names', list(feature_names))):
+        with open(os.path.join(models_dir, f'{name}.pkl'), 'wb') as f:
+            pickle.dump(obj, f)
+    
+    exports = {name: export_model(name, model) for name, model in models.items()}
+    write_bundle(os.path.join(models_dir, BUNDLE_FILENAME), feature_names,
+                 imputer, scaler, label_encoder, models, runtime_models=exports)
+    for name, arrays in exports.items():
+        np.savez(os.path.join(models_dir, f'{name}.npz'), **arrays)
+    if X_reference is not None:
+        save_global_importances(global_importances(models, X_reference, feature_names), models_dir)
+
+
+# ============================================================================
+# Scheduling
+# ============================================================================
+
+def allocate_cores(names, total_cores=None):
+    """
+    Split total_cores between jobs in proportion to CORE_WEIGHTS
+    
+    Every job gets at least one core; the budget is never exceeded unless
+    there are more jobs than cores.
+    """
+    total_cores = total_cores or os.cpu_count() or 1
+    weights = {name: CORE_WEIGHTS[JOBS[name][0]] for name in names}
+    weight_sum = sum(weights.values())
+    
+    cores = {name: max(1, int(total_cores * w / weight_sum)) for name, w in weights.items()}
+    
+    # Hand out cores lost to rounding, heaviest-weighted jobs first
+    spare = total_cores - sum(cores.values())
+    for name in sorted(names, key=lambda n: -weights[n]):
+        if spare <= 0:
+            break
+        cores[name] += 1
+        spare -= 1
+    return cores
+
+
+def thread_env(n_threads):
+    """Environment variables capping a child process at n_threads library threads"""
+    env = {var: str(n_threads) for var in THREAD_ENV_VARS}
+    env['TF_CPP_MIN_LOG_LEVEL'] = os.environ.get('TF_CPP_MIN_LOG_LEVEL', '2')
+    return env
+
+
+@contextmanager
+def thread_limits(n_threads):
+    """
+    Cap library threads of child processes started inside the block
+    
+    OpenMP and BLAS size their pools when numpy is first imported, which a
+    spawned worker does before any initializer runs, so the variables have
+    to be in the environment it inherits.
+    """
+    limits = thread_env(n_threads)
+    saved = {var: os.environ.get(var) for var in limits}
+    os.environ.update(limits)
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def _run_job(name, data_dir, out_dir, n_threads, params=None):
+    """Launch one fit in a fresh interpreter and return its report"""
+    # Jobs run side by side with different core counts, so each gets its own
+    # environment rather than changing os.environ (see thread_limits)
+    env = {**os.environ, **thread_env(n_threads)}
+    
+    cmd = [sys.executable, os.path.abspath(__file__), '--job', name,
+           '--data', data_dir, '--out-dir', out_dir, '--threads', str(n_threads)]
+    if params:
+        cmd += ['--params', json.dumps(params)]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Training {name} failed:\n{proc.stderr}")
+    
+    report = json.loads(proc.stdout.strip().splitlines()[-1])
+    report['wall_s'] = time.perf_counter() - start
+    return report
+
+
+def stage_data(work_dir, X, y_class, y_wqi, n_train, n_classes):
+    """
+    Write the shared training matrix once for every job to memory-map
+    
+    Returns:
+    --------
+    str : Directory with X.npy, y_class.npy, y_wqi.npy and meta.json
+    """
+    data_dir = os.path.join(work_dir, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    for name, arr in (('X', X), ('y_class', y_class), ('y_wqi', y_wqi)):
+        np.save(os.path.join(data_dir, f'{name}.npy'), np.ascontiguousarray(arr))
+    with open(os.path.join(data_dir, 'meta.json'), 'w') as f:
+        json.dump({'n_train': int(n_train), 'n_classes': int(n_classes)}, f)
+    return data_dir
+
+
+def load_staged_data(data_dir, task):
+    """
+    Train and test slices of the staged matrix for one task
+    
+    Returns:
+    --------
+    tuple : (X_train, y_train, X_test, y_test, n_classes), views of read-only
+        memory maps
+    """
+    with open(os.path.join(data_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    load = lambda name: np.load(os.path.join(data_dir, f'{name}.npy'), mmap_mode='r')
+    X = load('X')
+    y = load('y_class' if task == 'classification' else 'y_wqi')
+    n_train = meta['n_train']
+    return X[:n_train], y[:n_train], X[n_train:], y[n_train:], meta['n_classes']
+
+
+def train_parallel(X, y_class, y_wqi, n_train, n_classes, names=tuple(JOBS), total_cores=None,
+                   work_dir=None, params=None):
+    """
+    Fit the selected models concurrently, one process per model
+    
+    Parameters:
+    -----------
+    X : np.ndarray
+        Scaled feature matrix shared by both tasks, training rows first
+        (see training_data.py)
+    y_class, y_wqi : np.ndarray
+        Encoded classes and WQI of the same rows
+    n_train : int
+        Rows [:n_train] are fitted on, the rest are the test set
+    n_classes : int
+        Number of encoded water quality classes
+    names : tuple of str
+        Jobs to run (keys of JOBS)
+    total_cores : int, optional
+        Core budget shared by all jobs; defaults to os.cpu_count()
+    work_dir : str, optional
+        Where the shared input matrix and fitted models are staged; by
+        default a temporary directory that is removed afterwards
+    params : dict, optional
+        name -> hyperparameter overrides (e.g. tuning.py's best_params.json)
+    
+    Returns:
+    --------
+    models : dict
+        name -> fitted model
+    reports : dict
+        name -> {'threads', 'wall_s', 'fit_s', 'peak_rss_mb', metrics...}
+    """
+    cores = allocate_cores(names, total_cores)
+    params = params or {}
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='wq_train_')
+    os.makedirs(work_dir, exist_ok=True)
+    
+    try:
+        # One copy of the matrix on disk instead of pickling split copies into
+        # every job; the jobs memory-map it, so its pages are shared between them
+        data_dir = stage_data(work_dir, X, y_class, y_wqi, n_train, n_classes)
+        
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            futures = {name: pool.submit(_run_job, name, data_dir, work_dir, cores[name],
+                                         params.get(name))
+                       for name in names}
+            reports = {name: future.result() for name, future in futures.items()}
+        
+        models = {name: load_model(name, model_path(work_dir, name)) for name in names}
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return models, reports
+
+
+def _worker_main(args):
+    """Entry point of one training subprocess"""
+    X_train, y_train, X_test, y_test, n_classes = load_staged_data(args.data, JOBS[args.job][1])
+    
+    params = json.loads(args.params) if args.params else None
+    model = build_model(args.job, args.threads, X_train.shape[1], n_classes, params)
+    start = time.perf_counter()
+    fit_model(args.job, model, X_train, y_train, params)
+    fit_s = time.perf_counter() - start
+    
+    report = evaluate_model(args.job, model, X_test, y_test)
+    save_model(args.job, model, model_path(args.out_dir, args.job))
+    
+    report.update(
+        threads=args.threads,
+        fit_s=fit_s,
+        # VmHWM, not ru_maxrss, which Linux carries over from the parent across exec
+        peak_rss_mb=peak_rss_mb()
+    )
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit one model (used by train_parallel)")
+    parser.add_argument('--job', required=True, choices=list(JOBS))
+    parser.add_argument('--data', required=True, help="Directory written by stage_data")
+    parser.add_argument('--out-dir', required=True)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--params', help="JSON hyperparameter overrides")
+    _worker_main(parser.parse_args())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Training Data Preparation
+One float32 feature matrix shared by the classification and regression fits
+
+The key parameters are copied once, column by column, into a float32 matrix
+whose rows are already in split order (training rows first), so the train and
+test sets of both tasks are slices of it rather than copies. The median
+imputer and the scaler are fitted on the training rows and then applied to
+the matrix in place. That one fitted stage is what save_artifacts writes and
+WaterQualityPredictor applies, so every model is served the preprocessing it
+was trained on.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+TEST_SIZE = 0.2
+
+
+class TrainingData:
+    """
+    Preprocessed training matrix with train/test views for both tasks
+    
+    Attributes:
+    -----------
+    X : np.ndarray
+        (n_samples, n_features) float32, imputed and scaled, rows in split order
+    y_class : np.ndarray
+        Encoded classes of the same rows
+    y_wqi : np.ndarray
+        WQI of the same rows
+    n_train : int
+        Rows [:n_train] are the training set, the rest the test set
+    order : np.ndarray
+        Position in the source DataFrame of every row of X
+    feature_names : list of str
+    imputer, scaler, label_encoder : fitted sklearn objects
+    """
+    
+    def __init__(self, X, y_class, y_wqi, n_train, order, feature_names,
+                 imputer, scaler, label_encoder):
+        self.X = X
+        self.y_class = y_class
+        self.y_wqi = y_wqi
+        self.n_train = n_train
+        self.order = order
+        self.feature_names = list(feature_names)
+        self.imputer = imputer
+        self.scaler = scaler
+        self.label_encoder = label_encoder
+    
+    @property
+    def X_train(self):
+        return self.X[:self.n_train]
+    
+    @property
+    def X_test(self):
+        return self.X[self.n_train:]
+    
+    @property
+    def n_test(self):
+        return len(self.X) - self.n_train
+    
+    @property
+    def nbytes(self):
+        return self.X.nbytes + self.y_class.nbytes + self.y_wqi.nbytes
+
+
+def split_order(y_class, test_size=TEST_SIZE, random_state=42):
+    """
+    Row permutation that puts a stratified training set first
+    
+    The training rows are the ones train_test_split(..., stratify=y_class)
+    selects with the same random_state.
+    
+    Returns:
+    --------
+    tuple : (order, n_train)
+    """
+    from sklearn.model_selection import train_test_split
+    
+    train_idx, test_idx = train_test_split(np.arange(len(y_class)), test_size=test_size,
+                                           random_state=random_state, stratify=y_class)
+    return np.concatenate([train_idx, test_idx]), len(train_idx)
+
+
+def feature_matrix(df, feature_names, order=None, dtype=np.float32):
+    """
+    Copy feature columns into one C-ordered matrix
+    
+    Columns are converted one at a time, so besides the matrix only a single
+    float64 column is ever allocated.
+    """
+    n_rows = len(df) if order is None else len(order)
+    X = np.empty((n_rows, len(feature_names)), dtype=dtype)
+    for j, name in enumerate(feature_names):
+        column = df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+        X[:, j] = column if order is None else column[order]
+    return X
+
+
+def fit_preprocessing_in_place(X, n_train, feature_names, chunk_rows=65536):
+    """
+    Fit the median imputer and the scaler on X[:n_train], then impute and
+    scale all of X in place
+    
+    Both are fitted without copying the training rows: the medians are taken
+    column by column and the scaler's running mean and variance are updated
+    chunk_rows at a time.
+    
+    Returns:
+    --------
+    tuple : (imputer, scaler)
+    """
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import StandardScaler
+    
+    # SimpleImputer's median is the median of the non-missing values; a fit on
+    # that one row gives an imputer with these statistics and the feature
+    # names incremental.py and the benchmarks transform DataFrames with
+    with warnings.catch_warnings():
+        # An all-missing column has a NaN median, as in SimpleImputer
+        warnings.simplefilter('ignore', RuntimeWarning)
+        medians = np.array([np.nanmedian(X[:n_train, j].astype(np.float64))
+                            for j in range(X.shape[1])])
+    imputer = SimpleImputer(strategy='median').fit(pd.DataFrame([medians], columns=feature_names))
+    fill = medians.astype(X.dtype)
+    for j in range(X.shape[1]):
+        column = X[:, j]
+        column[np.isnan(column)] = fill[j]
+    
+    scaler = StandardScaler()
+    for start in range(0, n_train, chunk_rows):
+        end = min(start + chunk_rows, n_train)
+        scaler.partial_fit(pd.DataFrame(X[start:end], columns=feature_names, copy=False))
+    X -= scaler.mean_.astype(X.dtype)
+    X /= scaler.scale_.astype(X.dtype)
+    return imputer, scaler
+
+
+def prepare_training_data(df, feature_names, test_size=TEST_SIZE, random_state=42):
+    """
+    Split, impute and scale df for training
+    
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Cleaned, labelled readings with the feature columns, 'WQI' and
+        'Water_Quality_Class'
+    feature_names : list of str
+    test_size : float
+        Share of rows held out; the split is stratified by class and shared
+        by the regression models
+    random_state : int
+    
+    Returns:
+    --------
+    TrainingData
+    """
+    from sklearn.preprocessing import LabelEncoder
+    
+    label_encoder = LabelEncoder()
+    y_class = label_encoder.fit_transform(df['Water_Quality_Class'])
+    order, n_train = split_order(y_class, test_size, random_state)
+    
+    X = feature_matrix(df, feature_names, order)
+    imputer, scaler = fit_preprocessing_in_place(X, n_train, feature_names)
+    y_wqi = df['WQI'].to_numpy(dtype=np.float64)[order]
+    return TrainingData(X, y_class[order], y_wqi, n_train, order, feature_names,
+                        imputer, scaler, label_encoder)
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Hyperparameter Search
+Random search with K-fold cross-validation, parallel trials and successive halving
+
+Trials are random draws from SEARCH_SPACES (plus the current defaults). Each
+rung scores the surviving trials by cross-validation on a growing share of
+every fold's training rows and keeps the best 1/eta of them, so most trials
+are dropped after fits on a small sample and only the last rung trains on
+full folds.
+
+The folds are imputed and scaled once and saved as .npy files under
+cache/tuning/<key>/. Worker processes memory-map them, so a trial only pays
+for its fits. Training rows are stored in a stratified shuffled order, which
+makes every rung's sample a plain prefix slice.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentation import REGISTRY, get_logger, log_event
+from training import DEFAULT_PARAMS, JOBS, build_model, evaluate_model, fit_model, thread_limits
+
+TUNING_CACHE_DIR = os.path.join('cache', 'tuning')
+BEST_PARAMS_FILENAME = 'best_params.json'
+
+# family -> parameter -> ('choice', options) | ('uniform', low, high) | ('loguniform', low, high)
+SEARCH_SPACES = {
+    'rf': {
+        'n_estimators': ('choice', [100, 200, 400]),
+        'max_depth': ('choice', [8, 12, 15, 20, None]),
+        'min_samples_split': ('choice', [2, 5, 10]),
+        'min_samples_leaf': ('choice', [1, 2, 4]),
+        'max_features': ('choice', ['sqrt', 0.5, 1.0])
+    },
+    'xgb': {
+        'n_estimators': ('choice', [100, 200, 400]),
+        'max_depth': ('choice', [4, 6, 8, 10]),
+        'learning_rate': ('loguniform', 0.02, 0.3),
+        'subsample': ('uniform', 0.6, 1.0),
+        'colsample_bytree': ('uniform', 0.6, 1.0),
+        'min_child_weight': ('choice', [1, 3, 5])
+    },
+    'nn': {
+        'units': ('choice', [[64, 32], [128, 64, 32], [256, 128, 64]]),
+        'dropout': ('choice', [0.1, 0.2, 0.3]),
+        'learning_rate': ('loguniform', 3e-4, 3e-3),
+        'batch_size': ('choice', [32, 64, 128])
+    }
+}
+
+# A rung trains on at least MIN_RUNG_ROWS rows per fold, or MIN_RUNG_SHARE
+# of the fold when that is smaller, and a classifier rung on at least
+# MIN_ROWS_PER_CLASS rows per class
+MIN_RUNG_ROWS = 200
+MIN_RUNG_SHARE = 0.25
+MIN_ROWS_PER_CLASS = 10
+
+
+def sample_params(family, rng):
+    """One random draw from SEARCH_SPACES[family]"""
+    params = {}
+    for param, (kind, *spec) in SEARCH_SPACES[family].items():
+        if kind == 'choice':
+            params[param] = spec[0][rng.integers(len(spec[0]))]
+        elif kind == 'uniform':
+            params[param] = float(rng.uniform(*spec))
+        else:
+            params[param] = float(np.exp(rng.uniform(np.log(spec[0]), np.log(spec[1]))))
+    return params
+
+
+def min_rung_rows(n_rows, n_classes=None):
+    """Fewest rows per fold a rung may train on (see MIN_RUNG_ROWS)"""
+    floor = min(MIN_RUNG_ROWS, MIN_RUNG_SHARE * n_rows)
+    if n_classes:
+        floor = max(floor, MIN_ROWS_PER_CLASS * n_classes)
+    return min(n_rows, math.ceil(floor))
+
+
+def halving_schedule(n_trials, eta, n_rows, n_classes=None):
+    """
+    Trials and row fraction per rung
+    
+    The last rung keeps ceil(n_trials / eta**(rungs - 1)) >= 1 trials on all
+    rows; each earlier rung has eta times more trials on 1/eta of the rows.
+    A rung smaller than min_rung_rows() trains on that many rows instead,
+    and is skipped once that is no fewer than the next rung's.
+    """
+    rungs = max(1, int(math.log(n_trials, eta) + 1e-9))
+    floor = min_rung_rows(n_rows, n_classes) / n_rows
+    schedule = []
+    for rung in range(rungs):
+        fraction = eta ** -(rungs - 1 - rung)
+        if rung < rungs - 1 and floor >= fraction * eta:
+            continue
+        schedule.append((max(1, math.ceil(n_trials / eta ** rung)), max(fraction, floor)))
+    # Rungs dropped for size leave the first kept rung with every trial
+    schedule[0] = (n_trials, schedule[0][1])
+    return schedule
+
+
+# ============================================================================
+# Cached folds
+# ============================================================================
+
+def _stratified_order(y, rng):
+    """Shuffled order in which every prefix has roughly the class mix of y"""
+    keys = np.empty(len(y))
+    for label in np.unique(y):
+        idx = np.flatnonzero(y == label)
+        keys[rng.permutation(idx)] = (np.arange(len(idx)) + rng.random()) / len(idx)
+    return np.argsort(keys, kind='stable')
+
+
+def fold_key(X, y, task, n_folds, seed):
+    digest = hashlib.sha256()
+    for part in (np.ascontiguousarray(X, dtype=np.float64), np.asarray(y)):
+        digest.update(part.tobytes())
+    digest.update(f'{task}|{n_folds}|{seed}|{X.shape}'.encode())
+    return digest.hexdigest()[:16]
+
+
+def prepare_folds(X, y, task, n_folds=5, seed=42, cache_dir=TUNING_CACHE_DIR):
+    """
+    Impute, scale and save every CV fold once
+    
+    Parameters:
+    -----------
+    X : array-like
+        Raw feature matrix (NaN for missing readings)
+    y : np.ndarray
+        Encoded classes or WQI values
+    task : str
+        'classification' (stratified folds) or 'regression'
+    
+    Returns:
+    --------
+    str : Directory with fold_<i>_{X_train,y_train,X_val,y_val}.npy
+    """
+    from sklearn.impute import SimpleImputer
+    from sklearn.model_selection import KFold, StratifiedKFold
+    from sklearn.preprocessing import StandardScaler
+    
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    fold_dir = os.path.join(cache_dir, f'{task}_{fold_key(X, y, task, n_folds, seed)}')
+    if os.path.exists(os.path.join(fold_dir, 'meta.json')):
+        return fold_dir
+    
+    tmp_dir = f'{fold_dir}.tmp{os.getpid()}'
+    os.makedirs(tmp_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    splitter = (StratifiedKFold if task == 'classification' else KFold)(
+        n_splits=n_folds, shuffle=True, random_state=seed)
+    
+    for i, (train_idx, val_idx) in enumerate(splitter.split(X, y)):
+        order = _stratified_order(y[train_idx], rng) if task == 'classification' \
+            else rng.permutation(len(train_idx))
+        train_idx = train_idx[order]
+        
+        # Preprocessors are fitted on the fold's training rows only
+        imputer = SimpleImputer(strategy='median').fit(X[train_idx])
+        scaler = StandardScaler().fit(imputer.transform(X[train_idx]))
+        for part, idx in (('train', train_idx), ('val', val_idx)):
+            np.save(os.path.join(tmp_dir, f'fold_{i}_X_{part}.npy'),
+                    scaler.transform(imputer.transform(X[idx])).astype(np.float32))
+            np.save(os.path.join(tmp_dir, f'fold_{i}_y_{part}.npy'), y[idx])
+    
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({'task': task, 'n_folds': n_folds, 'seed': seed, 'rows': len(X),
+                   'n_classes': int(y.max()) + 1 if task == 'classification' else None}, f)
+    try:
+        os.replace(tmp_dir, fold_dir)
+    except OSError:
+        # Another process finished the same folds first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return fold_dir
+
+
+# ============================================================================
+# Trials
+# ============================================================================
+
+def evaluate_trial(name, params, fold_dir, fraction, n_threads):
+    """
+    Cross-validated score of one parameter set on a fraction of the rows
+    
+    Returns:
+    --------
+    dict : 'score' (mean accuracy or R² over folds), 'fold_scores', 'fit_s'
+    """
+    with open(os.path.join(fold_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    metric = 'accuracy' if JOBS[name][1] == 'classification' else 'r2'
+    
+    scores, fit_s = [], 0.0
+    for i in range(meta['n_folds']):
+        load = lambda part: np.load(os.path.join(fold_dir, f'fold_{i}_{part}.npy'), mmap_mode='r')
+        n_rows = min(len(load('y_train')), math.ceil(len(load('y_train')) * fraction))
+        X_train, y_train = load('X_train')[:n_rows], load('y_train')[:n_rows]
+        
+        model = build_model(name, n_threads, X_train.shape[1], meta['n_classes'], params)
+        start = time.perf_counter()
+        fit_model(name, model, np.asarray(X_train), np.asarray(y_train), params)
+        fit_s += time.perf_counter() - start
+        scores.append(evaluate_model(name, model, np.asarray(load('X_val')), load('y_val'))[metric])
+    
+    return {'score': float(np.mean(scores)), 'fold_scores': scores, 'fit_s': fit_s}
+
+
+def tune_model(name, fold_dir, n_trials=27, eta=3, pool=None, n_threads=1, seed=42, logger=None):
+    """
+    Successive-halving search for one model
+    
+    Parameters:
+    -----------
+    name : str
+        Key of training.JOBS
+    fold_dir : str
+        Result of prepare_folds() for the model's task
+    n_trials : int
+        Parameter sets in the first rung; the first one is DEFAULT_PARAMS
+    eta : int
+        Each rung keeps the best 1/eta of its trials and gives them eta
+        times more rows
+    pool : concurrent.futures.Executor, optional
+        Runs the trials of a rung concurrently; serial without one
+    n_threads : int
+        Threads each trial's fits may use
+    
+    Returns:
+    --------
+    dict : 'best_params', 'best_score', 'trials' (one record per trial and
+        rung) and 'full_fit_equivalents' (sum of rows fitted / full fold rows)
+    """
+    logger = logger or get_logger('tuning')
+    family = JOBS[name][0]
+    rng = np.random.default_rng(seed)
+    
+    with open(os.path.join(fold_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    n_rows = meta['rows'] * (meta['n_folds'] - 1) // meta['n_folds']
+    
+    candidates = [dict(DEFAULT_PARAMS[family])]
+    candidates += [{**DEFAULT_PARAMS[family], **sample_params(family, rng)} for _ in range(n_trials - 1)]
+    alive = list(range(len(candidates)))
+    records, fit_equivalents = [], 0.0
+    
+    schedule = halving_schedule(len(candidates), eta, n_rows, meta['n_classes'])
+    for rung, (n_keep, fraction) in enumerate(schedule):
+        alive = alive[:n_keep]
+        start = time.perf_counter()
+        args = [(name, candidates[t], fold_dir, fraction, n_threads) for t in alive]
+        if pool is not None:
+            results = list(pool.map(evaluate_trial, *zip(*args)))
+        else:
+            results = [evaluate_trial(*a) for a in args]
+        
+        for trial, result in zip(alive, results):
+            records.append({'trial': trial, 'rung': rung, 'fraction': fraction,
+                            'params': candidates[trial], **result})
+            REGISTRY.observe('tuning_trial_fit_seconds', result['fit_s'], model=name, rung=rung)
+        fit_equivalents += len(alive) * meta['n_folds'] * fraction
+        
+        ranked = sorted(zip(alive, results), key=lambda tr: -tr[1]['score'])
+        alive = [trial for trial, _ in ranked]
+        log_event(logger, 'tuning_rung',
+                  f"   {name:16s} rung {rung}: {len(results):3d} trials on {fraction:6.1%} of rows, "
+                  f"best {ranked[0][1]['score']:.4f} ({time.perf_counter() - start:.1f}s)",
+                  model=name, rung=rung, trials=len(results), fraction=fraction,
+                  best_score=ranked[0][1]['score'])
+    
+    best = alive[0]
+    best_score = [r['score'] for r in records if r['trial'] == best][-1]
+    return {'best_params': candidates[best], 'best_score': best_score,
+            'trials': records, 'full_fit_equivalents': fit_equivalents}
+
+
+def tune(X, y_class, y_wqi, names=tuple(JOBS), n_trials=27, eta=3, n_folds=5, workers=None,
+         total_cores=None, seed=42, cache_dir=TUNING_CACHE_DIR):
+    """
+    Tune several models, sharing one worker pool and the cached folds
+    
+    Parameters:
+    -----------
+    X : array-like
+        Raw feature matrix (imputation and scaling happen per fold)
+    y_class, y_wqi : np.ndarray
+        Encoded classes and WQI values
+    workers : int, optional
+        Trial processes; defaults to the number of cores
+    total_cores : int, optional
+        Core budget shared by the workers
+    
+    Returns:
+    --------
+    dict : name -> tune_model() result
+    """
+    logger = get_logger('tuning')
+    total_cores = total_cores or os.cpu_count() or 1
+    workers = workers or total_cores
+    n_threads = max(1, total_cores // workers)
+    
+    fold_dirs = {}
+    for task, y in (('classification', y_class), ('regression', y_wqi)):
+        if any(JOBS[name][1] == task for name in names):
+            fold_dirs[task] = prepare_folds(X, y, task, n_folds, seed, cache_dir)
+    
+    results = {}
+    # spawn: TensorFlow and OpenMP runtimes must not be inherited through fork
+    with thread_limits(n_threads), \
+            ProcessPoolExecutor(max_workers=workers,
+                                mp_context=multiprocessing.get_context('spawn')) as pool:
+        for name in names:
+            start = time.perf_counter()
+            results[name] = tune_model(name, fold_dirs[JOBS[name][1]], n_trials, eta,
+                                       pool, n_threads, seed, logger)
+            results[name]['wall_s'] = time.perf_counter() - start
+            log_event(logger, 'tuning_done',
+                      f"✅ {name}: best CV score {results[name]['best_score']:.4f} in "
+                      f"{results[name]['wall_s']:.1f}s ({results[name]['full_fit_equivalents']:.1f} "
+                      f"full-fold fits instead of {n_trials * n_folds})",
+                      model=name, best_score=results[name]['best_score'],
+                      best_params=results[name]['best_params'], wall_s=results[name]['wall_s'])
+    return results
+
+
+def save_best_params(results, path):
+    """Write name -> best parameters, the format train_parallel(params=...) takes"""
+    with open(path, 'w') as f:
+        json.dump({name: result['best_params'] for name, result in results.items()}, f, indent=2)
+    return path
+
+
+def load_best_params(path):
+    """Parameters written by save_best_params, or {} when there are none"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    from sklearn.preprocessing import LabelEncoder
+    
+    from ingest import KEY_PARAMETERS, load_clean_data
+    from wqi import STANDARDS, calculate_wqi_frame, classify_wqi_array
+    
+    parser = argparse.ArgumentParser(description="Tune model hyperparameters")
+    parser.add_argument('csv', help="Monitoring CSV (cleaned and labelled like run_analysis.py)")
+    parser.add_argument('--models', default=','.join(JOBS), help="Comma-separated JOBS keys")
+    parser.add_argument('--trials', type=int, default=27)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, help="Trial processes (default: cores)")
+    parser.add_argument('--cores', type=int, help="Total core budget (default: all)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cache-dir', default=TUNING_CACHE_DIR)
+    parser.add_argument('--out', default=os.path.join('models', BEST_PARAMS_FILENAME))
+    args = parser.parse_args()
+    
+    df = load_clean_data(args.csv)
+    df['WQI'] = calculate_wqi_frame(df, STANDARDS)
+    df['Water_Quality_Class'] = classify_wqi_array(df['WQI'])
+    df = df.dropna(subset=['WQI', 'Water_Quality_Class'])
+    features = [col for col in KEY_PARAMETERS if col in df.columns]
+    
+    results = tune(df[features].to_numpy(dtype=np.float64),
+                   LabelEncoder().fit_transform(df['Water_Quality_Class']), df['WQI'].to_numpy(),
+                   names=args.models.split(','), n_trials=args.trials, eta=args.eta,
+                   n_folds=args.folds, workers=args.workers, total_cores=args.cores,
+                   seed=args.seed, cache_dir=args.cache_dir)
+    
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    save_best_params(results, args.out)
+    print(pd.DataFrame({name: {'best CV score': r['best_score'], 'wall s': r['wall_s'],
+                               'full-fold fits': r['full_fit_equivalents']}
+                        for name, r in results.items()}).T.to_string())
+    print(f"✅ Best parameters written to {args.out}")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Water Quality Index Engine
+WHO/BIS standards with scalar and column-wise vectorized WQI calculation
+"""
+
+import numpy as np
+import pandas as pd
+
+# WHO/BIS Standards
+STANDARDS = {
+    'pH': {'ideal': 7.0, 'min': 6.5, 'max': 8.5, 'weight': 4},
+    'DO (mg/L)': {'ideal': 6.0, 'min': 5.0, 'max': 14.0, 'weight': 5},
+    'BOD (mg/L)': {'ideal': 0, 'min': 0, 'max': 3.0, 'weight': 5},
+    'COD (mg/L)': {'ideal': 0, 'min': 0, 'max': 10.0, 'weight': 4},
+    'Nitrate': {'ideal': 0, 'min': 0, 'max': 45.0, 'weight': 5},
+    'Total Coliform (MPN/100ml)': {'ideal': 0, 'min': 0, 'max': 50, 'weight': 5},
+    'Fecal Coliform (MPN/100ml)': {'ideal': 0, 'min': 0, 'max': 10, 'weight': 5},
+    'TDS (mg/L)': {'ideal': 300, 'min': 0, 'max': 500, 'weight': 4},
+    'Turbidity (NTU)': {'ideal': 1, 'min': 0, 'max': 5, 'weight': 3},
+    'Chloride (mg/L)': {'ideal': 200, 'min': 0, 'max': 250, 'weight': 3},
+    'Hardness (mg/L)': {'ideal': 100, 'min': 0, 'max': 300, 'weight': 2},
+    'Fluoride (mg/L)': {'ideal': 1.0, 'min': 0.5, 'max': 1.5, 'weight': 4}
+}
+
+CLASS_THRESHOLDS = {'Safe/Potable': 70, 'Polluted': 40}
+
+
+# ============================================================================
+# Scalar reference implementation (one value / one row at a time)
+# ============================================================================
+
+def calculate_qi(value, param_name, standards=STANDARDS):
+    if pd.isna(value) or param_name not in standards:
+        return np.nan
+    std = standards[param_name]
+    
+    if param_name == 'pH':
+        if std['min'] <= value <= std['max']:
+            qi = 100 - abs(value - std['ideal']) * 10
+        else:
+            qi = max(0, 100 - abs(value - std['ideal']) * 20)
+    elif std['ideal'] == 0:
+        if value <= std['max']:
+            qi = 100 - (value / std['max']) * 100
+        else:
+            qi = max(0, 100 - (value / std['max']) * 150)
+    else:
+        if value <= std['max']:
+            qi = 100 - abs(value - std['ideal']) / std['max'] * 100
+        else:
+            qi = max(0, 100 - (value - std['max']) / std['max'] * 100)
+    return max(0, min(100, qi))
+
+
+def calculate_wqi(row, standards=STANDARDS):
+    qi_values, weights = [], []
+    for param, std_values in standards.items():
+        if param in row.index:
+            qi = calculate_qi(row[param], param, standards)
+            if not pd.isna(qi):
+                qi_values.append(qi)
+                weights.append(std_values['weight'])
+    if len(qi_values) == 0:
+        return np.nan
+    return sum(q * w for q, w in zip(qi_values, weights)) / sum(weights)
+
+
+def classify_water_quality(wqi):
+    if pd.isna(wqi):
+        return np.nan
+    elif wqi >= CLASS_THRESHOLDS['Safe/Potable']:
+        return 'Safe/Potable'
+    elif wqi >= CLASS_THRESHOLDS['Polluted']:
+        return 'Polluted'
+    else:
+        return 'Highly Polluted'
+
+
+# ============================================================================
+# Vectorized engine (whole columns at a time)
+# ============================================================================
+
+def calculate_qi_array(values, param_name, standards=STANDARDS):
+    """Quality index for a whole column; same piecewise rules as calculate_qi"""
+    v = np.asarray(values, dtype=float)
+    if param_name not in standards:
+        return np.full(v.shape, np.nan)
+    std = standards[param_name]
+    
+    with np.errstate(invalid='ignore'):
+        if param_name == 'pH':
+            dev = np.abs(v - std['ideal'])
+            in_range = (v >= std['min']) & (v <= std['max'])
+            qi = np.where(in_range, 100 - dev * 10, np.maximum(0, 100 - dev * 20))
+        elif std['ideal'] == 0:
+            ratio = v / std['max']
+            qi = np.where(v <= std['max'], 100 - ratio * 100, np.maximum(0, 100 - ratio * 150))
+        else:
+            qi = np.where(
+                v <= std['max'],
+                100 - np.abs(v - std['ideal']) / std['max'] * 100,
+                np.maximum(0, 100 - (v - std['max']) / std['max'] * 100)
+            )
+        qi = np.clip(qi, 0, 100)
+    
+    qi[np.isnan(v)] = np.nan
+    return qi
+
+
+def calculate_wqi_frame(df, standards=STANDARDS):
+    """
+    Weighted WQI for every row of a DataFrame in one pass
+    
+    Parameters missing from a row (NaN) drop out of both the numerator and the
+    weight total, exactly as in calculate_wqi. Rows with no usable parameter
+    get NaN.
+    
+    Returns:
+    --------
+    pd.Series : WQI values, indexed like df
+    """
+    params = [p for p in standards if p in df.columns]
+    if not params:
+        return pd.Series(np.nan, index=df.index, name='WQI')
+    
+    X = np.column_stack([df[p].to_numpy(dtype=float, na_value=np.nan) for p in params])
+    return pd.Series(calculate_wqi_matrix(X, params, standards), index=df.index, name='WQI')
+
+
+def calculate_wqi_matrix(X, params, standards=STANDARDS):
+    """
+    Weighted WQI for the rows of a 2-D array
+    
+    Parameters:
+    -----------
+    X : np.ndarray
+        (n_samples, len(params)) parameter values, NaN where missing
+    params : list of str
+        Column names of X; columns not in standards are ignored
+    
+    Returns:
+    --------
+    np.ndarray : n_samples WQI values, NaN for rows with no usable parameter
+    """
+    cols = [i for i, p in enumerate(params) if p in standards]
+    if not cols:
+        return np.full(len(X), np.nan)
+    
+    qi = np.column_stack([calculate_qi_array(X[:, i], params[i], standards) for i in cols])
+    weights = np.array([standards[params[i]]['weight'] for i in cols], dtype=float)
+    
+    valid = ~np.isnan(qi)
+    weight_total = valid @ weights
+    weighted_sum = np.where(valid, qi, 0.0) @ weights
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(weight_total > 0, weighted_sum / weight_total, np.nan)
+
+
+def classify_wqi_array(wqi):
+    """Vectorized classify_water_quality; NaN WQI stays NaN"""
+    wqi = np.asarray(wqi, dtype=float)
+    labels = np.select(
+        [wqi >= CLASS_THRESHOLDS['Safe/Potable'], wqi >= CLASS_THRESHOLDS['Polluted']],
+        ['Safe/Potable', 'Polluted'],
+        default='Highly Polluted'
+    ).astype(object)
+    labels[np.isnan(wqi)] = np.nan
+    return labels
@@ -0,0 +1,73 @@
+import os
+import shutil
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import pytest
+
+DATA_CSV = os.path.join(ROOT, 'docs', 'data', 'Water_Quality_Data_06_2025.csv')
+
+# Small versions of the run_analysis.py tree models so the fixtures build in seconds
+SMALL_PARAMS = {
+    'rf': {'n_estimators': 20, 'max_depth': 8},
+    'xgb': {'n_estimators': 20, 'max_depth': 4},
+    'nn': {'units': [16, 8], 'epochs': 3, 'patience': 1},
+}
+
+
+def label(df):
+    """Add WQI and class columns and drop unlabelled rows, as run_analysis.py does"""
+    from wqi import STANDARDS, calculate_wqi_frame, classify_wqi_array
+    
+    df = df.assign(WQI=calculate_wqi_frame(df, STANDARDS))
+    df['Water_Quality_Class'] = classify_wqi_array(df['WQI'])
+    return df.dropna(subset=['WQI', 'Water_Quality_Class'])
+
+
+@pytest.fixture(scope='session')
+def labelled_data():
+    """The cleaned and labelled readings of the bundled monitoring CSV"""
+    from ingest import load_clean_data
+    return label(load_clean_data(DATA_CSV))
+
+
+@pytest.fixture(scope='session')
+def trained_models_dir(tmp_path_factory, labelled_data):
+    """
+    RF and XGBoost models saved the way run_analysis.py saves them
+    
+    Shared by the whole session: tests that change the directory use models_dir.
+    """
+    pytest.importorskip('xgboost')
+    from incremental import STATE_FILENAME, TrainingState
+    from ingest import KEY_PARAMETERS
+    from training import build_model, fit_model, save_artifacts
+    from training_data import prepare_training_data
+    
+    feature_names = [f for f in KEY_PARAMETERS if f in labelled_data.columns]
+    data = prepare_training_data(labelled_data, feature_names)
+    models = {}
+    for name in ('rf_classifier', 'xgb_classifier', 'rf_regressor', 'xgb_regressor'):
+        family = name.split('_')[0]
+        y = data.y_class if name.endswith('classifier') else data.y_wqi
+        model = build_model(name, 1, len(feature_names), len(data.label_encoder.classes_),
+                            SMALL_PARAMS[family])
+        models[name] = fit_model(name, model, data.X_train, y[:data.n_train], SMALL_PARAMS[family])
+    
+    models_dir = str(tmp_path_factory.mktemp('models'))
+    save_artifacts(models_dir, models, data.imputer, data.scaler, data.label_encoder,
+                   feature_names)
+    train_rows = labelled_data.iloc[data.order[:data.n_train]]
+    TrainingState.from_data(train_rows[feature_names], train_rows['Water_Quality_Class'],
+                            train_rows['WQI']).save(os.path.join(models_dir, STATE_FILENAME))
+    return models_dir
+
+
+@pytest.fixture
+def models_dir(tmp_path, trained_models_dir):
+    """A private copy of trained_models_dir that a test may modify"""
+    path = str(tmp_path / 'models')
+    shutil.copytree(trained_models_dir, path)
+    return path
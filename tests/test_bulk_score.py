@@ -0,0 +1,182 @@
+"""Sharded bulk scoring against one pass of score_frame (see bulk_score.py)"""
+
+import os
+
+import pandas as pd
+import pytest
+
+import bulk_score
+from bulk_score import MANIFEST_FILENAME, plan_shards, score_frame
+from conftest import DATA_CSV
+from incremental import retrain_incremental
+from ingest import METADATA_COLS
+
+MODELS = ('rf', 'xgb')
+CHUNK_MB = 0.005      # about 5 KB, so the monitoring CSV becomes several shards
+CHUNK_ROWS = 50
+
+
+@pytest.fixture(scope='module')
+def raw():
+    return pd.read_csv(DATA_CSV, dtype=str, keep_default_na=False)
+
+
+@pytest.fixture(scope='module')
+def parquet_input(tmp_path_factory, raw):
+    path = str(tmp_path_factory.mktemp('input') / 'readings.parquet')
+    raw.to_parquet(path, index=False, row_group_size=20)
+    return path
+
+
+@pytest.fixture(scope='module')
+def expected(trained_models_dir, raw):
+    predictor = bulk_score._open_predictor(trained_models_dir, MODELS, 'native')
+    return score_frame(predictor, raw, METADATA_COLS)
+
+
+def read_output(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype={col: str for col in METADATA_COLS}, keep_default_na=False,
+                       na_values=[''])
+
+
+def assert_scores_equal(output, expected):
+    got = read_output(output)
+    assert list(got.columns) == list(expected.columns)
+    for col in got.columns:
+        if col.endswith('wqi'):
+            pd.testing.assert_series_equal(got[col], expected[col].astype(float),
+                                           check_exact=False, rtol=1e-12)
+        else:
+            assert list(got[col]) == list(expected[col]), col
+
+
+def run(input_path, output, models_dir, **kwargs):
+    kwargs = {'models': MODELS, 'workers': 1, 'chunk_mb': CHUNK_MB, 'chunk_rows': CHUNK_ROWS,
+              **kwargs}
+    return bulk_score.bulk_score(input_path, str(output), models_dir, **kwargs)
+
+
+# ============================================================================
+# Shard plans
+# ============================================================================
+
+def test_csv_shards_cover_the_file_at_line_boundaries(raw):
+    plan = plan_shards(DATA_CSV, chunk_mb=CHUNK_MB)
+    assert len(plan['shards']) > 3
+    assert plan['columns'] == list(raw.columns)
+    
+    with open(DATA_CSV, 'rb') as f:
+        data = f.read()
+    assert plan['shards'][0][0] == data.index(b'\n') + 1
+    assert plan['shards'][-1][1] == len(data)
+    for (_, end), (start, _) in zip(plan['shards'], plan['shards'][1:]):
+        assert end == start and data[end - 1:end] == b'\n'
+    
+    shards = [bulk_score.read_shard(DATA_CSV, plan, shard, None) for shard in plan['shards']]
+    pd.testing.assert_frame_equal(pd.concat(shards, ignore_index=True), raw)
+
+
+def test_parquet_shards_group_row_groups(parquet_input, raw):
+    plan = plan_shards(parquet_input, chunk_rows=CHUNK_ROWS)
+    assert plan['format'] == 'parquet'
+    assert [g for shard in plan['shards'] for g in shard] == list(range(-(-len(raw) // 20)))
+    assert all(len(shard) == 3 for shard in plan['shards'][:-1])
+
+
+# ============================================================================
+# Scoring and merging
+# ============================================================================
+
+@pytest.mark.parametrize('source', ['csv', 'parquet'])
+@pytest.mark.parametrize('out_format', ['csv', 'parquet'])
+def test_parts_are_merged_in_input_order(tmp_path, trained_models_dir, parquet_input, expected,
+                                         source, out_format):
+    input_path = DATA_CSV if source == 'csv' else parquet_input
+    output = tmp_path / f'scores.{out_format}'
+    summary = run(input_path, output, trained_models_dir)
+    
+    assert summary['rows'] == len(expected) and summary['shards'] > 3
+    assert summary['shards_skipped'] == 0
+    assert not os.path.exists(f'{output}.parts')
+    assert_scores_equal(str(output), expected)
+
+
+# ============================================================================
+# Resuming
+# ============================================================================
+
+@pytest.fixture
+def interrupted(tmp_path, models_dir, monkeypatch):
+    """A CSV run that stopped after three shards, its parts left behind"""
+    output = tmp_path / 'scores.csv'
+    score_shard = bulk_score._score_shard
+    
+    def failing(path, plan, index, *args):
+        if index == 3:
+            raise KeyboardInterrupt
+        return score_shard(path, plan, index, *args)
+    
+    monkeypatch.setattr(bulk_score, '_score_shard', failing)
+    with pytest.raises(KeyboardInterrupt):
+        run(DATA_CSV, output, models_dir)
+    monkeypatch.setattr(bulk_score, '_score_shard', score_shard)
+    
+    parts = sorted(os.listdir(f'{output}.parts'))
+    assert parts == [MANIFEST_FILENAME] + [f'part-{i:06d}.csv' for i in range(3)]
+    assert not os.path.exists(output)
+    return output
+
+
+def test_resume_skips_finished_parts(interrupted, models_dir, expected, monkeypatch):
+    scored = []
+    score_shard = bulk_score._score_shard
+    
+    def recording(path, plan, index, *args):
+        scored.append(index)
+        return score_shard(path, plan, index, *args)
+    
+    monkeypatch.setattr(bulk_score, '_score_shard', recording)
+    summary = run(DATA_CSV, interrupted, models_dir)
+    
+    assert scored[0] == 3 and sorted(scored) == list(range(3, summary['shards']))
+    assert summary['shards_skipped'] == 3
+    assert summary['rows'] < len(expected)
+    assert_scores_equal(str(interrupted), expected)
+
+
+@pytest.mark.parametrize('change', ['models', 'chunk_mb', 'retrained'])
+def test_resume_rejects_a_different_run(interrupted, models_dir, change):
+    kwargs = {}
+    if change == 'models':
+        kwargs['models'] = ('rf',)
+    elif change == 'chunk_mb':
+        kwargs['chunk_mb'] = CHUNK_MB * 2
+    else:
+        retrain_incremental(DATA_CSV, models_dir)
+    
+    with pytest.raises(ValueError, match='--restart'):
+        run(DATA_CSV, interrupted, models_dir, **kwargs)
+    # Nothing was merged or discarded
+    assert not os.path.exists(interrupted)
+    assert len(os.listdir(f'{interrupted}.parts')) == 4
+
+
+def test_touched_input_is_rejected(tmp_path, trained_models_dir, raw):
+    input_path = str(tmp_path / 'readings.csv')
+    raw.to_csv(input_path, index=False)
+    output = tmp_path / 'scores.csv'
+    run(input_path, output, trained_models_dir, keep_parts=True)
+    
+    stat = os.stat(input_path)
+    os.utime(input_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    with pytest.raises(ValueError, match='different input'):
+        run(input_path, output, trained_models_dir)
+
+
+def test_restart_discards_old_parts(interrupted, models_dir, expected):
+    summary = run(DATA_CSV, interrupted, models_dir, models=('rf',), restart=True)
+    assert summary['shards_skipped'] == 0 and summary['rows'] == len(expected)
+    assert list(read_output(str(interrupted)).columns) == METADATA_COLS + [
+        'rf_class', 'rf_wqi', 'avg_wqi', 'class_vote']
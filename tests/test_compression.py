@@ -0,0 +1,166 @@
+"""Compact variants: budget selection and fallback to the full ensemble (see compression.py)"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from compression import (COMPACT_DIRNAME, MANIFEST_FILENAME, compress_models, load_manifest,
+                         load_variant, select_variant)
+from ingest import KEY_PARAMETERS
+from model_bundle import ArrayScaler
+from predict_water_quality import WaterQualityPredictor
+from training import load_model, model_path
+from training_data import prepare_training_data
+
+TEACHER = ('rf', 'xgb')
+
+# Latencies pinned in the saved manifest, so budget selection does not
+# depend on how fast this machine is (name -> (µs, agreement))
+PINNED = {
+    'rf_pruned_5': (40.0, 0.95),
+    'rf_pruned_10': (80.0, 0.97),
+    'xgb_rounds_5': (30.0, 0.90),
+    'distilled_d4': (10.0, 0.93),
+    'distilled_d6': (12.0, 0.93),
+}
+
+
+@pytest.fixture(scope='module')
+def compact_dir(tmp_path_factory, trained_models_dir, labelled_data):
+    """The trained models plus small compact variants with pinned latencies"""
+    path = str(tmp_path_factory.mktemp('compact') / 'models')
+    shutil.copytree(trained_models_dir, path)
+    
+    feature_names = [f for f in KEY_PARAMETERS if f in labelled_data.columns]
+    data = prepare_training_data(labelled_data, feature_names)
+    models = {name: load_model(name, model_path(path, name))
+              for name in ('rf_classifier', 'rf_regressor', 'xgb_classifier', 'xgb_regressor')}
+    manifest = compress_models(models, data.label_encoder, data.X_train, data.X_test,
+                               data.y_class[data.n_train:], data.y_wqi[data.n_train:], path,
+                               data.scaler, teacher=TEACHER, prune_sizes=(5, 10),
+                               xgb_rounds=(5,), distill_depths=(4, 6), transfer_rows=2_000,
+                               calibration_rows=1_000)
+    assert [v['name'] for v in manifest[1:]] == list(PINNED)
+    
+    for report in manifest[1:]:
+        report['latency_us'], report['agreement'] = PINNED[report['name']]
+    with open(os.path.join(path, COMPACT_DIRNAME, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f)
+    return path
+
+
+@pytest.fixture(scope='module')
+def batch(labelled_data, compact_dir):
+    predictor = WaterQualityPredictor(compact_dir, models=TEACHER)
+    return labelled_data[predictor.feature_names].iloc[:150]
+
+
+def variant_outputs(predictor, name, batch):
+    """Class, WQI and confidence of a variant on its own"""
+    classifier, regressor = load_variant(predictor.models_dir, name)
+    X = predictor.preprocess_data(batch)
+    proba = classifier.predict_proba(X)
+    classes = predictor.label_encoder.inverse_transform(classifier.classes_[np.argmax(proba, axis=1)])
+    return list(classes), regressor.predict(X), proba.max(axis=1)
+
+
+# ============================================================================
+# Selection
+# ============================================================================
+
+def test_select_variant():
+    manifest = [{'name': 'ensemble', 'latency_us': 500.0, 'agreement': 1.0}] + [
+        {'name': name, 'latency_us': us, 'agreement': agreement}
+        for name, (us, agreement) in PINNED.items()]
+    
+    assert select_variant(manifest, 1_000)['name'] == 'rf_pruned_10'
+    assert select_variant(manifest, 79)['name'] == 'rf_pruned_5'
+    # Equal agreement: the faster variant wins
+    assert select_variant(manifest, 35)['name'] == 'distilled_d4'
+    assert select_variant(manifest, 10)['name'] == 'distilled_d4'
+    
+    with pytest.raises(ValueError, match='fastest, distilled_d4'):
+        select_variant(manifest, 5)
+    with pytest.raises(ValueError, match='No compact variants'):
+        select_variant(manifest[:1], 1_000)
+
+
+@pytest.mark.parametrize('budget_us,expected', [(1_000, 'rf_pruned_10'), (50, 'rf_pruned_5'),
+                                                (20, 'distilled_d4')])
+def test_budget_picks_the_variant(compact_dir, batch, budget_us, expected):
+    predictor = WaterQualityPredictor(compact_dir, models=TEACHER, budget_us=budget_us)
+    results = predictor.predict_compact(batch, min_confidence=0)
+    
+    assert list(results.index) == list(batch.index)
+    assert (results['model'] == expected).all()
+    classes, wqi, confidence = variant_outputs(predictor, expected, batch)
+    assert list(results['class']) == classes
+    np.testing.assert_allclose(results['wqi'].to_numpy(float), wqi)
+    np.testing.assert_allclose(results['confidence'], confidence)
+
+
+def test_budget_is_required(compact_dir, batch):
+    with pytest.raises(ValueError, match='budget_us'):
+        WaterQualityPredictor(compact_dir, models=TEACHER).predict_compact(batch)
+
+
+# ============================================================================
+# Fallback
+# ============================================================================
+
+@pytest.mark.parametrize('quantile', [0.5, None])
+def test_unconfident_rows_fall_back_to_the_ensemble(compact_dir, batch, quantile):
+    predictor = WaterQualityPredictor(compact_dir, models=TEACHER, budget_us=20)
+    classes, wqi, confidence = variant_outputs(predictor, 'distilled_d4', batch)
+    if quantile is None:
+        # The variant's calibrated threshold
+        threshold = next(v for v in load_manifest(compact_dir)
+                         if v['name'] == 'distilled_d4')['min_confidence']
+        threshold = np.inf if threshold is None else threshold
+        min_confidence = None
+    else:
+        threshold = min_confidence = float(np.quantile(confidence, quantile))
+    
+    results = predictor.predict_compact(batch, min_confidence=min_confidence)
+    low = confidence < threshold
+    assert list(results['model'] == 'ensemble') == list(low)
+    if quantile is not None:
+        assert 0 < low.sum() < len(batch)
+    
+    full = predictor.predict_ensemble(batch[low], TEACHER)
+    assert list(results.loc[low, 'class']) == list(full['class_vote'])
+    np.testing.assert_allclose(results.loc[low, 'wqi'].to_numpy(float), full['avg_wqi'])
+    assert list(results.loc[~low, 'class']) == list(np.asarray(classes, dtype=object)[~low])
+    np.testing.assert_allclose(results.loc[~low, 'wqi'].to_numpy(float), wqi[~low])
+    # The compact model's confidence is reported for every row
+    np.testing.assert_allclose(results['confidence'], confidence)
+
+
+def test_every_row_can_fall_back(compact_dir, batch):
+    predictor = WaterQualityPredictor(compact_dir, models=TEACHER, budget_us=20, min_confidence=1.01)
+    results = predictor.predict_compact(batch)
+    full = predictor.predict_ensemble(batch, TEACHER)
+    assert (results['model'] == 'ensemble').all()
+    assert list(results['class']) == list(full['class_vote'])
+    np.testing.assert_allclose(results['wqi'].to_numpy(float), full['avg_wqi'])
+
+
+def test_fallback_needs_the_teacher_families(compact_dir, batch):
+    predictor = WaterQualityPredictor(compact_dir, models=('rf',), budget_us=20)
+    with pytest.raises(ValueError, match='enable xgb'):
+        predictor.predict_compact(batch, min_confidence=0.5)
+    
+    # Without a fallback the variant answers alone
+    results = predictor.predict_compact(batch, min_confidence=0)
+    assert (results['model'] == 'distilled_d4').all()
+
+
+def test_variants_of_another_scaler_are_refused(compact_dir):
+    predictor = WaterQualityPredictor(compact_dir, models=TEACHER)
+    scaler = ArrayScaler(predictor.scaler.mean_ + 1, predictor.scaler.scale_)
+    assert load_manifest(compact_dir, predictor.scaler)
+    with pytest.raises(ValueError, match='different scaler'):
+        load_manifest(compact_dir, scaler)
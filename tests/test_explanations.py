@@ -0,0 +1,100 @@
+"""TreeSHAP explanations: additivity, caching and invalidation (see explain.py)"""
+
+import numpy as np
+import pytest
+
+from conftest import DATA_CSV
+from explain import TreeShapExplainer
+from incremental import retrain_incremental
+from predict_water_quality import WaterQualityPredictor
+
+JOBS = [(model, task) for model in ('rf', 'xgb') for task in ('classifier', 'regressor')]
+
+
+@pytest.fixture(scope='module')
+def predictor(trained_models_dir):
+    return WaterQualityPredictor(trained_models_dir, models=('rf', 'xgb'), explain_jobs=1)
+
+
+@pytest.fixture(scope='module')
+def batch(labelled_data, predictor):
+    return labelled_data[predictor.feature_names].iloc[:60]
+
+
+def model_output(predictor, batch, model, task, classes):
+    """What the explanation must add up to: probability, log-odds or WQI"""
+    X = predictor.preprocess_data(batch)
+    estimator = predictor._get_model(model, task)
+    if task == 'regressor':
+        return estimator.predict(X)
+    if model == 'rf':
+        return estimator.predict_proba(X)[np.arange(len(X)), classes]
+    return estimator.predict(X, output_margin=True)[np.arange(len(X)), classes]
+
+
+@pytest.mark.parametrize('model,task', JOBS)
+def test_attributions_add_up_to_the_prediction(predictor, batch, model, task):
+    explanation = predictor.explain(batch, model, task)
+    features = explanation[predictor.feature_names].to_numpy()
+    np.testing.assert_allclose(features.sum(axis=1) + explanation['base_value'],
+                               explanation['output'], rtol=1e-6, atol=1e-6)
+    
+    classes = None
+    if task == 'classifier':
+        classes = predictor.label_encoder.transform(explanation['explained_class'])
+        predicted = predictor._get_model(model, task).predict(predictor.preprocess_data(batch))
+        np.testing.assert_array_equal(classes, predicted)
+    np.testing.assert_allclose(explanation['output'],
+                               model_output(predictor, batch, model, task, classes),
+                               rtol=1e-4, atol=1e-4)
+
+
+def test_target_class_is_explained(predictor, batch):
+    target = predictor.label_encoder.classes_[0]
+    explanation = predictor.explain(batch, 'rf', 'classifier', target=target)
+    assert (explanation['explained_class'] == target).all()
+
+
+def test_cached_explanations_match(trained_models_dir, batch):
+    predictor = WaterQualityPredictor(trained_models_dir, models=('rf', 'xgb'), explain_jobs=1)
+    first = predictor.explain(batch, 'xgb', 'classifier')
+    misses = predictor.explain_cache.stats['misses']
+    
+    again = predictor.explain(batch, 'xgb', 'classifier')
+    assert predictor.explain_cache.stats['misses'] == misses
+    np.testing.assert_array_equal(again.to_numpy(), first.to_numpy())
+
+
+def test_parallel_random_forest_matches_serial(predictor, labelled_data):
+    X = predictor.preprocess_data(labelled_data[predictor.feature_names].sample(
+        600, replace=True, random_state=0))
+    model = predictor._get_model('rf', 'classifier')
+    parallel = TreeShapExplainer('rf', model, n_jobs=2)
+    try:
+        np.testing.assert_allclose(parallel.shap_values(X),
+                                   TreeShapExplainer('rf', model, n_jobs=1).shap_values(X),
+                                   rtol=1e-10, atol=1e-12)
+    finally:
+        parallel.close()
+
+
+def test_reload_drops_explanations_of_replaced_models(models_dir, labelled_data):
+    predictor = WaterQualityPredictor(models_dir, models=('rf', 'xgb'), explain_jobs=1)
+    batch = labelled_data[predictor.feature_names].iloc[:20]
+    before = predictor.explain(batch, 'rf', 'regressor')
+    
+    # Same files: the cache survives a reload
+    predictor.reload()
+    assert len(predictor.explain_cache) == len(batch)
+    assert predictor.explain_cache.stats['invalidations'] == 0
+    
+    retrain_incremental(DATA_CSV, models_dir)
+    predictor.reload()
+    assert len(predictor.explain_cache) == 0
+    assert predictor.explain_cache.stats['invalidations'] == 1
+    
+    after = predictor.explain(batch, 'rf', 'regressor')
+    np.testing.assert_allclose(after['output'],
+                               model_output(predictor, batch, 'rf', 'regressor', None),
+                               rtol=1e-6, atol=1e-6)
+    assert not np.allclose(after['output'], before['output'])
@@ -0,0 +1,192 @@
+"""Running statistics, model re-parameterization and update safety (see incremental.py)"""
+
+import copy
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import StandardScaler
+
+import incremental
+from conftest import DATA_CSV, SMALL_PARAMS
+from incremental import (
+    REPLAY_PER_CLASS, STATE_FILENAME, TrainingState, model_outputs, reading_steps,
+    rescale_model_inputs, retrain_incremental, warm_start_model
+)
+from prediction_cache import INSTRUMENT_DECIMALS
+from training import JOBS, build_model, fit_model, load_model, model_path
+
+FEATURES = ['DO (mg/L)', 'pH', 'Conductivity (mS/cm)', 'BOD (mg/L)', 'Fecal Coliform (MPN/100ml)']
+CLASSES = np.array(['Highly Polluted', 'Polluted', 'Safe/Potable'], dtype=object)
+
+
+def make_readings(n_rows, seed, shift=0.0):
+    """Raw readings at instrument precision with some missing values"""
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        np.round(rng.lognormal(np.log(10 ** j) + shift, 0.6, n_rows), INSTRUMENT_DECIMALS[f])
+        for j, f in enumerate(FEATURES)
+    ])
+    X[rng.random(X.shape) < 0.1] = np.nan
+    y_class = CLASSES[rng.integers(0, len(CLASSES), n_rows)]
+    y_wqi = rng.uniform(0, 100, n_rows)
+    return X, y_class, y_wqi
+
+
+def directory_digest(path):
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(path)):
+        full = os.path.join(path, name)
+        if os.path.isfile(full):
+            with open(full, 'rb') as f:
+                digest.update(name.encode() + f.read())
+    return digest.hexdigest()
+
+
+# ============================================================================
+# Sufficient statistics
+# ============================================================================
+
+def test_state_medians_match_full_refit():
+    X1, c1, w1 = make_readings(301, seed=1)
+    X2, c2, w2 = make_readings(150, seed=2, shift=0.5)
+    
+    state = TrainingState.from_data(pd.DataFrame(X1, columns=FEATURES), c1, w1, chunk_rows=7)
+    state.update(X2, c2, w2)
+    
+    X_all = np.vstack([X1, X2])
+    refit = SimpleImputer(strategy='median').fit(pd.DataFrame(X_all, columns=FEATURES))
+    np.testing.assert_allclose(state.medians(), refit.statistics_, rtol=1e-12, atol=0)
+    assert state.n_samples == len(X_all)
+
+
+def test_replay_keeps_every_class_bounded():
+    X, y_class, y_wqi = make_readings(1_000, seed=3)
+    state = TrainingState.from_data(pd.DataFrame(X, columns=FEATURES), y_class, y_wqi)
+    
+    labels, counts = np.unique(state.replay_class.astype(str), return_counts=True)
+    assert list(labels) == list(CLASSES)
+    assert (counts == REPLAY_PER_CLASS).all()
+    assert state.class_seen == {c: int((y_class == c).sum()) for c in CLASSES}
+    # Every replayed row is one of the offered rows, with its own WQI
+    offered = {tuple(np.nan_to_num(row, nan=-1)): wqi for row, wqi in zip(X, y_wqi)}
+    for row, wqi in zip(state.replay_X, state.replay_wqi):
+        assert offered[tuple(np.nan_to_num(row, nan=-1))] == wqi
+
+
+def test_state_round_trips(tmp_path):
+    X, y_class, y_wqi = make_readings(200, seed=4)
+    state = TrainingState.from_data(pd.DataFrame(X, columns=FEATURES), y_class, y_wqi)
+    loaded = TrainingState.load(state.save(str(tmp_path / STATE_FILENAME)))
+    
+    np.testing.assert_array_equal(loaded.medians(), state.medians())
+    np.testing.assert_array_equal(loaded.replay_X, state.replay_X)
+    assert list(loaded.replay_class) == list(state.replay_class)
+    assert loaded.class_seen == state.class_seen
+    assert loaded.n_samples == state.n_samples
+
+
+def test_running_scaler_matches_full_refit():
+    X1, _, _ = make_readings(301, seed=5)
+    X2, _, _ = make_readings(150, seed=6, shift=0.5)
+    X1, X2 = np.nan_to_num(X1), np.nan_to_num(X2)
+    
+    scaler = StandardScaler().fit(pd.DataFrame(X1, columns=FEATURES))
+    scaler.partial_fit(pd.DataFrame(X2, columns=FEATURES))
+    refit = StandardScaler().fit(pd.DataFrame(np.vstack([X1, X2]), columns=FEATURES))
+    np.testing.assert_allclose(scaler.mean_, refit.mean_, rtol=1e-12)
+    np.testing.assert_allclose(scaler.scale_, refit.scale_, rtol=1e-12)
+
+
+# ============================================================================
+# Re-parameterizing models for a new scaler
+# ============================================================================
+
+@pytest.mark.parametrize('name', list(JOBS))
+def test_rescaled_model_outputs_unchanged(name):
+    family, task = JOBS[name]
+    if family == 'nn':
+        os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+        pytest.importorskip('tensorflow')
+    elif family == 'xgb':
+        pytest.importorskip('xgboost')
+    
+    X_old, y_class, y_wqi = make_readings(400, seed=7)
+    X_new, _, _ = make_readings(200, seed=8, shift=0.7)
+    imputer = SimpleImputer(strategy='median').fit(pd.DataFrame(X_old, columns=FEATURES))
+    impute = lambda X: imputer.transform(pd.DataFrame(X, columns=FEATURES))
+    
+    old = StandardScaler().fit(pd.DataFrame(impute(X_old), columns=FEATURES))
+    new = copy.deepcopy(old).partial_fit(pd.DataFrame(impute(X_new), columns=FEATURES))
+    
+    X_train = ((impute(X_old) - old.mean_) / old.scale_).astype(np.float32)
+    y = np.searchsorted(CLASSES, y_class) if task == 'classification' else y_wqi
+    model = build_model(name, 1, len(FEATURES), len(CLASSES), SMALL_PARAMS[family])
+    fit_model(name, model, X_train, y, SMALL_PARAMS[family])
+    
+    # Old and new readings, including imputed ones, on both scalings
+    X_check = impute(np.vstack([X_old, X_new]))
+    expected = model_outputs(name, model, ((X_check - old.mean_) / old.scale_).astype(np.float32))
+    rescale_model_inputs(name, model, old.mean_, old.scale_, new.mean_, new.scale_,
+                         reading_steps(FEATURES))
+    actual = model_outputs(name, model, ((X_check - new.mean_) / new.scale_).astype(np.float32))
+    
+    if family == 'nn':
+        np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-4)
+    else:
+        # Every reading must still reach the same leaves
+        np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-6)
+
+
+def test_warm_start_replaces_oldest_trees():
+    X, y_class, _ = make_readings(200, seed=9)
+    X = np.nan_to_num(X).astype(np.float32)
+    y = np.searchsorted(CLASSES, y_class)
+    model = fit_model('rf_classifier', build_model('rf_classifier', 1, len(FEATURES), len(CLASSES),
+                                                   SMALL_PARAMS['rf']), X, y, SMALL_PARAMS['rf'])
+    newest = model.estimators_[5:]
+    
+    warm_start_model('rf_classifier', model, X, y, extra_trees=10, max_trees=25)
+    assert len(model.estimators_) == 25
+    assert all(a is b for a, b in zip(model.estimators_[:15], newest))
+
+
+# ============================================================================
+# Whole updates
+# ============================================================================
+
+def test_update_refreshes_preprocessors_from_all_training_rows(models_dir, labelled_data):
+    state = TrainingState.load(os.path.join(models_dir, STATE_FILENAME))
+    seen_before = state.n_samples
+    
+    retrain_incremental(DATA_CSV, models_dir, holdout=0.0)
+    
+    state = TrainingState.load(os.path.join(models_dir, STATE_FILENAME))
+    assert state.n_samples == seen_before + len(labelled_data)
+    imputer = pd.read_pickle(os.path.join(models_dir, 'imputer.pkl'))
+    np.testing.assert_allclose(imputer.statistics_, state.medians())
+    scaler = pd.read_pickle(os.path.join(models_dir, 'scaler.pkl'))
+    assert scaler.n_samples_seen_.max() == state.n_samples
+
+
+def test_replay_mismatch_raises_and_saves_nothing(models_dir, monkeypatch):
+    before = directory_digest(models_dir)
+    # Snapping to a grid far coarser than the readings moves most thresholds
+    monkeypatch.setattr(incremental, 'reading_steps', lambda features: np.full(len(features), 1e3))
+    
+    with pytest.raises(RuntimeError, match='nothing was saved'):
+        retrain_incremental(DATA_CSV, models_dir)
+    assert directory_digest(models_dir) == before
+
+
+def test_update_keeps_models_loadable(models_dir):
+    results = retrain_incremental(DATA_CSV, models_dir, max_trees=30)
+    
+    assert set(results) == {'rf_classifier', 'xgb_classifier', 'rf_regressor', 'xgb_regressor'}
+    for name in results:
+        model = load_model(name, model_path(models_dir, name))
+        if name.startswith('rf'):
+            assert len(model.estimators_) == 30
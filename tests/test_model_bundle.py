@@ -0,0 +1,164 @@
+"""Model bundle: checksums, zero-byte segments and bundle-versus-files predictions (see model_bundle.py)"""
+
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from model_bundle import (ALIGNMENT, BUNDLE_FILENAME, ArrayImputer, ArrayLabelEncoder,
+                          ArrayScaler, BundleError, read_bundle, write_bundle)
+from predict_water_quality import WaterQualityPredictor
+
+FEATURES = ['pH', 'COD (mg/L)', 'Ammonia']
+
+
+@pytest.fixture
+def small_bundle(tmp_path):
+    """Preprocessors, one pickled model and a runtime export with an empty array"""
+    path = str(tmp_path / BUNDLE_FILENAME)
+    write_bundle(path, FEATURES,
+                 imputer=ArrayImputer(np.array([7.0, 20.0, 0.5])),
+                 scaler=ArrayScaler(np.array([7.2, 25.0, 0.8]), np.array([0.5, 10.0, 0.3])),
+                 label_encoder=ArrayLabelEncoder(['Good', 'Poor']),
+                 models={'rf_classifier': {'trees': [1, 2, 3]}},
+                 runtime_models={'rf_classifier': {'values': np.arange(8.0),
+                                                   'empty': np.empty((0, 4))}})
+    return path
+
+
+def segment_start(bundle, name):
+    return bundle._data_start + bundle.manifest['segments'][name]['offset']
+
+
+def flip_byte(path, position):
+    with open(path, 'r+b') as f:
+        f.seek(position)
+        byte = f.read(1)
+        f.seek(position)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+
+# ============================================================================
+# Reading and verification
+# ============================================================================
+
+def test_round_trip(small_bundle):
+    bundle = read_bundle(small_bundle)
+    assert bundle.feature_names == FEATURES
+    assert list(bundle.label_encoder.inverse_transform([1, 0])) == ['Poor', 'Good']
+    np.testing.assert_array_equal(bundle.imputer.statistics_, [7.0, 20.0, 0.5])
+    assert bundle.load_model('rf_classifier') == {'trees': [1, 2, 3]}
+    np.testing.assert_array_equal(bundle.runtime_arrays('rf_classifier')['values'], np.arange(8.0))
+    
+    for name, entry in bundle.manifest['segments'].items():
+        assert entry['offset'] % ALIGNMENT == 0, name
+        assert segment_start(bundle, name) % ALIGNMENT == 0, name
+
+
+def test_zero_byte_segment(small_bundle):
+    bundle = read_bundle(small_bundle)
+    assert bundle.manifest['segments']['runtime.rf_classifier.empty']['nbytes'] == 0
+    empty = bundle.runtime_arrays('rf_classifier')['empty']
+    assert empty.shape == (0, 4) and empty.dtype == np.float64
+
+
+@pytest.mark.parametrize('segment', ['imputer.statistics', 'scaler.scale'])
+def test_tampered_array_segment_is_rejected(small_bundle, segment):
+    flip_byte(small_bundle, segment_start(read_bundle(small_bundle), segment) + 3)
+    with pytest.raises(BundleError, match=f"Checksum mismatch for segment '{segment}'"):
+        read_bundle(small_bundle)
+    
+    # Without verification the corrupted values are read as they are
+    bundle = read_bundle(small_bundle, verify=False)
+    assert bundle.manifest['segments'][segment]['nbytes'] > 0
+
+
+def test_tampered_model_segment_is_rejected_before_unpickling(small_bundle):
+    bundle = read_bundle(small_bundle)
+    flip_byte(small_bundle, segment_start(bundle, 'model.rf_classifier') + 10)
+    
+    # The preprocessors are intact, so only the model fails
+    bundle = read_bundle(small_bundle)
+    with pytest.raises(BundleError, match='model.rf_classifier'):
+        bundle.load_model('rf_classifier')
+    with pytest.raises(BundleError, match='model.rf_classifier'):
+        bundle.raw('model.rf_classifier')
+
+
+def test_tampered_runtime_segment_is_rejected(small_bundle):
+    flip_byte(small_bundle, segment_start(read_bundle(small_bundle), 'runtime.rf_classifier.values'))
+    bundle = read_bundle(small_bundle)
+    with pytest.raises(BundleError, match='runtime.rf_classifier.values'):
+        bundle.runtime_arrays('rf_classifier')
+
+
+def test_padding_is_not_checked(small_bundle):
+    bundle = read_bundle(small_bundle)
+    entry = bundle.manifest['segments']['imputer.statistics']
+    assert entry['nbytes'] % ALIGNMENT, "the segment should be followed by padding"
+    flip_byte(small_bundle, segment_start(bundle, 'imputer.statistics') + entry['nbytes'])
+    np.testing.assert_array_equal(read_bundle(small_bundle).imputer.statistics_, [7.0, 20.0, 0.5])
+
+
+def test_malformed_headers(small_bundle, tmp_path):
+    short = tmp_path / 'short.wqb'
+    short.write_bytes(b'WQB')
+    with pytest.raises(BundleError, match='too short'):
+        read_bundle(str(short))
+    
+    with open(small_bundle, 'rb') as f:
+        data = bytearray(f.read())
+    
+    other = tmp_path / 'other.wqb'
+    other.write_bytes(b'NOTABUND' + data[8:])
+    with pytest.raises(BundleError, match='not a model bundle'):
+        read_bundle(str(other))
+    
+    newer = tmp_path / 'newer.wqb'
+    newer.write_bytes(data[:8] + struct.pack('<I', 99) + data[12:])
+    with pytest.raises(BundleError, match='Unsupported bundle version 99'):
+        read_bundle(str(newer))
+    
+    bundle = read_bundle(small_bundle)
+    with pytest.raises(BundleError, match="'model.xgb_classifier' not found"):
+        bundle.load_model('xgb_classifier')
+    with pytest.raises(BundleError, match='No NumPy-runtime export'):
+        bundle.runtime_arrays('xgb_regressor')
+
+
+# ============================================================================
+# Through WaterQualityPredictor
+# ============================================================================
+
+@pytest.fixture(scope='module')
+def batch(labelled_data, trained_models_dir):
+    features = read_bundle(os.path.join(trained_models_dir, BUNDLE_FILENAME)).feature_names
+    return labelled_data[features].iloc[:200]
+
+
+@pytest.mark.parametrize('runtime', ['native', 'numpy'])
+def test_bundle_predictions_match_files(trained_models_dir, batch, runtime):
+    from_bundle = WaterQualityPredictor(trained_models_dir, models=('rf', 'xgb'),
+                                        use_bundle=True, runtime=runtime)
+    from_files = WaterQualityPredictor(trained_models_dir, models=('rf', 'xgb'),
+                                       use_bundle=False, runtime=runtime)
+    assert from_bundle.bundle is not None and from_files.bundle is None
+    assert from_bundle.feature_names == from_files.feature_names
+    assert list(from_bundle.label_encoder.classes_) == list(from_files.label_encoder.classes_)
+    
+    pd.testing.assert_frame_equal(from_bundle.predict_ensemble(batch),
+                                  from_files.predict_ensemble(batch))
+
+
+def test_predictor_refuses_a_tampered_bundle(models_dir, batch):
+    path = os.path.join(models_dir, BUNDLE_FILENAME)
+    flip_byte(path, segment_start(read_bundle(path), 'model.xgb_classifier') + 100)
+    
+    predictor = WaterQualityPredictor(models_dir, models=('rf', 'xgb'), lazy=True)
+    with pytest.raises(BundleError, match='model.xgb_classifier'):
+        predictor.predict_ensemble(batch)
+    
+    # The individual files are still usable
+    WaterQualityPredictor(models_dir, models=('rf', 'xgb'), use_bundle=False).predict_ensemble(batch)
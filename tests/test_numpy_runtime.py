@@ -0,0 +1,89 @@
+"""NumPy-only models against the sklearn, XGBoost and Keras originals (see numpy_runtime.py)"""
+
+import os
+
+import numpy as np
+import pytest
+
+from numpy_runtime import export_model, from_arrays
+from training import JOBS, build_model, fit_model
+
+# Max absolute difference on the same input:
+#   rf   identical float32 comparisons, float64 averaging
+#   xgb  XGBoost accumulates leaf values in float32
+#   nn   float32 matmuls with BatchNorm folded in
+TOLERANCE = {'rf': 1e-9, 'xgb': 1e-3, 'nn': 1e-4}
+
+# Small versions of the run_analysis.py models so the whole file runs in seconds
+SMALL_PARAMS = {
+    'rf': {'n_estimators': 20, 'max_depth': 8},
+    'xgb': {'n_estimators': 20, 'max_depth': 4},
+    'nn': {'units': [16, 8], 'epochs': 3, 'patience': 1},
+}
+
+N_FEATURES = 18
+N_CLASSES = 3
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(42)
+    X = rng.normal(size=(600, N_FEATURES)).astype(np.float32)
+    score = X[:, :4].sum(axis=1) + rng.normal(0, 0.5, len(X))
+    y_class = np.digitize(score, np.quantile(score, [1 / 3, 2 / 3]))
+    y_value = 50 + 10 * score
+    return X, y_class, y_value
+
+
+def fitted(name, data):
+    family, task = JOBS[name]
+    if family == 'nn':
+        os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+        pytest.importorskip('tensorflow')
+    elif family == 'xgb':
+        pytest.importorskip('xgboost')
+    
+    X, y_class, y_value = data
+    model = build_model(name, 1, N_FEATURES, N_CLASSES, SMALL_PARAMS[family])
+    return fit_model(name, model, X, y_class if task == 'classification' else y_value,
+                     SMALL_PARAMS[family])
+
+
+def outputs(name, model, X):
+    """Raw model output: class probabilities or WQI values"""
+    family, task = JOBS[name]
+    if family == 'nn':
+        return np.asarray(model.predict(X, verbose=0))
+    return model.predict_proba(X) if task == 'classification' else model.predict(X)
+
+
+@pytest.mark.parametrize('name', list(JOBS))
+def test_export_matches_original(name, data):
+    model = fitted(name, data)
+    exported = from_arrays(export_model(name, model))
+    X = data[0]
+    
+    expected = outputs(name, model, X)
+    np.testing.assert_allclose(outputs(name, exported, X).reshape(expected.shape), expected,
+                               rtol=0, atol=TOLERANCE[JOBS[name][0]])
+    
+    # Single rows take the scalar tree walk on small forests
+    for row in X[:5]:
+        expected = outputs(name, model, row[None, :])
+        np.testing.assert_allclose(outputs(name, exported, row[None, :]).reshape(expected.shape),
+                                   expected, rtol=0, atol=TOLERANCE[JOBS[name][0]])
+
+
+@pytest.mark.parametrize('name', ['xgb_classifier', 'xgb_regressor'])
+def test_xgboost_missing_values_follow_default_direction(name, data):
+    model = fitted(name, data)
+    exported = from_arrays(export_model(name, model))
+    X = data[0].copy()
+    X[np.random.default_rng(0).random(X.shape) < 0.2] = np.nan
+    
+    np.testing.assert_allclose(outputs(name, exported, X), outputs(name, model, X),
+                               rtol=0, atol=TOLERANCE['xgb'])
+    for row in X[:5]:
+        np.testing.assert_allclose(outputs(name, exported, row[None, :]),
+                                   outputs(name, model, row[None, :]),
+                                   rtol=0, atol=TOLERANCE['xgb'])
@@ -0,0 +1,132 @@
+"""LRU prediction cache: equivalence, quantization and eviction (see prediction_cache.py)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from predict_water_quality import WaterQualityPredictor
+from prediction_cache import DEFAULT_DECIMALS, INSTRUMENT_DECIMALS, PredictionCache
+
+FEATURES = ['pH', 'COD (mg/L)', 'Ammonia']
+
+
+def make_stream(predictor, n_rows, repeat_rate, seed=42):
+    """Samples at instrument precision where repeat_rate of the rows repeat an earlier one"""
+    rng = np.random.default_rng(seed)
+    medians = np.asarray(predictor.imputer.statistics_, dtype=float)
+    n_unique = max(1, int(n_rows * (1 - repeat_rate)))
+    
+    unique = medians * rng.lognormal(mean=0.0, sigma=0.4, size=(n_unique, len(medians)))
+    for j, name in enumerate(predictor.feature_names):
+        unique[:, j] = np.round(unique[:, j], INSTRUMENT_DECIMALS.get(name, DEFAULT_DECIMALS))
+    unique[rng.random(unique.shape) < 0.1] = np.nan
+    
+    order = np.concatenate([np.arange(n_unique), rng.integers(0, n_unique, n_rows - n_unique)])
+    rng.shuffle(order)
+    return pd.DataFrame(unique[order], columns=predictor.feature_names)
+
+
+@pytest.fixture(scope='module')
+def plain(trained_models_dir):
+    return WaterQualityPredictor(trained_models_dir, models=('rf', 'xgb'))
+
+
+# ============================================================================
+# Through WaterQualityPredictor
+# ============================================================================
+
+@pytest.mark.parametrize('cache_size', [100_000, 50])
+def test_cached_results_match_uncached(trained_models_dir, plain, cache_size):
+    cached = WaterQualityPredictor(trained_models_dir, models=('rf', 'xgb'), cache_size=cache_size)
+    stream = make_stream(plain, 600, repeat_rate=0.8)
+    batches = [stream.iloc[i:i + 64] for i in range(0, len(stream), 64)]
+    
+    expected = pd.concat([plain.predict_ensemble(b) for b in batches])
+    got = pd.concat([cached.predict_ensemble(b) for b in batches])
+    pd.testing.assert_frame_equal(got, expected)
+    
+    stats = cached.cache_stats()
+    assert stats['hits'] > 0 and stats['size'] <= cache_size
+    if cache_size < 100_000:
+        assert stats['evictions'] > 0
+
+
+def test_readings_below_instrument_precision_share_an_entry(trained_models_dir, plain):
+    cached = WaterQualityPredictor(trained_models_dir, models=('rf', 'xgb'), cache_size=1_000)
+    sample = dict(zip(plain.feature_names, np.asarray(plain.imputer.statistics_, dtype=float)))
+    sample['pH'] = 7.2
+    noisy = {**sample, 'pH': 7.2 + 1e-4}
+    
+    first = cached.predict_ensemble(sample)
+    hits = cached.cache_stats()['hits']
+    second = cached.predict_ensemble(noisy)
+    assert cached.cache_stats()['hits'] == hits + 4
+    pd.testing.assert_frame_equal(second, first)
+    # The cache answers for the rounded reading, as a miss would have
+    pd.testing.assert_frame_equal(second, plain.predict_ensemble(sample))
+
+
+# ============================================================================
+# PredictionCache itself
+# ============================================================================
+
+def test_quantized_keys():
+    cache = PredictionCache(FEATURES)
+    X = np.array([
+        [7.004, 12.0, 0.5],
+        [7.001, 12.4, 0.5],       # same as row 0 at instrument precision
+        [7.01, 12.0, 0.5],        # one pH step away
+        [7.0, 12.0, np.nan],
+        [7.0, 12.0, np.nan],
+        [7.0, 12.0, 0.0],         # zero is not missing
+    ])
+    quantized, keys = cache.quantize(X)
+    np.testing.assert_allclose(quantized[0], [7.0, 12.0, 0.5])
+    assert keys[0] == keys[1]
+    assert keys[0] != keys[2]
+    assert keys[3] == keys[4] != keys[5]
+
+
+def test_decimal_overrides_change_the_grid():
+    _, coarse = PredictionCache(FEATURES, decimals={'pH': 1}).quantize(np.array([[7.01, 1, 1],
+                                                                                  [7.04, 1, 1]]))
+    assert coarse[0] == coarse[1]
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(FEATURES, max_size=3)
+    _, keys = cache.quantize(np.arange(12, dtype=float).reshape(4, 3))
+    cache.store(keys[:3], 'rf_classifier', [0, 1, 2])
+    
+    # Touch the oldest entry, so the second one is now least recently used
+    cache.lookup(keys[:1], 'rf_classifier')
+    cache.store(keys[3:], 'rf_classifier', [3])
+    
+    values, missing = cache.lookup(keys, 'rf_classifier')
+    assert list(missing) == [False, True, False, False]
+    np.testing.assert_array_equal(values[~missing], [0, 2, 3])
+    assert cache.stats['evictions'] == 1 and len(cache) == 3
+
+
+def test_entries_are_per_model():
+    cache = PredictionCache(FEATURES)
+    _, keys = cache.quantize(np.ones((1, 3)))
+    cache.store(keys, 'rf_classifier', [1])
+    assert cache.lookup(keys, 'xgb_classifier')[1].all()
+
+
+def test_binding_other_models_clears_the_cache():
+    cache = PredictionCache(FEATURES)
+    cache.bind('models-a')
+    _, keys = cache.quantize(np.ones((1, 3)))
+    cache.store(keys, 'rf_regressor', [42.0])
+    
+    cache.bind('models-a')
+    assert len(cache) == 1 and cache.stats['invalidations'] == 0
+    cache.bind('models-b')
+    assert len(cache) == 0 and cache.stats['invalidations'] == 1
+
+
+def test_size_must_be_positive():
+    with pytest.raises(ValueError):
+        PredictionCache(FEATURES, max_size=0)
@@ -0,0 +1,64 @@
+"""Fused impute-and-scale kernel against the fitted imputer and scaler (see predict_water_quality.py)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from predict_water_quality import WaterQualityPredictor
+
+
+def pandas_preprocess(predictor, df):
+    """The original DataFrame-based preprocessing"""
+    df = df[predictor.feature_names]
+    imputed = pd.DataFrame(predictor.imputer.transform(df), columns=predictor.feature_names)
+    return predictor.scaler.transform(imputed)
+
+
+@pytest.fixture(scope='module', params=[True, False], ids=['bundle', 'pickles'])
+def predictor(request, trained_models_dir):
+    return WaterQualityPredictor(trained_models_dir, models=('rf', 'xgb'), use_bundle=request.param)
+
+
+@pytest.fixture(scope='module')
+def batch(predictor):
+    rng = np.random.default_rng(42)
+    medians = np.asarray(predictor.imputer.statistics_, dtype=float)
+    batch = pd.DataFrame(medians * rng.lognormal(0, 0.4, (500, len(medians))),
+                         columns=predictor.feature_names)
+    batch = batch.mask(rng.random(batch.shape) < 0.1)
+    # A row with nothing reported is all medians
+    batch.iloc[0] = np.nan
+    return batch
+
+
+def test_dataframe_matches_imputer_and_scaler(predictor, batch):
+    X = predictor.preprocess_data(batch)
+    assert X.dtype == np.float32 and X.flags.c_contiguous
+    np.testing.assert_allclose(X, pandas_preprocess(predictor, batch), rtol=1e-6, atol=1e-6)
+
+
+def test_column_order_does_not_matter(predictor, batch):
+    shuffled = batch[batch.columns[::-1]]
+    np.testing.assert_array_equal(predictor.preprocess_data(shuffled),
+                                  predictor.preprocess_data(batch))
+
+
+def test_every_input_form_agrees(predictor, batch):
+    expected = predictor.preprocess_data(batch.iloc[:20])
+    records = [{k: (None if pd.isna(v) else v) for k, v in row.items()}
+               for row in batch.iloc[:20].to_dict('records')]
+    
+    np.testing.assert_array_equal(predictor.preprocess_data(records), expected)
+    np.testing.assert_array_equal(predictor.preprocess_data(records[3]), expected[3:4])
+    np.testing.assert_array_equal(predictor.preprocess_data(batch.iloc[:20].to_numpy()), expected)
+
+
+def test_input_is_left_untouched(predictor, batch):
+    before = batch.copy()
+    predictor.preprocess_data(batch)
+    pd.testing.assert_frame_equal(batch, before)
+
+
+def test_wrong_array_width_is_rejected(predictor):
+    with pytest.raises(ValueError, match='shape'):
+        predictor.preprocess_data(np.zeros((2, len(predictor.feature_names) + 1)))
@@ -0,0 +1,179 @@
+"""MicroBatcher: per-request results, error isolation and batching limits (see serving.py)"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from predict_water_quality import WaterQualityPredictor
+from serving import MicroBatcher, PredictionServer
+
+MODELS = ('rf', 'xgb')
+POISON = -12345.0
+
+
+@pytest.fixture(scope='module')
+def predictor(trained_models_dir):
+    return WaterQualityPredictor(trained_models_dir, models=MODELS, lazy=False)
+
+
+@pytest.fixture(scope='module')
+def samples(labelled_data, predictor):
+    rows = labelled_data[predictor.feature_names].iloc[:60].astype(object)
+    return rows.where(rows.notna(), None).to_dict('records')
+
+
+def recording(batcher):
+    """Record the size of every inference call; samples with pH == POISON fail it"""
+    sizes, infer = [], batcher._infer
+    
+    def record(batch):
+        sizes.append(len(batch))
+        if any(sample['pH'] == POISON for sample in batch):
+            raise RuntimeError("poisoned sample")
+        return infer(batch)
+    
+    batcher._infer = record
+    return sizes
+
+
+def serve_requests(batcher, samples, spacing=0.0):
+    """Send the samples concurrently (or spacing seconds apart) and gather the outcomes"""
+    async def send(i, sample):
+        await asyncio.sleep(i * spacing)
+        return await batcher.predict(sample)
+    
+    async def run():
+        await batcher.start()
+        try:
+            return await asyncio.gather(*(send(i, s) for i, s in enumerate(samples)),
+                                        return_exceptions=True)
+        finally:
+            await batcher.stop()
+    
+    return asyncio.run(run())
+
+
+# ============================================================================
+# Results
+# ============================================================================
+
+def test_batched_results_match_single_predictions(predictor, samples):
+    batcher = MicroBatcher(predictor, max_batch_size=16, max_delay_ms=50)
+    sizes = recording(batcher)
+    results = serve_requests(batcher, samples)
+    
+    assert max(sizes) > 1, "requests should have been batched"
+    for sample, result in zip(samples, results):
+        assert result == predictor.predict_all(sample)
+
+
+def test_failing_sample_fails_only_its_own_request(predictor, samples):
+    batcher = MicroBatcher(predictor, max_batch_size=64, max_delay_ms=50)
+    sizes = recording(batcher)
+    poisoned = [dict(s) for s in samples[:20]]
+    poisoned[7]['pH'] = POISON
+    results = serve_requests(batcher, poisoned)
+    
+    assert isinstance(results[7], RuntimeError)
+    for i, (sample, result) in enumerate(zip(poisoned, results)):
+        if i != 7:
+            assert result == predictor.predict_all(sample)
+    # One batch failed, then its samples were rerun one at a time
+    assert sizes[0] == 20 and sizes[1:] == [1] * 20
+    assert batcher.stats == {'requests': 20, 'batches': 1, 'errors': 1}
+
+
+@pytest.mark.parametrize('change,message', [
+    ({'pH': 'seven'}, "pH='seven'"),
+    ({'pH': float('inf')}, 'pH=inf'),
+    ({'pH': [7.0]}, 'pH=[7.0]'),
+])
+def test_invalid_values_are_rejected_at_enqueue(predictor, samples, change, message):
+    batcher = MicroBatcher(predictor)
+    results = serve_requests(batcher, [{**samples[0], **change}, samples[1]])
+    
+    assert isinstance(results[0], ValueError) and message in str(results[0])
+    assert results[1] == predictor.predict_all(samples[1])
+    # The bad sample never reached a batch
+    assert batcher.stats == {'requests': 1, 'batches': 1, 'errors': 0}
+
+
+def test_missing_features_and_nan_values(predictor, samples):
+    incomplete = {k: v for k, v in samples[0].items() if k != 'pH'}
+    with_nan = {**samples[0], 'pH': float('nan')}
+    results = serve_requests(MicroBatcher(predictor), [incomplete, with_nan])
+    
+    assert isinstance(results[0], ValueError) and 'Missing features: pH' in str(results[0])
+    assert results[1] == predictor.predict_all({**samples[0], 'pH': None})
+
+
+# ============================================================================
+# Batching limits
+# ============================================================================
+
+def test_batch_size_is_capped(predictor, samples):
+    batcher = MicroBatcher(predictor, max_batch_size=8, max_delay_ms=1_000)
+    sizes = recording(batcher)
+    serve_requests(batcher, samples)
+    
+    assert max(sizes) == 8 and sum(sizes) == len(samples)
+    assert batcher.stats['batches'] == len(sizes) >= len(samples) // 8
+
+
+def test_lone_request_waits_at_most_the_delay(predictor, samples):
+    batcher = MicroBatcher(predictor, max_batch_size=256, max_delay_ms=20)
+    start = time.perf_counter()
+    result, = serve_requests(batcher, samples[:1])
+    
+    assert result == predictor.predict_all(samples[0])
+    # Far below the 256 samples it would otherwise wait for
+    assert time.perf_counter() - start < 1
+    assert batcher.stats['batches'] == 1
+
+
+def test_requests_further_apart_than_the_delay_are_not_merged(predictor, samples):
+    batcher = MicroBatcher(predictor, max_batch_size=256, max_delay_ms=1)
+    sizes = recording(batcher)
+    serve_requests(batcher, samples[:4], spacing=0.2)
+    assert sizes == [1, 1, 1, 1]
+
+
+# ============================================================================
+# Lifecycle and HTTP
+# ============================================================================
+
+def test_predict_before_start_fails(predictor, samples):
+    with pytest.raises(RuntimeError, match='start'):
+        asyncio.run(MicroBatcher(predictor).predict(samples[0]))
+
+
+def test_stop_fails_queued_requests(predictor, samples):
+    async def run():
+        batcher = MicroBatcher(predictor, max_batch_size=256, max_delay_ms=10_000)
+        await batcher.start()
+        pending = [asyncio.ensure_future(batcher.predict(s)) for s in samples[:3]]
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        return await asyncio.gather(*pending, return_exceptions=True)
+    
+    for outcome in asyncio.run(run()):
+        assert isinstance(outcome, RuntimeError) and 'shutting down' in str(outcome)
+
+
+def test_http_errors(predictor, samples):
+    async def run():
+        batcher = MicroBatcher(predictor)
+        await batcher.start()
+        server = PredictionServer(batcher)
+        try:
+            return [await server._dispatch('POST', '/predict', json.dumps(body).encode())
+                    for body in ({**samples[0], 'pH': 'x'}, 42, samples[:2])] + [
+                await server._dispatch('GET', '/missing', b'')]
+        finally:
+            await batcher.stop()
+    
+    (bad, _), (scalar, _), (ok, results), (missing, _) = asyncio.run(run())
+    assert (bad, scalar, ok, missing) == (400, 400, 200, 404)
+    assert results == [predictor.predict_all(s) for s in samples[:2]]
@@ -0,0 +1,117 @@
+"""Station history store: rolling aggregates, period overwrites and layout (see station_store.py)"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from station_store import READINGS_DIR, StationStore, _slug, period_from_filename
+from wqi import classify_wqi_array
+
+# Station code -> (name, water body)
+STATIONS = {
+    101: ('Upstream', 'Musi River (Hyd.)'),
+    102: ('Downstream', 'Musi River (Hyd.)'),
+    201: ('Lake centre', 'Hussain Sagar'),
+}
+
+# Gaps inside a year and across a year boundary
+PERIODS = ['2024-01', '2024-02', '2024-05', '2024-11', '2025-01', '2025-02']
+
+
+def make_period(period, seed, stations=STATIONS, per_station=3):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for code, (name, water_body) in stations.items():
+        for _ in range(rng.integers(1, per_station + 1)):
+            rows.append({'Station code': code, 'Station name': name, 'water_bodies': water_body,
+                         'pH': round(rng.uniform(6, 9), 2), 'WQI': rng.uniform(10, 95)})
+    df = pd.DataFrame(rows)
+    df['Water_Quality_Class'] = classify_wqi_array(df['WQI'].to_numpy())
+    return df
+
+
+def months(period):
+    return int(period[:4]) * 12 + int(period[5:]) - 1
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StationStore(str(tmp_path / 'store'))
+    for i, period in enumerate(PERIODS):
+        store.append(make_period(period, seed=i), period)
+    return store
+
+
+def assert_aggregates_match_readings(store):
+    """Recompute every (station, period) mean and rolling mean from the stored readings"""
+    readings = pd.concat([store.station_history(code) for code in STATIONS], ignore_index=True)
+    for row in store.aggregates().itertuples(index=False):
+        station = readings[readings['Station code'] == row[0]]
+        age = months(row.period) - station['period'].map(months)
+        for window in (3, 12):
+            expected = station.loc[(age >= 0) & (age < window), 'WQI'].mean()
+            assert getattr(row, f'wqi_mean_{window}m') == pytest.approx(expected, rel=1e-12)
+        assert row.wqi_mean == pytest.approx(station.loc[age == 0, 'WQI'].mean(), rel=1e-12)
+        assert row.n == (age == 0).sum()
+
+
+def test_rolling_means_count_month_gaps(store):
+    assert len(store.aggregates()) == len(STATIONS) * len(PERIODS)
+    assert_aggregates_match_readings(store)
+
+
+def test_history_agrees_with_aggregates(store):
+    for code in STATIONS:
+        history = store.station_history(code)
+        trend = store.station_trend(code)
+        assert len(history) == trend['n'].sum()
+        assert list(trend['period']) == PERIODS
+        assert list(history['period']) == sorted(history['period'])
+    
+    recent = store.station_history(101, start='2024-11', end='2025-01')
+    assert set(recent['period']) == {'2024-11', '2025-01'}
+    assert (recent['Station code'] == 101).all()
+
+
+def test_existing_period_is_overwritten(store):
+    assert store.has_period('2024-05') and not store.has_period('2024-06')
+    
+    replacement = make_period('2024-05', seed=99, stations={201: STATIONS[201]}, per_station=1)
+    with pytest.raises(ValueError, match='already stored'):
+        store.append(replacement, '2024-05', overwrite=False)
+    
+    store.append(replacement, '2024-05')
+    # The Musi River file of that period is gone with the old readings
+    reopened = StationStore(store.root)
+    assert len(reopened.water_body_history('Musi River (Hyd.)', start='2024-05', end='2024-05')) == 0
+    may = reopened.aggregates().query("period == '2024-05'")
+    assert list(may['Station code']) == [201]
+    assert may['n'].iloc[0] == len(replacement)
+    assert reopened.periods() == PERIODS
+    assert_aggregates_match_readings(reopened)
+
+
+def test_water_bodies_get_slugged_directories(store):
+    directories = sorted(os.listdir(os.path.join(store.root, READINGS_DIR)))
+    assert directories == ['Hussain_Sagar', 'Musi_River_Hyd']
+    assert _slug('  ') == 'unknown'
+    
+    history = store.water_body_history('Musi River (Hyd.)', columns=['Station code', 'period'])
+    assert set(history['Station code']) == {101, 102}
+
+
+def test_rows_without_station_are_skipped(tmp_path):
+    df = make_period('2024-01', seed=0)
+    df.loc[0, 'Station code'] = np.nan
+    stats = StationStore(str(tmp_path)).append(df, '2024-01')
+    assert stats['rows'] == len(df) - 1 and stats['skipped'] == 1
+
+
+def test_period_validation():
+    assert period_from_filename('data/Water_Quality_Data_06_2025.csv') == '2025-06'
+    with pytest.raises(ValueError):
+        period_from_filename('readings.csv')
+    with pytest.raises(ValueError, match='YYYY-MM'):
+        StationStore('unused').append(make_period('2024-01', seed=0), '2024-1')
@@ -0,0 +1,129 @@
+"""StreamingScorer against a plain per-reading loop (see streaming.py)"""
+
+import asyncio
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from streaming import StreamingScorer, replay
+from wqi import STANDARDS, calculate_wqi, classify_water_quality
+
+PARAMS = list(STANDARDS)
+WINDOW = 5
+
+
+def make_telemetry(n_readings, n_stations=20, drop_rate=0.3, blank_rate=0.05, seed=42):
+    """
+    Readings around each station's own levels, some parameters left out and
+    some readings reporting nothing at all
+    """
+    rng = np.random.default_rng(seed)
+    limits = np.array([STANDARDS[p]['max'] for p in PARAMS])
+    levels = rng.uniform(0.2, 2.0, (n_stations, len(PARAMS))) * limits
+    stations = rng.integers(0, n_stations, n_readings)
+    values = levels[stations] * rng.lognormal(0.0, 0.4, (n_readings, len(PARAMS)))
+    values[rng.random(values.shape) < drop_rate] = np.nan
+    values[rng.random(n_readings) < blank_rate] = np.nan
+    return np.array([f'S{s}' for s in stations], dtype=object), values
+
+
+def reference(stations, values, window=WINDOW):
+    """Forward fill, scalar WQI, deque window and class changes, one reading at a time"""
+    latest, history, classes = {}, {}, {}
+    rows, events = [], []
+    for station, reading in zip(stations, values):
+        state = latest.setdefault(station, np.full(len(PARAMS), np.nan))
+        state[~np.isnan(reading)] = reading[~np.isnan(reading)]
+        wqi = calculate_wqi(pd.Series(state, index=PARAMS), STANDARDS)
+        recent = history.setdefault(station, deque(maxlen=window))
+        recent.append(wqi)
+        seen = [w for w in recent if not np.isnan(w)]
+        label = classify_water_quality(wqi)
+        if not pd.isna(label):
+            if station in classes and classes[station] != label:
+                events.append((station, classes[station], label))
+            classes[station] = label
+        rows.append((wqi, np.mean(seen) if seen else np.nan, np.std(seen) if seen else np.nan,
+                     len(seen)))
+    return np.array(rows), events
+
+
+def score_in_batches(stations, values, batch_size):
+    scorer = StreamingScorer(PARAMS, window=WINDOW)
+    batches = [scorer.process_arrays(stations[i:i + batch_size], values[i:i + batch_size])
+               for i in range(0, len(values), batch_size)]
+    results = pd.concat([r for r, _ in batches], ignore_index=True)
+    events = [e for _, batch_events in batches for e in batch_events]
+    return results, events
+
+
+@pytest.fixture(scope='module')
+def telemetry():
+    stations, values = make_telemetry(2_000)
+    return stations, values, reference(stations, values)
+
+
+@pytest.mark.parametrize('batch_size', [1, 7, 64, 2_000])
+def test_matches_per_reading_loop(telemetry, batch_size):
+    stations, values, (expected, expected_events) = telemetry
+    results, events = score_in_batches(stations, values, batch_size)
+    
+    got = results[['WQI', 'rolling_wqi_mean', 'rolling_wqi_std', 'window_count']].to_numpy(float)
+    np.testing.assert_allclose(got, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+    assert [(e['station'], e['previous_class'], e['class']) for e in events] == expected_events
+    assert expected_events, "the telemetry should cross class thresholds"
+
+
+def test_missing_parameters_are_forward_filled():
+    scorer = StreamingScorer(PARAMS, window=WINDOW)
+    first = np.array([[7.0] + [np.nan] * (len(PARAMS) - 1)])
+    scorer.process_arrays(['A'], first)
+    
+    later = np.full((1, len(PARAMS)), np.nan)
+    later[0, 1] = 3.0
+    results, _ = scorer.process_arrays(['A'], later)
+    
+    state = scorer.station_state('A')
+    assert state['latest'] == {PARAMS[0]: 7.0, PARAMS[1]: 3.0}
+    filled = pd.Series([7.0, 3.0] + [np.nan] * (len(PARAMS) - 2), index=PARAMS)
+    assert results['WQI'].iloc[0] == pytest.approx(calculate_wqi(filled, STANDARDS))
+
+
+def test_reading_without_any_parameter():
+    scorer = StreamingScorer(PARAMS, window=WINDOW)
+    blank = np.full((1, len(PARAMS)), np.nan)
+    
+    # A new station with nothing reported has no WQI, class or statistics yet
+    results, events = scorer.process_arrays(['A'], blank)
+    assert np.isnan(results['WQI'].iloc[0]) and pd.isna(results['class'].iloc[0])
+    assert results['window_count'].iloc[0] == 0 and not events
+    
+    # After a real reading, a blank one repeats the forward-filled WQI
+    reading = np.array([[STANDARDS[p]['max'] / 2 for p in PARAMS]])
+    first, _ = scorer.process_arrays(['A'], reading)
+    again, events = scorer.process_arrays(['A'], blank)
+    assert again['WQI'].iloc[0] == first['WQI'].iloc[0]
+    assert again['class'].iloc[0] == first['class'].iloc[0]
+    assert again['window_count'].iloc[0] == 2 and not events
+
+
+def test_stream_matches_arrays():
+    stations, values = make_telemetry(500, seed=7)
+    expected, expected_events = score_in_batches(stations, values, len(values))
+    
+    frame = pd.DataFrame(values, columns=PARAMS).astype(object)
+    frame = frame.where(frame.notna(), None)
+    frame.insert(0, 'Station code', stations)
+    readings = frame.to_dict('records')
+    
+    async def consume():
+        scorer = StreamingScorer(PARAMS, window=WINDOW, max_batch_size=37)
+        return [batch async for batch in scorer.stream(replay(readings))]
+    
+    batches = asyncio.run(consume())
+    results = pd.concat([r for r, _ in batches], ignore_index=True)
+    events = [e for _, batch_events in batches for e in batch_events]
+    pd.testing.assert_frame_equal(results, expected)
+    assert events == expected_events
@@ -0,0 +1,87 @@
+"""Shared training matrix against the per-task copy pipeline it replaced (see training_data.py)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.impute import SimpleImputer
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from ingest import KEY_PARAMETERS
+from training import load_staged_data, stage_data
+from training_data import fit_preprocessing_in_place, prepare_training_data
+
+
+@pytest.fixture(scope='module')
+def features(labelled_data):
+    return [f for f in KEY_PARAMETERS if f in labelled_data.columns]
+
+
+@pytest.fixture(scope='module')
+def data(labelled_data, features):
+    return prepare_training_data(labelled_data, features)
+
+
+def test_split_matches_stratified_train_test_split(labelled_data, data):
+    y = LabelEncoder().fit_transform(labelled_data['Water_Quality_Class'])
+    train_idx, test_idx = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42,
+                                           stratify=y)
+    np.testing.assert_array_equal(data.order[:data.n_train], train_idx)
+    np.testing.assert_array_equal(data.order[data.n_train:], test_idx)
+
+
+def test_matrix_matches_float64_pipeline(labelled_data, features, data):
+    raw = labelled_data[features].to_numpy(dtype=np.float64, na_value=np.nan)[data.order]
+    imputer = SimpleImputer(strategy='median').fit(raw[:data.n_train])
+    scaler = StandardScaler().fit(imputer.transform(raw[:data.n_train]))
+    
+    assert data.X.dtype == np.float32 and data.X.flags.c_contiguous
+    np.testing.assert_allclose(data.X, scaler.transform(imputer.transform(raw)),
+                               rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(data.imputer.statistics_, imputer.statistics_, rtol=1e-6)
+    np.testing.assert_allclose(data.scaler.mean_, scaler.mean_, rtol=1e-5)
+    np.testing.assert_allclose(data.scaler.scale_, scaler.scale_, rtol=1e-5)
+
+
+def test_labels_follow_the_matrix_rows(labelled_data, data):
+    expected = labelled_data['Water_Quality_Class'].to_numpy()[data.order]
+    assert list(data.label_encoder.inverse_transform(data.y_class)) == list(expected)
+    np.testing.assert_array_equal(data.y_wqi, labelled_data['WQI'].to_numpy()[data.order])
+
+
+def test_preprocessing_fitted_on_training_rows_only(labelled_data, features, data):
+    # Wildly different test rows must not move the imputer or the scaler
+    altered = labelled_data.copy()
+    test_rows = altered.index[data.order[data.n_train:]]
+    altered.loc[test_rows, features] = 1e6
+    
+    other = prepare_training_data(altered, features)
+    np.testing.assert_array_equal(other.order, data.order)
+    np.testing.assert_array_equal(other.imputer.statistics_, data.imputer.statistics_)
+    np.testing.assert_array_equal(other.scaler.mean_, data.scaler.mean_)
+    np.testing.assert_array_equal(other.scaler.scale_, data.scaler.scale_)
+    np.testing.assert_array_equal(other.X_train, data.X_train)
+
+
+def test_chunked_scaler_fit_matches_one_pass(features):
+    X = np.random.default_rng(0).normal(5, 3, (1_000, len(features))).astype(np.float32)
+    X[::7, 2] = np.nan
+    n_train = 800
+    
+    imputer, scaler = fit_preprocessing_in_place(X.copy(), n_train, features, chunk_rows=64)
+    X_train = pd.DataFrame(X[:n_train], columns=features)
+    expected = StandardScaler().fit(SimpleImputer(strategy='median').fit_transform(X_train))
+    np.testing.assert_allclose(scaler.mean_, expected.mean_, rtol=1e-5)
+    np.testing.assert_allclose(scaler.scale_, expected.scale_, rtol=1e-5)
+
+
+def test_staged_slices_match_the_matrix(tmp_path, data):
+    data_dir = stage_data(str(tmp_path), data.X, data.y_class, data.y_wqi, data.n_train,
+                          len(data.label_encoder.classes_))
+    for task, y in (('classification', data.y_class), ('regression', data.y_wqi)):
+        X_train, y_train, X_test, y_test, n_classes = load_staged_data(data_dir, task)
+        np.testing.assert_array_equal(X_train, data.X_train)
+        np.testing.assert_array_equal(X_test, data.X_test)
+        np.testing.assert_array_equal(y_train, y[:data.n_train])
+        np.testing.assert_array_equal(y_test, y[data.n_train:])
+        assert n_classes == len(data.label_encoder.classes_)
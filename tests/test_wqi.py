@@ -0,0 +1,59 @@
+"""Vectorized WQI engine against the scalar reference (see wqi.py)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from wqi import (
+    STANDARDS, calculate_wqi, calculate_wqi_frame,
+    classify_water_quality, classify_wqi_array
+)
+
+
+def make_readings(n_rows, missing_rate=0.15, seed=42):
+    """Synthetic readings spanning in-range, boundary and out-of-range values"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for param, std in STANDARDS.items():
+        values = rng.uniform(0, std['max'] * 2.5, n_rows)
+        # Exact boundaries exercise the <= / >= branches
+        values[rng.random(n_rows) < 0.02] = std['max']
+        values[rng.random(n_rows) < 0.02] = std['min']
+        values[rng.random(n_rows) < missing_rate] = np.nan
+        data[param] = values
+    df = pd.DataFrame(data)
+    # A few rows with nothing usable must come back as NaN
+    df.iloc[:min(3, n_rows)] = np.nan
+    return df
+
+
+@pytest.fixture(scope='module')
+def readings():
+    return make_readings(2_000)
+
+
+@pytest.fixture(scope='module')
+def scalar_wqi(readings):
+    return readings.apply(lambda row: calculate_wqi(row, STANDARDS), axis=1).to_numpy(dtype=float)
+
+
+def test_wqi_matches_scalar(readings, scalar_wqi):
+    vector_wqi = calculate_wqi_frame(readings, STANDARDS).to_numpy()
+    np.testing.assert_allclose(vector_wqi, scalar_wqi, rtol=1e-12, atol=1e-9, equal_nan=True)
+    assert np.isnan(vector_wqi[:3]).all()
+
+
+def labels_of(values):
+    """Class labels with NaN spelled out so they compare equal"""
+    return ['NaN' if pd.isna(v) else v for v in values]
+
+
+def test_classes_match_scalar(scalar_wqi):
+    expected = [classify_water_quality(w) for w in scalar_wqi]
+    assert labels_of(classify_wqi_array(scalar_wqi)) == labels_of(expected)
+
+
+def test_class_boundaries():
+    wqi = [np.nan, 39.999, 40.0, 69.999, 70.0, 100.0]
+    expected = [classify_water_quality(w) for w in wqi]
+    assert labels_of(classify_wqi_array(np.array(wqi))) == labels_of(expected)